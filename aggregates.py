@@ -0,0 +1,146 @@
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from firebase_admin import firestore
+
+# --- AGREGADOS DA PLATAFORMA (CONTADORES FRAGMENTADOS) ---
+# O dashboard lia todas as apostas e todos os usuários a cada carga. Agora cada transação que
+# mexe em aposta ou saldo soma seus deltas num dos AGGREGATE_SHARDS documentos de
+# platform_aggregates (shard aleatório, para não estourar o limite de escrita por documento).
+# Ler o total custa AGGREGATE_SHARDS leituras, independente do histórico.
+# rebuild() recalcula tudo do zero para reconciliar (arredondamento de floats, dados antigos). Tudo é
+# lido num mesmo read_time e só a diferença entra como Increment (shards e pending_liability): o que
+# for gravado durante a varredura (apostas novas, liquidações) continua somado, em vez de ser sobrescrito.
+# A exposição por jogador (`pending_liability` em users/{uid} e riotAccountLinks/{puuid}) é mantida
+# pelas mesmas transações e também reconciliada aqui; alimenta o ranking de risco do admin.
+AGGREGATE_SHARDS = int(os.getenv("AGGREGATE_SHARDS", "10"))
+COLLECTION = "platform_aggregates"
+
+FIELDS = (
+    "pending_count", "pending_volume", "pending_real", "pending_bonus", "liability",
+    "won_count", "won_val", "won_stake", "lost_count", "lost_val", "total_bets",
+    "holding_real", "holding_bonus", "total_users",
+    "users_with_balance"  # só o rebuild mantém (depende do saldo anterior de cada usuário)
+)
+
+WRITE_BATCH_SIZE = 400
+# read_time um pouco no passado: evita pedir um instante "futuro" ao servidor por diferença de relógio.
+# A varredura inteira precisa caber na janela de read_time do Firestore (uma hora).
+READ_TIME_LAG_SECONDS = 5
+
+def increment(db, deltas, transaction=None):
+    """Soma `deltas` num shard aleatório. Dentro de uma transação, entra no mesmo commit."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas: return
+    ref = db.collection(COLLECTION).document(f"shard_{random.randrange(AGGREGATE_SHARDS)}")
+    data = {k: firestore.Increment(v) for k, v in deltas.items()}
+    if transaction is not None: transaction.set(ref, data, merge=True)
+    else: ref.set(data, merge=True)
+
+def read(db):
+    totals = dict.fromkeys(FIELDS, 0)
+    for doc in db.collection(COLLECTION).stream():
+        for k, v in (doc.to_dict() or {}).items():
+            if k in totals and isinstance(v, (int, float)): totals[k] += v
+    return totals
+
+# --- DELTAS POR EVENTO ---
+def _split(bet_data):
+    split = bet_data.get("split_stake") or {}
+    return split.get("real", bet_data.get("betAmount", 0)), split.get("bonus", 0)
+
+def bet_placed(bet_data):
+    real, bonus = _split(bet_data)
+    return {
+        "pending_count": 1, "pending_volume": bet_data.get("betAmount", 0), "pending_real": real,
+        "pending_bonus": bonus, "liability": bet_data.get("potentialWinnings", 0), "total_bets": 1,
+        "holding_real": -real, "holding_bonus": -bonus
+    }
+
+def bet_resolved(bet_data, result, credited_real=0.0, credited_bonus=0.0):
+    real, bonus = _split(bet_data)
+    amount, win = bet_data.get("betAmount", 0), bet_data.get("potentialWinnings", 0)
+    deltas = {
+        "pending_count": -1, "pending_volume": -amount, "pending_real": -real,
+        "pending_bonus": -bonus, "liability": -win,
+        "holding_real": credited_real, "holding_bonus": credited_bonus
+    }
+    if result == "won": deltas.update(won_count=1, won_val=win, won_stake=amount)
+    elif result == "lost": deltas.update(lost_count=1, lost_val=amount)
+    return deltas
+
+def add_puuid_exposure(db, transaction, puuid, amount):
+    """Soma `amount` à exposição pendente da conta Riot (negativo ao resolver). A do usuário vai no update dele."""
+    if puuid: transaction.set(db.collection('riotAccountLinks').document(puuid), {"pending_liability": firestore.Increment(amount)}, merge=True)
+
+# --- RECONCILIAÇÃO ---
+def _exposure_fix(writes, ref, stored, expected):
+    """Diferença de pending_liability no read_time; vira Increment para não apagar o que as transações somaram depois."""
+    if abs(expected - stored) > 1e-6: writes.append((ref, expected - stored))
+
+def rebuild(db):
+    """Recalcula os agregados lendo apostas e usuários inteiros num mesmo read_time e soma no shard 0
+    a diferença para o que os shards tinham nesse instante."""
+    start = time.time()
+    read_time = datetime.now(timezone.utc) - timedelta(seconds=READ_TIME_LAG_SECONDS)
+    totals = dict.fromkeys(FIELDS, 0)
+    user_exposure, puuid_exposure = defaultdict(float), defaultdict(float)
+    for doc in db.collection('bets').stream(read_time=read_time):
+        b = doc.to_dict()
+        status, amount, win = b.get('status'), b.get('betAmount', 0), b.get('potentialWinnings', 0)
+        totals["total_bets"] += 1
+        if status == 'pending':
+            real, bonus = _split(b)
+            totals["pending_count"] += 1
+            totals["pending_volume"] += amount
+            totals["pending_real"] += real
+            totals["pending_bonus"] += bonus
+            totals["liability"] += win
+            user_exposure[b.get('userId')] += win
+            if b.get('puuid'): puuid_exposure[b['puuid']] += win
+        elif status == 'won':
+            totals["won_count"] += 1
+            totals["won_val"] += win
+            totals["won_stake"] += amount
+        elif status == 'lost':
+            totals["lost_count"] += 1
+            totals["lost_val"] += amount
+
+    writes = []
+    for doc in db.collection('users').select(['wallet', 'bonus_wallet', 'pending_liability']).stream(read_time=read_time):
+        u = doc.to_dict()
+        _exposure_fix(writes, doc.reference, u.get('pending_liability', 0), user_exposure.get(doc.id, 0))
+        w, b = u.get('wallet', 0.0), u.get('bonus_wallet', 0.0)
+        totals["holding_real"] += w
+        totals["holding_bonus"] += b
+        totals["total_users"] += 1
+        if w > 0 or b > 0: totals["users_with_balance"] += 1
+
+    for doc in db.collection('riotAccountLinks').select(['pending_liability']).stream(read_time=read_time):
+        _exposure_fix(writes, doc.reference, (doc.to_dict() or {}).get('pending_liability', 0), puuid_exposure.pop(doc.id, 0))
+    for puuid, exposure in puuid_exposure.items():
+        _exposure_fix(writes, db.collection('riotAccountLinks').document(puuid), 0, exposure)
+    for i in range(0, len(writes), WRITE_BATCH_SIZE):
+        batch = db.batch()
+        for ref, delta in writes[i:i + WRITE_BATCH_SIZE]: batch.set(ref, {"pending_liability": firestore.Increment(delta)}, merge=True)
+        batch.commit()
+
+    # Soma dos shards no mesmo read_time. Shards fora do range (sobra de quando havia mais) não recebem
+    # incrementos novos: são apagados e ficam de fora da soma, então a diferença repõe o valor deles no shard 0.
+    batch = db.batch()
+    shard_ids = {f"shard_{i}" for i in range(AGGREGATE_SHARDS)}
+    stored = dict.fromkeys(FIELDS, 0)
+    for doc in db.collection(COLLECTION).stream(read_time=read_time):
+        data = doc.to_dict() or {}
+        if doc.id in shard_ids:
+            for k in FIELDS:
+                if isinstance(data.get(k), (int, float)): stored[k] += data[k]
+        else: batch.delete(doc.reference)
+    diff = {k: totals[k] - stored[k] for k in FIELDS if abs(totals[k] - stored[k]) > 1e-6}
+    if diff: batch.set(db.collection(COLLECTION).document("shard_0"), {k: firestore.Increment(v) for k, v in diff.items()}, merge=True)
+    batch.commit()
+    print(f"[Aggregates] Reconstruídos em {time.time() - start:.2f}s ({len(diff)} campos corrigidos)")
+    return totals
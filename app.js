@@ -38,6 +38,7 @@ const appState = {
     currentUser: null,
     isRegistering: false,
     kycData: { fullname: '', cpf: '', birthdate: '', kyc_status: 'pending' },
+    oddsLadders: {},
     currentBetLimit: 3.00 * EXCHANGE_RATE,
     myReferralCode: ''
 };
@@ -737,8 +738,11 @@ async function handleRequestBet() {
     if (!target) return toggleError('request', "Insira meta.");
     toggleLoading('request', true);
     try {
-        const data = await fetchWithAuth('/api/request-bet', { method: 'POST', body: JSON.stringify({ gameType: appState.currentGame, target }) });
-        const c = data.challenge;
+        let c = priceFromLadder(appState.currentGame, target);
+        if (!c) {
+            const data = await fetchWithAuth('/api/request-bet', { method: 'POST', body: JSON.stringify({ gameType: appState.currentGame, target }) });
+            c = data.challenge;
+        }
         document.getElementById('request-result-title').textContent = c.title;
         document.getElementById('request-result-odd').textContent = c.odd.toFixed(2) + 'x';
         
@@ -756,6 +760,25 @@ async function handleRequestBet() {
     } catch (e) { toggleError('request', e.message); } finally { toggleLoading('request', false); }
 }
 
+// Escada de odds: o servidor devolve todos os alvos válidos de uma vez e o app precifica localmente
+async function loadOddsLadder(gameType) {
+    try {
+        appState.oddsLadders[gameType] = await fetchWithAuth('/api/get-odds-ladder', { method: 'POST', body: JSON.stringify({ gameType }) });
+    } catch (e) { delete appState.oddsLadders[gameType]; }
+}
+function priceFromLadder(gameType, targetValue) {
+    const ladder = appState.oddsLadders[gameType];
+    const target = parseInt(targetValue, 10);
+    if (!ladder || isNaN(target)) return null;
+    if (target <= ladder.avgKills) throw new Error(`Meta deve ser > ${ladder.avgKills.toFixed(1)}`);
+    const step = ladder.ladder[target - ladder.minTarget];
+    if (!step) throw new Error("Improvável (<1%)");
+    return {
+        id: `custom_${ladder.gameType}_${target}`, title: `Fazer +${target} Kills`, odd: step.odd,
+        conflictKey: `custom_target_${target}`, gameType: ladder.gameType, targetStat: 'kills', targetValue: target
+    };
+}
+
 // Placeholder Functions
 function handleAddCustomBetToSlip() {}
 function resetRequestModal() {
@@ -777,19 +800,34 @@ function openRequestBetModal() {
     document.getElementById('request-form-container').classList.remove('hidden');
     document.getElementById('request-result-container').classList.add('hidden');
     document.getElementById('request-target-input').value = '';
+    loadOddsLadder(appState.currentGame);
     toggleModal('request-bet-modal', true);
 }
-async function fetchAndRenderActiveBets() {
-    const list = document.getElementById('active-bets-list');
-    if(!list) return;
-    list.innerHTML = '<div class="loader mx-auto"></div>';
-    try {
-        const bets = await fetchWithAuth('/api/get-active-bets');
-        if (bets.length === 0) {
-            list.innerHTML = '<p class="text-[var(--text-secondary)] text-center italic">Nenhuma missão ativa no momento.</p>';
-            return;
-        }
-        list.innerHTML = bets.map(b => `
+// Listas de apostas paginadas: o servidor devolve { bets, nextCursor }; "Carregar mais" busca a próxima página
+async function loadBetsPage(list, endpoint, renderBet, emptyMsg, cursor = null) {
+    const data = await fetchWithAuth(cursor ? `${endpoint}?cursor=${encodeURIComponent(cursor)}` : endpoint);
+    if (!cursor) list.innerHTML = '';
+    const oldBtn = list.querySelector('.load-more-bets');
+    if (oldBtn) oldBtn.remove();
+    if (!cursor && data.bets.length === 0) {
+        list.innerHTML = `<p class="text-[var(--text-secondary)] text-center italic">${emptyMsg}</p>`;
+        return;
+    }
+    list.insertAdjacentHTML('beforeend', data.bets.map(renderBet).join(''));
+    if (data.nextCursor) {
+        const btn = document.createElement('button');
+        btn.className = 'load-more-bets w-full py-2 text-sm text-[var(--text-secondary)] bg-white/5 hover:bg-white/10 rounded border border-white/10';
+        btn.textContent = 'Carregar mais';
+        btn.onclick = () => {
+            btn.disabled = true;
+            loadBetsPage(list, endpoint, renderBet, emptyMsg, data.nextCursor).catch(e => { btn.disabled = false; showError(e.message); });
+        };
+        list.appendChild(btn);
+    }
+}
+
+function renderActiveBet(b) {
+    return `
             <div class="glass-card p-4 border-l-4 border-yellow-500 bg-white/5">
                 <div class="flex justify-between mb-2">
                     <span class="text-xs text-yellow-500 font-bold uppercase tracking-wider">Em Andamento</span>
@@ -803,26 +841,15 @@ async function fetchAndRenderActiveBets() {
                     <div class="text-right"><p class="text-xs text-[var(--text-secondary)] uppercase">Loot</p><p class="font-bold text-[var(--accent-cyan)] font-[Orbitron]">${(b.potentialWinnings * EXCHANGE_RATE).toFixed(0)} GC</p></div>
                 </div>
             </div>
-        `).join('');
-    } catch (e) { list.innerHTML = `<p class="text-red-400 text-center">${e.message}</p>`; }
+        `;
 }
 
-async function fetchAndRenderHistoryBets() {
-    const list = document.getElementById('history-bets-list');
-    if(!list) return;
-    list.innerHTML = '<div class="loader mx-auto"></div>';
-    try {
-        const bets = await fetchWithAuth('/api/get-history-bets');
-        if (bets.length === 0) {
-            list.innerHTML = '<p class="text-[var(--text-secondary)] text-center italic">Histórico vazio.</p>';
-            return;
-        }
-        list.innerHTML = bets.map(b => {
-            const borderColor = b.status === 'won' ? 'border-green-500' : (b.status === 'void' ? 'border-gray-500' : 'border-red-500');
-            const textColor = b.status === 'won' ? 'text-green-500' : (b.status === 'void' ? 'text-gray-500' : 'text-red-500');
-            const statusTxt = b.status === 'won' ? 'VITÓRIA' : (b.status === 'void' ? 'ANULADA' : 'DERROTA');
-            const winAmountGC = (b.status === 'won' ? (b.potentialWinnings - b.betAmount) : b.betAmount) * EXCHANGE_RATE;
-            return `
+function renderHistoryBet(b) {
+    const borderColor = b.status === 'won' ? 'border-green-500' : (b.status === 'void' ? 'border-gray-500' : 'border-red-500');
+    const textColor = b.status === 'won' ? 'text-green-500' : (b.status === 'void' ? 'text-gray-500' : 'text-red-500');
+    const statusTxt = b.status === 'won' ? 'VITÓRIA' : (b.status === 'void' ? 'ANULADA' : 'DERROTA');
+    const winAmountGC = (b.status === 'won' ? (b.potentialWinnings - b.betAmount) : b.betAmount) * EXCHANGE_RATE;
+    return `
             <div class="glass-card p-4 border-l-4 ${borderColor} bg-white/5 hover:bg-white/10 transition-colors">
                 <div class="flex justify-between mb-2">
                     <span class="text-xs ${textColor} font-bold uppercase tracking-wider">${statusTxt}</span>
@@ -834,8 +861,23 @@ async function fetchAndRenderHistoryBets() {
                     <span class="text-xs text-[var(--text-secondary)] px-2 py-1 bg-black/30 rounded border border-white/10">${b.totalOdd}x</span>
                 </div>
             </div>
-        `}).join('');
-    } catch (e) { list.innerHTML = `<p class="text-red-400 text-center">${e.message}</p>`; }
+        `;
+}
+
+async function fetchAndRenderActiveBets() {
+    const list = document.getElementById('active-bets-list');
+    if(!list) return;
+    list.innerHTML = '<div class="loader mx-auto"></div>';
+    try { await loadBetsPage(list, '/api/get-active-bets', renderActiveBet, 'Nenhuma missão ativa no momento.'); }
+    catch (e) { list.innerHTML = `<p class="text-red-400 text-center">${e.message}</p>`; }
+}
+
+async function fetchAndRenderHistoryBets() {
+    const list = document.getElementById('history-bets-list');
+    if(!list) return;
+    list.innerHTML = '<div class="loader mx-auto"></div>';
+    try { await loadBetsPage(list, '/api/get-history-bets', renderHistoryBet, 'Histórico vazio.'); }
+    catch (e) { list.innerHTML = `<p class="text-red-400 text-center">${e.message}</p>`; }
 }
 
 // ==================================================
@@ -0,0 +1,340 @@
+import copy
+import itertools
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import cmp_to_key
+
+from google.api_core.exceptions import Aborted
+from google.cloud.firestore_v1 import transforms
+
+# --- FIRESTORE EM MEMÓRIA (SÓ PARA O BENCHMARK) ---
+# Implementa o pedaço da API do google-cloud-firestore que o server.py usa: documentos, queries com
+# where/order_by/limit/select/start_after, batches e transações compatíveis com @firestore.transactional
+# (concorrência otimista: o commit aborta se algum documento lido mudou, e o decorator repete).
+# Cada operação conta leituras/gravações/exclusões como o Firestore cobraria e pode dormir
+# `latency` segundos para simular a ida e volta da rede.
+DESCENDING = "DESCENDING"
+# Leituras com read_time (retrato consistente num instante) usam o histórico de versões de cada
+# documento, guardado por HISTORY_SECONDS (o Firestore aceita read_time de até uma hora atrás).
+HISTORY_SECONDS = 3600
+
+class FakeFirestore:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._docs = {}      # (coleção, id) -> dict
+        self._versions = {}  # (coleção, id) -> versão (muda a cada gravação)
+        self._history = {}   # (coleção, id) -> [(horário do commit, dict ou None)]
+        self._lock = threading.Lock()
+        self._version_seq = itertools.count(1)
+        self._stats_lock = threading.Lock()
+        self.counters = dict.fromkeys(("reads", "writes", "deletes", "tx_commits", "tx_retries"), 0)
+
+    # --- API DO CLIENTE ---
+    def collection(self, name): return CollectionReference(self, name)
+    def batch(self): return WriteBatch(self)
+    def transaction(self, max_attempts=5, read_only=False): return Transaction(self, max_attempts, read_only)
+
+    def get_all(self, refs, field_paths=None, transaction=None, read_time=None):
+        refs = list(refs)
+        self._rpc()
+        with self._lock:
+            snaps = [self._snapshot(ref, field_paths, read_time) for ref in refs]
+            if transaction is not None:
+                for ref in refs: transaction._read_versions.setdefault(ref._key, self._versions.get(ref._key))
+        self._count(reads=len(refs))
+        return iter(snaps)
+
+    # --- CONTADORES ---
+    def reset_counters(self):
+        with self._stats_lock:
+            for k in self.counters: self.counters[k] = 0
+
+    def snapshot_counters(self):
+        with self._stats_lock: return dict(self.counters)
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for k, v in deltas.items(): self.counters[k] += v
+
+    def _rpc(self):
+        if self.latency: time.sleep(self.latency)
+
+    # --- ARMAZENAMENTO (chamar com _lock) ---
+    def _snapshot(self, ref, field_paths=None, read_time=None):
+        data = self._docs.get(ref._key) if read_time is None else self._at(ref._key, read_time)
+        if data is not None and field_paths is not None: data = _project(data, field_paths)
+        return DocumentSnapshot(ref, copy.deepcopy(data))
+
+    def _apply(self, op, ref, data=None, merge=False):
+        key = ref._key
+        if op == "delete":
+            self._docs.pop(key, None)
+            self._versions.pop(key, None)
+            return
+        current = self._docs.get(key)
+        if op == "update" and current is None: raise _not_found(ref)
+        if op == "create" and current is not None: raise ValueError(f"Documento já existe: {ref.path}")
+        base = copy.deepcopy(current) if (op == "update" or merge) and current is not None else {}
+        for path, value in data.items():
+            keys = path.split(".") if op == "update" else [path]
+            if op != "update" and merge and isinstance(value, dict) and not _is_transform(value):
+                _merge(base, path, value)
+            else: _write_path(base, keys, value)
+        self._docs[key] = base
+        self._versions[key] = next(self._version_seq)
+
+    def _record(self, keys):
+        now = time.time()
+        for key in keys:
+            entries = self._history.setdefault(key, [])
+            entries.append((now, self._docs.get(key)))
+            while len(entries) > 1 and entries[1][0] <= now - HISTORY_SECONDS: entries.pop(0)
+
+    def _at(self, key, read_time):
+        ts, data = read_time.timestamp(), None
+        for at, doc in self._history.get(key, ()):
+            if at > ts: break
+            data = doc
+        return data
+
+    def _query(self, collection, filters, orders, limit, select, cursor, read_time=None):
+        if read_time is None: rows = [(doc_id, data) for (col, doc_id), data in self._docs.items() if col == collection]
+        else:
+            rows = [(key[1], self._at(key, read_time)) for key in self._history if key[0] == collection]
+            rows = [(doc_id, data) for doc_id, data in rows if data is not None]
+        for field, op, value in filters: rows = [r for r in rows if _matches(r[1], field, op, value)]
+        for field, _ in orders: rows = [r for r in rows if _has(r[1], field)]
+        rows.sort(key=cmp_to_key(lambda a, b: _compare(a, b, orders)))
+        if cursor is not None: rows = [r for r in rows if _compare(r, cursor, orders) > 0]
+        if limit is not None: rows = rows[:limit]
+        return [DocumentSnapshot(DocumentReference(self, collection, doc_id),
+                                 copy.deepcopy(_project(data, select) if select is not None else data)) for doc_id, data in rows]
+
+class CollectionReference:
+    def __init__(self, db, name): self._db, self.id = db, name
+    def document(self, doc_id=None): return DocumentReference(self._db, self.id, doc_id or uuid.uuid4().hex[:20])
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+    def __getattr__(self, name): return getattr(Query(self._db, self.id), name)
+
+class DocumentReference:
+    def __init__(self, db, collection, doc_id):
+        self._db, self.id, self._collection = db, doc_id, collection
+        self._key = (collection, doc_id)
+    @property
+    def path(self): return f"{self._collection}/{self.id}"
+
+    def get(self, field_paths=None, transaction=None, read_time=None):
+        db = self._db
+        db._rpc()
+        with db._lock:
+            snap = db._snapshot(self, field_paths, read_time)
+            if transaction is not None: transaction._read_versions.setdefault(self._key, db._versions.get(self._key))
+        db._count(reads=1)
+        return snap
+
+    def _write(self, op, data=None, merge=False):
+        db = self._db
+        db._rpc()
+        with db._lock:
+            db._apply(op, self, data, merge)
+            db._record([self._key])
+        db._count(**({"deletes": 1} if op == "delete" else {"writes": 1}))
+
+    def set(self, data, merge=False): self._write("set", data, merge)
+    def create(self, data): self._write("create", data)
+    def update(self, data): self._write("update", data)
+    def delete(self): self._write("delete")
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference, self.id, self._data = reference, reference.id, data
+    @property
+    def exists(self): return self._data is not None
+    def to_dict(self): return copy.deepcopy(self._data)
+    def get(self, field_path):
+        value = self._data
+        for key in field_path.split("."):
+            if not isinstance(value, dict) or key not in value: raise KeyError(field_path)
+            value = value[key]
+        return copy.deepcopy(value)
+
+class Query:
+    def __init__(self, db, collection, filters=(), orders=(), limit=None, select=None, cursor=None):
+        self._db, self._collection = db, collection
+        self._filters, self._orders, self._limit, self._select, self._cursor = filters, orders, limit, select, cursor
+
+    def _copy(self, **changes):
+        args = {"filters": self._filters, "orders": self._orders, "limit": self._limit, "select": self._select, "cursor": self._cursor}
+        args.update(changes)
+        return Query(self._db, self._collection, **args)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None: field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+    def order_by(self, field_path, direction="ASCENDING"): return self._copy(orders=self._orders + ((field_path, direction),))
+    def limit(self, count): return self._copy(limit=count)
+    def select(self, field_paths): return self._copy(select=list(field_paths))
+    def start_after(self, snapshot):
+        data = snapshot.to_dict() if isinstance(snapshot, DocumentSnapshot) else snapshot
+        return self._copy(cursor=(getattr(snapshot, "id", ""), data or {}))
+
+    def stream(self, transaction=None, read_time=None):
+        db = self._db
+        db._rpc()
+        with db._lock:
+            snaps = db._query(self._collection, self._filters, self._orders, self._limit, self._select, self._cursor, read_time)
+            if transaction is not None:
+                for s in snaps: transaction._read_versions.setdefault(s.reference._key, db._versions.get(s.reference._key))
+        db._count(reads=max(len(snaps), 1))  # query vazia ainda cobra uma leitura
+        return iter(snaps)
+    def get(self, transaction=None, read_time=None): return list(self.stream(transaction, read_time))
+
+class WriteBatch:
+    def __init__(self, db): self._db, self._ops = db, []
+    def set(self, ref, data, merge=False): self._ops.append(("set", ref, data, merge))
+    def create(self, ref, data): self._ops.append(("create", ref, data, False))
+    def update(self, ref, data): self._ops.append(("update", ref, data, False))
+    def delete(self, ref): self._ops.append(("delete", ref, None, False))
+    def commit(self):
+        ops, self._ops = self._ops, []
+        _commit(self._db, ops)
+        return ops
+
+class Transaction(WriteBatch):
+    """Segue o protocolo que google.cloud.firestore_v1.transaction._Transactional espera."""
+    _ids = itertools.count(1)
+
+    def __init__(self, db, max_attempts=5, read_only=False):
+        super().__init__(db)
+        self._max_attempts, self._read_only = max_attempts, read_only
+        self._id, self._read_versions = None, {}
+
+    def _clean_up(self):
+        self._ops, self._read_versions, self._id = [], {}, None
+
+    def _begin(self, retry_id=None):
+        if retry_id is not None: self._db._count(tx_retries=1)
+        self._id = next(self._ids)
+
+    def _commit(self):
+        ops, reads = self._ops, self._read_versions
+        self._clean_up()
+        _commit(self._db, ops, reads)
+        self._db._count(tx_commits=1)
+        return ops
+
+    def _rollback(self): self._clean_up()
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference): return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+def _commit(db, ops, reads=None):
+    db._rpc()
+    with db._lock:
+        # Concorrência otimista: qualquer documento lido que mudou desde a leitura aborta o commit
+        if reads and any(db._versions.get(key) != version for key, version in reads.items()):
+            raise Aborted("Transação em conflito")
+        # Commit é atômico: se alguma operação falhar (update em documento inexistente, create repetido),
+        # os documentos tocados voltam ao estado de antes e nada do lote fica gravado
+        saved = {ref._key: (db._docs.get(ref._key), db._versions.get(ref._key)) for _, ref, _, _ in ops}
+        try:
+            for op, ref, data, merge in ops: db._apply(op, ref, data, merge)
+        except Exception:
+            for key, (doc, version) in saved.items():
+                if doc is None: db._docs.pop(key, None); db._versions.pop(key, None)
+                else: db._docs[key], db._versions[key] = doc, version
+            raise
+        db._record(saved)
+    deletes = sum(1 for op in ops if op[0] == "delete")
+    db._count(writes=len(ops) - deletes, deletes=deletes)
+
+# --- VALORES E CAMINHOS ---
+def _not_found(ref):
+    from google.api_core.exceptions import NotFound
+    return NotFound(f"Documento não encontrado: {ref.path}")
+
+def _is_transform(value):
+    return value is transforms.SERVER_TIMESTAMP or value is transforms.DELETE_FIELD or isinstance(value, (transforms.Increment, transforms.ArrayUnion, transforms.ArrayRemove))
+
+def _merge(target, key, value):
+    node = target.setdefault(key, {})
+    if not isinstance(node, dict): node = target[key] = {}
+    for k, v in value.items():
+        if isinstance(v, dict) and not _is_transform(v): _merge(node, k, v)
+        else: _write_path(node, [k], v)
+
+def _write_path(target, keys, value):
+    for key in keys[:-1]:
+        node = target.get(key)
+        if not isinstance(node, dict): node = target[key] = {}
+        target = node
+    key = keys[-1]
+    if value is transforms.DELETE_FIELD: target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP: target[key] = datetime.now(timezone.utc)
+    elif isinstance(value, transforms.Increment):
+        current = target.get(key)
+        target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key) or [])
+        target[key] = current + [v for v in value.values if v not in current]
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [v for v in target.get(key) or [] if v not in value.values]
+    else: target[key] = copy.deepcopy(_resolve_nested(value))
+
+def _resolve_nested(value):
+    """Sentinelas aninhadas num dict gravado por set() (ex.: connectedAt: SERVER_TIMESTAMP)."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items(): _write_path(out, [k], v)
+        return out
+    return value
+
+def _lookup(data, field):
+    for key in field.split("."):
+        if not isinstance(data, dict) or key not in data: return _MISSING
+        data = data[key]
+    return data
+
+_MISSING = object()
+
+def _has(data, field): return _lookup(data, field) is not _MISSING
+
+def _project(data, field_paths):
+    out = {}
+    for field in field_paths:
+        value = _lookup(data, field)
+        if value is not _MISSING: _write_path(out, field.split("."), value)
+    return out
+
+def _matches(data, field, op, value):
+    current = _lookup(data, field)
+    if current is _MISSING: return False
+    try:
+        if op == "==": return current == value
+        if op == "!=": return current != value
+        if op == "<": return current < value
+        if op == "<=": return current <= value
+        if op == ">": return current > value
+        if op == ">=": return current >= value
+        if op == "in": return current in value
+        if op == "not-in": return current not in value
+        if op == "array-contains": return isinstance(current, list) and value in current
+        if op == "array-contains-any": return isinstance(current, list) and any(v in current for v in value)
+    except TypeError: return False
+    raise ValueError(f"Operador não suportado: {op}")
+
+def _compare(a, b, orders):
+    """Compara (id, dados) pelos campos do order_by e, no empate, pelo id (como o Firestore)."""
+    for field, direction in orders:
+        x, y = _lookup(a[1], field), _lookup(b[1], field)
+        if x == y: continue
+        try: result = -1 if x < y else 1
+        except TypeError: result = -1 if str(x) < str(y) else 1
+        return -result if direction == DESCENDING else result
+    return (a[0] > b[0]) - (a[0] < b[0])
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from riot_simulator import SIM_GAME_PERIOD_SECONDS, active_game, finished_matches, game_window, match_document, puuid_for
+
+# --- RIOT API FALSA (EM PROCESSO) ---
+# Responde às rotas que o riot_api usa (account-v1, summoner-v4, match-v5, spectator-v5) sem sair
+# do processo: é plugada como transport do httpx.AsyncClient do riot_client, então o rate limiter e
+# as lanes continuam no caminho medido. Jogadores e partidas vêm dos mesmos geradores do
+# riot_simulator.py; aqui só não há latência de rede, perfis de falha nem limites simulados.
+# O relógio é próprio: advance() adianta um período de jogo, o que dá a todo jogador uma partida
+# nova, que é o que o resolvedor procura.
+RATE_LIMIT_HEADERS = {"X-App-Rate-Limit": "500:10,30000:600", "X-Method-Rate-Limit": "2000:10"}
+
+class RiotStub:
+    def __init__(self, latency=0.0, spectator=False):
+        self.latency = latency
+        self.spectator = spectator  # False: ninguém em partida (o anti-snipping não barra apostas do bench)
+        self.offset = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def now(self): return time.time() + self.offset
+
+    def advance(self):
+        """Todo jogador passa a ter uma partida nova (fim de um ciclo de jogos)."""
+        self.offset += SIM_GAME_PERIOD_SECONDS
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request):
+        with self._lock: self.calls += 1
+        if self.latency: await asyncio.sleep(self.latency)
+        path, params, now = request.url.path, request.url.params, self.now()
+        if "/riot/account/v1/accounts/by-riot-id/" in path:
+            name, tag = path.rsplit("/", 2)[-2:]
+            return self._json({"puuid": puuid_for(name, tag), "gameName": name, "tagLine": tag})
+        if "/lol/summoner/v4/summoners/by-puuid/" in path:
+            return self._json({"puuid": path.rsplit("/", 1)[1], "summonerLevel": 250})
+        if "/lol/spectator/v5/active-games/by-summoner/" in path:
+            game = active_game(path.rsplit("/", 1)[1], now) if self.spectator else None
+            return self._json(game) if game else httpx.Response(404, headers=RATE_LIMIT_HEADERS)
+        if "/lol/match/v5/matches/by-puuid/" in path:
+            puuid = path.split("/by-puuid/")[1].split("/")[0]
+            start_time, end_time = params.get("startTime"), params.get("endTime")
+            return self._json(finished_matches(
+                puuid, now, int(start_time) if start_time else None, int(end_time) if end_time else None,
+                int(params.get("start", 0)), min(int(params.get("count", 20)), 100)
+            ))
+        if "/lol/match/v5/matches/" in path:
+            mid = path.rsplit("/", 1)[1]
+            try: puuid, k = mid[len("BR1_"):].rsplit("_", 1)
+            except ValueError: return httpx.Response(404, headers=RATE_LIMIT_HEADERS)
+            begin, duration = game_window(puuid, int(k))
+            if begin + duration > now: return httpx.Response(404, headers=RATE_LIMIT_HEADERS)
+            return self._json(match_document(mid))
+        return httpx.Response(404, headers=RATE_LIMIT_HEADERS)
+
+    @staticmethod
+    def _json(data): return httpx.Response(200, json=data, headers=RATE_LIMIT_HEADERS)
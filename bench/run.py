@@ -0,0 +1,258 @@
+"""
+Benchmark de ponta a ponta da API (server.app), sem Firestore, Firebase Auth ou Riot de verdade.
+
+    python bench/run.py --users 500 --concurrency 32 --duration 10
+    python bench/run.py --scenarios mix,resolver --firestore-latency-ms 8 --riot-latency-ms 40 --json out.json
+
+O app roda em processo via httpx.ASGITransport (como um worker do uvicorn). O Firestore é o
+bench/fake_firestore.py (ou o emulador, com --firestore emulator e FIRESTORE_EMULATOR_HOST), o token
+é verificado por um stub e a Riot é o bench/riot_stub.py plugado no pool do riot_client
+(ou o riot_simulator.py, com --riot-url http://127.0.0.1:8010).
+Cada cenário reporta RPS, p50/p95/p99 e leituras/gravações do Firestore e chamadas à Riot por requisição.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("user-data", "challenges", "place-bet", "mix", "resolver")
+MIX = (("user-data", 0.50), ("challenges", 0.35), ("place-bet", 0.15))
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark da API Glitch Arena")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"lista separada por vírgula ({', '.join(SCENARIOS)})")
+    p.add_argument("--users", type=int, default=500, help="usuários com conta LoL conectada")
+    p.add_argument("--concurrency", type=int, default=32, help="requisições simultâneas")
+    p.add_argument("--duration", type=float, default=10.0, help="segundos por cenário HTTP")
+    p.add_argument("--requests", type=int, default=0, help="limite de requisições por cenário (0 = só duração)")
+    p.add_argument("--firestore", choices=("memory", "emulator"), default="memory")
+    p.add_argument("--firestore-latency-ms", type=float, default=0.0, help="latência simulada por RPC (só memory)")
+    p.add_argument("--riot-latency-ms", type=float, default=0.0)
+    p.add_argument("--riot-url", help="usa o riot_simulator.py rodando nesta URL em vez do stub em processo")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--json", help="grava os resultados neste arquivo")
+    p.add_argument("--verbose", action="store_true", help="mostra os logs do servidor")
+    return p.parse_args(argv)
+
+# --- AMBIENTE ---
+def boot(args):
+    """Importa o server com Firestore, Auth e Riot trocados pelos dublês. Retorna (server, db, riot)."""
+    os.environ.setdefault("RIOT_API_KEY", "bench-key")
+    os.environ.setdefault("RIOT_APP_RATE_LIMIT", "500:10,30000:600")
+    os.environ.setdefault("MATCH_CACHE_MAX_MB", "0")
+    os.environ.setdefault("CONFIG_SNAPSHOT_LISTENER", "0")
+
+    import firebase_admin
+    from firebase_admin import firestore as admin_firestore
+    if args.firestore == "emulator":
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"): sys.exit("--firestore emulator requer FIRESTORE_EMULATOR_HOST")
+        from google.cloud import firestore as gcloud_firestore
+        db = gcloud_firestore.Client(project=os.getenv("GCLOUD_PROJECT", "glitch-arena-bench"))
+    else:
+        from fake_firestore import FakeFirestore
+        db = FakeFirestore(latency=args.firestore_latency_ms / 1000)
+    if not firebase_admin._apps: firebase_admin.initialize_app(options={"projectId": "glitch-arena-bench"})
+    admin_firestore.client = lambda app=None: db
+
+    if args.riot_url:
+        os.environ["RIOT_API_BASE_URL"] = args.riot_url
+        riot = SimulatorRiot(args.riot_url)
+    else:
+        import riot_client
+        from riot_stub import RiotStub
+        import httpx
+        riot = RiotStub(latency=args.riot_latency_ms / 1000)
+        async def create_client(): return httpx.AsyncClient(transport=riot.transport(), timeout=5)
+        riot_client._create_client = create_client
+
+    import server
+    import token_cache
+    server.id_tokens = token_cache.TokenCache(_verify_bench_token)
+    if not args.verbose:
+        for name in ("GlitchArena", "httpx"): logging.getLogger(name).setLevel(logging.WARNING)
+    return server, db, riot
+
+class SimulatorRiot:
+    """Mesma interface do RiotStub (advance/calls), falando com o riot_simulator.py por HTTP."""
+    def __init__(self, base_url): self.base_url = base_url.rstrip("/")
+    def advance(self):
+        import httpx
+        httpx.post(f"{self.base_url}/__sim/advance", json={}).raise_for_status()
+    @property
+    def calls(self):
+        import httpx
+        return httpx.get(f"{self.base_url}/__sim/stats").json()["total"]
+
+def _verify_bench_token(token):
+    """Token do benchmark: `bench:<uid>` (ou `bench-admin:<uid>`). Vale por uma hora."""
+    kind, uid = token.split(":", 1)
+    if kind not in ("bench", "bench-admin"): raise ValueError("Token inválido")
+    return {"uid": uid, "email": f"{uid}@bench.local", "admin": kind == "bench-admin", "exp": time.time() + 3600}
+
+def seed(server, db, n_users, rng):
+    """Cria usuários com carteira e conta LoL conectada (stats sintéticos, já atualizados)."""
+    batch, users = db.batch(), []
+    for i in range(n_users):
+        uid, puuid = f"user{i:05d}", f"bench-puuid-{i:05d}"
+        recent = lambda mean: [max(0, round(rng.gauss(mean, mean / 2))) for _ in range(7)]
+        kills, assists, deaths = rng.uniform(2, 10), rng.uniform(3, 14), rng.uniform(2, 8)
+        stats = {
+            "winRate": rng.uniform(0.35, 0.65), "avgKills": kills, "avgAssists": assists, "avgDeaths": deaths,
+            "recent_wins": [rng.random() < 0.5 for _ in range(7)], "recent_kills": recent(kills),
+            "recent_assists": recent(assists), "recent_deaths": recent(deaths),
+            "player_roles": [rng.choice(("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"))] * 20,
+            "mvp_team_frequency": rng.uniform(0.05, 0.35), "top_damage_frequency": rng.uniform(0.05, 0.35),
+            "summonerLevel": 250
+        }
+        batch.set(db.collection("users").document(uid), {
+            "email": f"{uid}@bench.local", "wallet": 1000.0, "bonus_wallet": 0.0, "rollover_target": 0.0,
+            "profit_loss": 0.0, "total_bets_made": 0, "kyc_status": "pending", "currentBetLimit": 3.0,
+            "connection_status": "connected", "my_referral_code": f"GLITCH{i:05d}",
+            "connectedAccounts": {"lol": {"playerId": f"Bench{i}#BR1", "puuid": puuid, "stats": stats, "statsUpdatedAt": time.time()}}
+        })
+        batch.set(db.collection("riotAccountLinks").document(puuid), {"linkedToUserId": uid})
+        users.append(uid)
+        if len(users) % 400 == 0: batch.commit(); batch = db.batch()
+    batch.commit()
+    return users
+
+# --- CARGA ---
+def _percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))]
+
+async def drive(client, next_request, concurrency, duration, max_requests):
+    """Dispara `concurrency` clientes em loop até a duração (ou o limite de requisições) acabar."""
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline and (not max_requests or issued < max_requests):
+            issued += 1
+            method, url, kwargs = next_request()
+            start = time.perf_counter()
+            try: status = (await client.request(method, url, **kwargs)).status_code
+            except Exception: status = "exc"
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+def request_factory(name, users, boards, rng):
+    def auth(uid): return {"headers": {"Authorization": f"Bearer bench:{uid}"}}
+    def user_data():
+        return "GET", "/api/get-user-data", auth(rng.choice(users))
+    def challenges():
+        return "POST", "/api/get-challenges", {**auth(rng.choice(users)), "json": {"gameType": "lol"}}
+    def place_bet():
+        uid = rng.choice(users)
+        return "POST", "/api/place-bet", {**auth(uid), "json": {"betAmount": 1.0, "betItems": [rng.choice(boards[uid])]}}
+    makers = {"user-data": user_data, "challenges": challenges, "place-bet": place_bet}
+    if name != "mix": return makers[name]
+    names, weights = zip(*MIX)
+    return lambda: makers[rng.choices(names, weights)[0]]()
+
+class Meter:
+    """Diferença dos contadores do Firestore (só no fake) e de chamadas à Riot durante um cenário."""
+    def __init__(self, db, riot):
+        self.db, self.riot = db, riot
+        self._start = self._read()
+    def _read(self):
+        counters = self.db.snapshot_counters() if hasattr(self.db, "snapshot_counters") else {}
+        return {**counters, "riot_calls": self.riot.calls}
+    def delta(self):
+        end = self._read()
+        return {k: end[k] - self._start.get(k, 0) for k in end}
+
+def summarize(name, latencies, statuses, elapsed, usage, units=None):
+    ordered = sorted(latencies)
+    units = units or len(latencies)
+    errors = sum(v for k, v in statuses.items() if k == "exc" or k >= 400)
+    row = {
+        "scenario": name, "requests": len(latencies), "errors": errors, "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 2), "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 2), "statuses": {str(k): v for k, v in statuses.items()}
+    }
+    for k, v in usage.items(): row[f"{k}_per_req"] = round(v / units, 2) if units else 0.0
+    return row
+
+async def run_http(name, server, db, riot, users, boards, args, rng):
+    import httpx
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench") as client:
+        meter = Meter(db, riot)
+        latencies, statuses, elapsed = await drive(client, request_factory(name, users, boards, rng), args.concurrency, args.duration, args.requests)
+        return summarize(name, latencies, statuses, elapsed, meter.delta())
+
+async def run_resolver(server, db, riot, args):
+    """Todo jogador com aposta pendente termina uma partida; mede um ciclo forçado do resolvedor."""
+    pending = sum(1 for _ in db.collection("bets").where("status", "==", "pending").stream())
+    riot.advance()
+    meter = Meter(db, riot)
+    start = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, server._resolve_bets_logic, True)
+    elapsed = time.perf_counter() - start
+    left = sum(1 for _ in db.collection("bets").where("status", "==", "pending").stream())
+    row = summarize("resolver", [elapsed], {200: 1}, elapsed, meter.delta(), units=max(pending, 1))
+    row.update(requests=pending, rps=round((pending - left) / elapsed, 1) if elapsed else 0.0, settled=pending - left)
+    return row
+
+async def prepare_boards(server, users):
+    """Painel de cada usuário (fora da medição), para o place-bet apostar em desafios reais."""
+    import httpx
+    boards = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench") as client:
+        for uid in users:
+            res = await client.post("/api/get-challenges", json={"gameType": "lol"}, headers={"Authorization": f"Bearer bench:{uid}"})
+            res.raise_for_status()
+            boards[uid] = res.json()
+    return boards
+
+def print_table(rows):
+    cols = ["scenario", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "reads_per_req", "writes_per_req", "riot_calls_per_req"]
+    print(" | ".join(f"{c:>18}" for c in cols))
+    for r in rows: print(" | ".join(f"{str(r.get(c, 'n/a')):>18}" for c in cols))
+
+async def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown: sys.exit(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        server, db, riot = boot(args)
+        users = seed(server, db, args.users, rng)
+        boards = await prepare_boards(server, users) if {"place-bet", "mix"} & set(scenarios) else {}
+        rows = []
+        for name in scenarios:
+            if name == "resolver": rows.append(await run_resolver(server, db, riot, args))
+            else: rows.append(await run_http(name, server, db, riot, users, boards, args, rng))
+
+    riot_desc = args.riot_url or f"stub {args.riot_latency_ms}ms"
+    print(f"usuários={args.users} concorrência={args.concurrency} duração={args.duration}s firestore={args.firestore} "
+          f"latência firestore={args.firestore_latency_ms}ms riot={riot_desc}")
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f: json.dump({"args": vars(args), "results": rows}, f, indent=2)
+    server.riot_client.close()
+    server.io_pool.shutdown()
+    return rows
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+
+# --- AGENDA ADAPTATIVA DA RESOLUÇÃO DE APOSTAS ---
+# Antes o resolvedor consultava a Riot para todo jogador com aposta pendente a cada 10 minutos,
+# mesmo quem ainda nem entrou na fila. Agora cada puuid tem o seu próximo horário de consulta:
+#   - logo após a aposta: espera FIRST_POLL_SECONDS (fila + duração mínima de uma partida);
+#   - sem partida nova e jogador em partida (Spectator): volta em gameStartTime + EXPECTED_GAME_SECONDS;
+#   - sem partida nova e jogador livre: backoff exponencial a partir de BACKOFF_BASE_SECONDS,
+#     limitado pelo `system.resolution_interval_minutes` da config.
+# O estado é só em memória: a varredura completa periódica (server._resolve_bets_logic) recria a
+# agenda a partir das apostas pendentes no Firestore depois de um restart.
+FIRST_POLL_SECONDS = float(os.getenv("RESOLVER_FIRST_POLL_SECONDS", "1200"))
+EXPECTED_GAME_SECONDS = float(os.getenv("RESOLVER_EXPECTED_GAME_SECONDS", "1500"))
+BACKOFF_BASE_SECONDS = float(os.getenv("RESOLVER_BACKOFF_BASE_SECONDS", "120"))
+# A match-v5 leva um tempo para publicar a partida depois que ela acaba
+MATCH_PUBLISH_DELAY_SECONDS = 60
+
+class ResolutionSchedule:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = {}    # puuid -> epoch da próxima consulta
+        self._misses = {}  # puuid -> consultas seguidas sem partida nova (jogador fora de partida)
+
+    def track(self, puuid, placed_at=None):
+        """Passa a acompanhar o puuid (aposta nova). Não mexe numa consulta já agendada."""
+        with self._lock:
+            if puuid not in self._next: self._next[puuid] = (placed_at or time.time()) + FIRST_POLL_SECONDS
+
+    def sync(self, pending):
+        """Alinha a agenda com as apostas pendentes lidas do banco: {puuid: horário da aposta mais antiga}."""
+        with self._lock:
+            for puuid in [p for p in self._next if p not in pending]: self._forget(puuid)
+            for puuid, placed_at in pending.items():
+                if puuid not in self._next: self._next[puuid] = placed_at + FIRST_POLL_SECONDS
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock: return [p for p, at in self._next.items() if at <= now]
+
+    def resolved(self, puuid):
+        with self._lock: self._forget(puuid)
+
+    def no_match(self, puuid, max_interval, game_start=None, now=None):
+        """Consulta sem partida nova. `game_start` (segundos) vem do Spectator quando o jogador está em partida."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if game_start:
+                self._misses[puuid] = 0
+                expected_end = game_start + EXPECTED_GAME_SECONDS + MATCH_PUBLISH_DELAY_SECONDS
+                self._next[puuid] = max(expected_end, now + BACKOFF_BASE_SECONDS)
+            else:
+                misses = self._misses.get(puuid, 0)
+                self._misses[puuid] = misses + 1
+                self._next[puuid] = now + min(BACKOFF_BASE_SECONDS * (2 ** misses), max_interval)
+
+    def _forget(self, puuid):
+        self._next.pop(puuid, None)
+        self._misses.pop(puuid, None)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            upcoming = sorted(self._next.values())
+            return {
+                "tracked": len(upcoming), "due": sum(1 for at in upcoming if at <= now),
+                "next_in_seconds": round(max(upcoming[0] - now, 0), 1) if upcoming else None
+            }
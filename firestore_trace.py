@@ -0,0 +1,232 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+import metrics
+
+# --- FIRESTORE INSTRUMENTADO ---
+# Casca fina sobre o cliente do Firestore: coleções, documentos, queries, batches e transações
+# passam por aqui e cada ida ao servidor é cronometrada por tipo de operação (read, query, write,
+# batch_commit, tx_commit). Para o SDK, tudo que é embrulhado é desembrulhado antes de seguir,
+# então @firestore.transactional e referências vindas de snapshots (doc.reference) continuam valendo.
+#
+# Também conta o que o Firestore cobra (documentos lidos, gravados e excluídos, e novas tentativas
+# de transação) no escopo atual: cada requisição HTTP (middleware do server) e cada job (`@job`)
+# abre um `track(source)`, propagado por contextvars até o io_pool. Ao fechar, os totais vão para
+# /metrics e são comparados com o orçamento da rota, se houver.
+#   FIRESTORE_BUDGETS='{"/api/get-user-data": 3, "job:resolver": {"reads": 5000, "writes": 2000}}'
+# (número sozinho = limite de leituras). Estourou, loga um aviso; nada é bloqueado.
+OP_SECONDS = metrics.histogram("firestore_operation_duration_seconds", "Duração das chamadas ao Firestore por operação", ["op"])
+OP_ERRORS = metrics.counter("firestore_operation_errors_total", "Chamadas ao Firestore que falharam, por operação", ["op"])
+DOCUMENTS = metrics.counter("firestore_documents_total", "Documentos lidos/gravados/excluídos por rota ou job", ["source", "kind"])
+TX_RETRIES = metrics.counter("firestore_transaction_retries_total", "Novas tentativas de transação por rota ou job", ["source"])
+READS_PER_SCOPE = metrics.histogram("firestore_reads_per_scope", "Documentos lidos por requisição/execução de job", ["source"],
+                                    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000))
+BUDGET_EXCEEDED = metrics.counter("firestore_budget_exceeded_total", "Requisições/jobs acima do orçamento de Firestore", ["source"])
+
+KINDS = ("reads", "writes", "deletes", "tx_retries")
+
+def _parse_budgets(raw):
+    if not raw: return {}
+    try: data = json.loads(raw)
+    except ValueError:
+        print("[Firestore] FIRESTORE_BUDGETS inválido (esperado JSON), ignorando.")
+        return {}
+    return {source: (limits if isinstance(limits, dict) else {"reads": limits}) for source, limits in data.items()}
+
+BUDGETS = _parse_budgets(os.getenv("FIRESTORE_BUDGETS", ""))
+
+# --- CONTABILIDADE POR ESCOPO ---
+class Usage:
+    __slots__ = ("source", "reads", "writes", "deletes", "tx_retries", "closed", "_lock")
+
+    def __init__(self, source):
+        self.source = source
+        self.reads = self.writes = self.deletes = self.tx_retries = 0
+        self.closed = False
+        self._lock = threading.Lock()  # o mesmo escopo recebe contagens de várias threads (io_pool, workers)
+
+    def add(self, reads=0, writes=0, deletes=0, tx_retries=0):
+        with self._lock:
+            self.reads += reads
+            self.writes += writes
+            self.deletes += deletes
+            self.tx_retries += tx_retries
+
+    def as_dict(self): return {k: getattr(self, k) for k in KINDS}
+
+    def __str__(self): return " ".join(f"{k}={getattr(self, k)}" for k in KINDS)
+
+_current = contextvars.ContextVar("firestore_usage", default=None)
+
+def current():
+    """Usage do escopo atual, ou None fora de requisição/job."""
+    return _current.get()
+
+def _count(**deltas):
+    usage = _current.get()
+    if usage is not None: usage.add(**deltas)
+
+@contextlib.contextmanager
+def track(source="unknown"):
+    """Abre um escopo de contagem. `usage.source` pode ser ajustado antes de sair (ex.: rota só conhecida no fim).
+    Escopo aninhado (job chamado dentro de uma rota) também soma no de fora, se este ainda estiver aberto;
+    BackgroundTasks rodam depois da resposta e ficam só com o próprio escopo."""
+    usage, parent = Usage(source), _current.get()
+    token = _current.set(usage)
+    try: yield usage
+    finally:
+        _current.reset(token)
+        usage.closed = True
+        _finish(usage)
+        if parent is not None and not parent.closed: parent.add(**usage.as_dict())
+
+def job(source):
+    """Decorator para jobs de background (scheduler, BackgroundTasks): cada execução é um escopo `job:<source>`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with track(f"job:{source}"): return fn(*args, **kwargs)
+        return run
+    return wrap
+
+def _finish(usage):
+    for kind, value in (("read", usage.reads), ("write", usage.writes), ("delete", usage.deletes)):
+        if value: DOCUMENTS.inc(value, source=usage.source, kind=kind)
+    if usage.tx_retries: TX_RETRIES.inc(usage.tx_retries, source=usage.source)
+    READS_PER_SCOPE.observe(usage.reads, source=usage.source)
+    budget = BUDGETS.get(usage.source)
+    if not budget: return
+    over = [f"{k}={getattr(usage, k)}>{limit}" for k, limit in budget.items() if k in KINDS and getattr(usage, k) > limit]
+    if over:
+        BUDGET_EXCEEDED.inc(source=usage.source)
+        print(f"[Firestore] Orçamento excedido em {usage.source}: {', '.join(over)}")
+
+def _timed(op, fn, *args, **kwargs):
+    start = time.perf_counter()
+    try: return fn(*args, **kwargs)
+    except Exception:
+        OP_ERRORS.inc(op=op)
+        raise
+    finally: OP_SECONDS.observe(time.perf_counter() - start, op=op)
+
+def _timed_stream(iterator_fn):
+    """Queries são streams: o tempo vai até o último documento (ou até o consumidor parar)."""
+    start, failed, docs = time.perf_counter(), False, 0
+    try:
+        for item in iterator_fn():
+            docs += 1
+            yield TracedSnapshot(item)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        if failed: OP_ERRORS.inc(op="query")
+        OP_SECONDS.observe(time.perf_counter() - start, op="query")
+        _count(reads=max(docs, 1))  # query sem resultado ainda cobra uma leitura
+
+def _raw(obj): return getattr(obj, "_inner", obj)
+
+class _Proxy:
+    def __init__(self, inner): self._inner = inner
+    def __getattr__(self, name): return getattr(self._inner, name)
+
+class TracedClient(_Proxy):
+    def collection(self, *path): return TracedQuery(self._inner.collection(*path))
+    def document(self, *path): return TracedDocument(self._inner.document(*path))
+    def batch(self): return TracedBatch(self._inner.batch())
+    def transaction(self, **kwargs): return TracedTransaction(self._inner.transaction(**kwargs))
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        refs = [_raw(r) for r in references]
+        snaps = _timed("read", lambda: list(self._inner.get_all(refs, field_paths=field_paths, transaction=_raw(transaction), **kwargs)))
+        _count(reads=len(refs))
+        return iter(TracedSnapshot(s) for s in snaps)
+
+class TracedQuery(_Proxy):
+    """CollectionReference ou Query. Qualquer método que devolva outra query continua embrulhado."""
+    def document(self, *path): return TracedDocument(self._inner.document(*path))
+    def add(self, document_data, document_id=None):
+        ts, ref = _timed("write", self._inner.add, document_data, document_id=document_id)
+        _count(writes=1)
+        return ts, TracedDocument(ref)
+    def stream(self, transaction=None, **kwargs): return _timed_stream(lambda: self._inner.stream(transaction=_raw(transaction), **kwargs))
+    def get(self, transaction=None, **kwargs): return list(self.stream(transaction, **kwargs))
+    def start_after(self, document_fields_or_snapshot): return TracedQuery(self._inner.start_after(_raw(document_fields_or_snapshot)))
+    def start_at(self, document_fields_or_snapshot): return TracedQuery(self._inner.start_at(_raw(document_fields_or_snapshot)))
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if not callable(attr): return attr
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return TracedQuery(result) if hasattr(result, "stream") else result
+        return call
+
+class TracedDocument(_Proxy):
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        snap = _timed("read", self._inner.get, field_paths=field_paths, transaction=_raw(transaction), **kwargs)
+        _count(reads=1)
+        return snap
+    def set(self, document_data, merge=False): return self._write("write", self._inner.set, document_data, merge=merge)
+    def create(self, document_data): return self._write("write", self._inner.create, document_data)
+    def update(self, field_updates, *args, **kwargs): return self._write("write", self._inner.update, field_updates, *args, **kwargs)
+    def delete(self, *args, **kwargs): return self._write("delete", self._inner.delete, *args, **kwargs)
+    def collection(self, collection_id): return TracedQuery(self._inner.collection(collection_id))
+
+    def _write(self, kind, fn, *args, **kwargs):
+        result = _timed("write", fn, *args, **kwargs)
+        _count(**{"deletes" if kind == "delete" else "writes": 1})
+        return result
+
+class TracedSnapshot(_Proxy):
+    """Snapshot de query: só `reference` muda, para que gravações via doc.reference também sejam contadas."""
+    @property
+    def reference(self): return TracedDocument(self._inner.reference)
+
+class _TracedWrites(_Proxy):
+    """Batch/transação: as gravações só contam quando o commit acontece."""
+    def __init__(self, inner):
+        super().__init__(inner)
+        self._pending = {"writes": 0, "deletes": 0}
+    def set(self, reference, document_data, merge=False): return self._queue("writes", self._inner.set, _raw(reference), document_data, merge=merge)
+    def create(self, reference, document_data): return self._queue("writes", self._inner.create, _raw(reference), document_data)
+    def update(self, reference, field_updates, *args, **kwargs): return self._queue("writes", self._inner.update, _raw(reference), field_updates, *args, **kwargs)
+    def delete(self, reference, *args, **kwargs): return self._queue("deletes", self._inner.delete, _raw(reference), *args, **kwargs)
+
+    def _queue(self, kind, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)
+        self._pending[kind] += 1
+        return result
+
+    def _flush(self):
+        pending, self._pending = self._pending, {"writes": 0, "deletes": 0}
+        _count(**pending)
+
+class TracedBatch(_TracedWrites):
+    def commit(self, *args, **kwargs):
+        result = _timed("batch_commit", self._inner.commit, *args, **kwargs)
+        self._flush()
+        return result
+
+class TracedTransaction(_TracedWrites):
+    """Segue o protocolo de @firestore.transactional (_begin/_commit/_rollback vão para a transação real)."""
+    def get(self, ref_or_query, **kwargs):
+        if hasattr(ref_or_query, "stream"): return _timed_stream(lambda: self._inner.get(_raw(ref_or_query), **kwargs))
+        snaps = list(self._inner.get(_raw(ref_or_query), **kwargs))
+        _count(reads=len(snaps))
+        return iter(snaps)
+    def _begin(self, retry_id=None):
+        # Cada tentativa recomeça do zero; retry_id preenchido = nova tentativa depois de um conflito
+        self._pending = {"writes": 0, "deletes": 0}
+        if retry_id is not None: _count(tx_retries=1)
+        return self._inner._begin(retry_id=retry_id)
+    def _commit(self):
+        result = _timed("tx_commit", self._inner._commit)
+        self._flush()
+        return result
+    def _rollback(self):
+        self._pending = {"writes": 0, "deletes": 0}
+        return self._inner._rollback()
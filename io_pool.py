@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# --- POOL DE I/O BLOQUEANTE ---
+# Firestore, Firebase Auth e outros SDKs síncronos não podem rodar direto nas rotas async:
+# travariam o loop do uvicorn. Toda chamada bloqueante passa por `await run(fn, ...)`,
+# que executa num pool de tamanho fixo (IO_POOL_SIZE) e mede fila e ocupação.
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_POOL_SIZE, thread_name_prefix="io")
+_lock = threading.Lock()
+_stats = {"active": 0, "queued": 0, "max_queued": 0, "completed": 0, "errors": 0,
+          "queue_wait_total": 0.0, "run_time_total": 0.0}
+
+QUEUE_WAIT_SECONDS = metrics.histogram("io_pool_queue_wait_seconds", "Espera na fila do io_pool até uma thread livre")
+RUN_SECONDS = metrics.histogram("io_pool_run_duration_seconds", "Tempo de execução das tarefas no io_pool")
+metrics.gauge("io_pool_active", "Tarefas executando no io_pool", collect=lambda: _stats["active"])
+metrics.gauge("io_pool_queued", "Tarefas aguardando thread no io_pool", collect=lambda: _stats["queued"])
+
+async def run(fn, *args, **kwargs):
+    """Executa fn(*args, **kwargs) no pool e aguarda sem bloquear o event loop. Propaga o contexto (contextvars)."""
+    submitted = time.monotonic()
+    with _lock:
+        _stats["queued"] += 1
+        _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+
+    def task():
+        started = time.monotonic()
+        with _lock:
+            _stats["queued"] -= 1
+            _stats["active"] += 1
+            _stats["queue_wait_total"] += started - submitted
+        QUEUE_WAIT_SECONDS.observe(started - submitted)
+        try: return fn(*args, **kwargs)
+        except BaseException:
+            with _lock: _stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with _lock:
+                _stats["active"] -= 1
+                _stats["completed"] += 1
+                _stats["run_time_total"] += elapsed
+            RUN_SECONDS.observe(elapsed)
+
+    ctx = contextvars.copy_context()
+    return await asyncio.wrap_future(_executor.submit(ctx.run, task))
+
+def stats():
+    with _lock:
+        return {**_stats, "size": IO_POOL_SIZE, "saturated": _stats["active"] >= IO_POOL_SIZE}
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# --- CACHE LOCAL DE PARTIDAS (MATCH-V5) ---
+# Uma partida encerrada nunca muda, então o id da partida identifica o conteúdo para sempre.
+# Guardamos a projeção compacta (match_parser) em JSON comprimido (zlib) num SQLite local e despejamos as menos acessadas
+# quando o arquivo passa de MATCH_CACHE_MAX_MB. MATCH_CACHE_MAX_MB=0 desliga o cache.
+MATCH_CACHE_PATH = os.getenv("MATCH_CACHE_PATH", "match_cache.sqlite3")
+MATCH_CACHE_MAX_BYTES = int(float(os.getenv("MATCH_CACHE_MAX_MB", "200")) * 1024 * 1024)
+# Ao estourar o limite, despeja até sobrar essa fração do máximo (evita despejar a cada inserção)
+EVICT_TARGET_RATIO = 0.9
+# Leituras não gravam last_access na hora: os acessos ficam em memória e vão para o disco de uma vez
+# a cada TOUCH_FLUSH_SIZE (e antes de despejar, para o LRU não usar horários velhos).
+# As funções são bloqueantes (SQLite): quem está num event loop deve chamá-las numa thread.
+TOUCH_FLUSH_SIZE = 256
+
+_lock = threading.Lock()
+_conn = None
+_total_bytes = 0
+_touched = {}  # match_id -> horário do último acesso ainda não gravado
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+def _connect():
+    global _conn, _total_bytes
+    if _conn is not None: return _conn
+    conn = sqlite3.connect(MATCH_CACHE_PATH, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS matches (
+        match_id TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_matches_last_access ON matches(last_access)")
+    _total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM matches").fetchone()[0]
+    _conn = conn
+    return conn
+
+def enabled():
+    return MATCH_CACHE_MAX_BYTES > 0
+
+def get(match_id):
+    """Retorna o documento da partida (dict) ou None se não estiver no cache."""
+    if not enabled(): return None
+    try:
+        with _lock:
+            conn = _connect()
+            row = conn.execute("SELECT body FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+            if row is None:
+                _stats["misses"] += 1
+                return None
+            _touched[match_id] = time.time()
+            if len(_touched) >= TOUCH_FLUSH_SIZE: _flush_touched(conn)
+            _stats["hits"] += 1
+        return json.loads(zlib.decompress(row[0]))
+    except Exception as e:
+        print(f"[MatchCache] Falha ao ler {match_id}: {e}")
+        return None
+
+def put(match_id, doc):
+    """Guarda o documento da partida. Erros de disco nunca derrubam a chamada à Riot."""
+    global _total_bytes
+    if not enabled(): return
+    try:
+        body = zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"), 6)
+        with _lock:
+            conn = _connect()
+            old = conn.execute("SELECT size FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO matches (match_id, body, size, last_access) VALUES (?, ?, ?, ?)",
+                         (match_id, body, len(body), time.time()))
+            _total_bytes += len(body) - (old[0] if old else 0)
+            _stats["stores"] += 1
+            _touched.pop(match_id, None)
+            if _total_bytes > MATCH_CACHE_MAX_BYTES:
+                _flush_touched(conn)
+                _evict(conn)
+    except Exception as e:
+        print(f"[MatchCache] Falha ao gravar {match_id}: {e}")
+
+def _flush_touched(conn):
+    """Grava os last_access acumulados numa única transação. Chamar com _lock."""
+    if not _touched: return
+    rows = [(at, match_id) for match_id, at in _touched.items()]
+    _touched.clear()
+    conn.execute("BEGIN")
+    try:
+        conn.executemany("UPDATE matches SET last_access = ? WHERE match_id = ?", rows)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _evict(conn):
+    """Remove as partidas acessadas há mais tempo até voltar abaixo do alvo. Chamar com _lock."""
+    global _total_bytes
+    target = MATCH_CACHE_MAX_BYTES * EVICT_TARGET_RATIO
+    removed = []
+    for match_id, size in conn.execute("SELECT match_id, size FROM matches ORDER BY last_access"):
+        if _total_bytes <= target: break
+        removed.append((match_id,))
+        _total_bytes -= size
+    conn.executemany("DELETE FROM matches WHERE match_id = ?", removed)
+    _stats["evictions"] += len(removed)
+
+def stats():
+    with _lock:
+        count = _connect().execute("SELECT COUNT(*) FROM matches").fetchone()[0] if enabled() else 0
+        return {**_stats, "entries": count, "bytes": _total_bytes, "max_bytes": MATCH_CACHE_MAX_BYTES}
@@ -0,0 +1,79 @@
+# --- PROJEÇÃO COMPACTA DE PARTIDAS (MATCH-V5) ---
+# O JSON da match-v5 tem centenas de KB por partida (blocos `challenges`, `perks`, timeline de
+# itens...). Daqui para frente só circulam as 10 linhas com os campos que usamos, com MVP,
+# maior dano e maior farm calculados uma única vez no parse. É isso que vai para o match_cache.
+PARSED_VERSION = 1
+
+class ParticipantRow:
+    __slots__ = ("puuid", "team_id", "position", "kills", "deaths", "assists", "cs", "vision", "damage", "win")
+
+    def __init__(self, puuid, team_id, position, kills, deaths, assists, cs, vision, damage, win):
+        self.puuid, self.team_id, self.position = puuid, team_id, position
+        self.kills, self.deaths, self.assists = kills, deaths, assists
+        self.cs, self.vision, self.damage, self.win = cs, vision, damage, win
+
+    @classmethod
+    def from_participant(cls, p):
+        return cls(
+            p.get("puuid"), p.get("teamId"), p.get("teamPosition", "UNKNOWN"),
+            p.get("kills", 0), p.get("deaths", 0), p.get("assists", 0),
+            p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0),
+            p.get("visionScore", 0), p.get("totalDamageDealtToChampions", 0), p.get("win")
+        )
+
+    def to_list(self):
+        return [getattr(self, f) for f in self.__slots__]
+
+class ParsedMatch:
+    __slots__ = ("match_id", "duration", "started", "rows", "mvp_team", "mvp_match", "top_damage", "top_farm")
+
+    def __init__(self, match_id, duration, started, rows):
+        self.match_id, self.duration, self.started, self.rows = match_id, duration, started, rows
+        self._compute_winners()
+
+    @classmethod
+    def from_doc(cls, match_id, doc):
+        """Extrai a projeção do documento match-v5 completo."""
+        info = doc.get("info", {})
+        rows = [ParticipantRow.from_participant(p) for p in info.get("participants", [])]
+        return cls(match_id, info.get("gameDuration", 0), info.get("gameStartTimestamp") or info.get("gameCreation"), rows)
+
+    def participant(self, puuid):
+        for row in self.rows:
+            if row.puuid == puuid: return row
+        return None
+
+    def _compute_winners(self):
+        """MVP por time e da partida (performance score), maior dano e maior farm."""
+        minutes = self.duration / 60
+        team_scores, match_score_max = {}, 0
+        top_dmg, top_farm = 0, 0
+        self.mvp_team, self.mvp_match, self.top_damage, self.top_farm = {}, None, None, None
+        for row in self.rows:
+            score = performance_score(row, minutes)
+            if score > team_scores.get(row.team_id, -1):
+                team_scores[row.team_id] = score
+                self.mvp_team[row.team_id] = row.puuid
+            if score > match_score_max:
+                match_score_max = score
+                self.mvp_match = row.puuid
+            if row.damage > top_dmg: top_dmg, self.top_damage = row.damage, row.puuid
+            if row.cs > top_farm: top_farm, self.top_farm = row.cs, row.puuid
+
+    # --- SERIALIZAÇÃO (match_cache) ---
+    def to_compact(self):
+        return {"v": PARSED_VERSION, "id": self.match_id, "duration": self.duration, "started": self.started,
+                "rows": [row.to_list() for row in self.rows]}
+
+    @classmethod
+    def from_compact(cls, data):
+        return cls(data["id"], data.get("duration", 0), data.get("started"), [ParticipantRow(*r) for r in data.get("rows", [])])
+
+def is_compact(data):
+    return isinstance(data, dict) and data.get("v") == PARSED_VERSION
+
+def performance_score(row, duration):
+    if duration <= 0: duration = 25
+    kda = (row.kills + row.assists) / (row.deaths if row.deaths > 0 else 1)
+    # Fórmula de MVP simples
+    return (kda * 10) + (row.cs/duration * 2) + (row.vision * 0.5) + (row.damage/1000)
@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+
+# --- MÉTRICAS (FORMATO TEXTO DO PROMETHEUS) ---
+# Registro mínimo, sem dependência externa: contadores, gauges e histogramas com labels,
+# renderizados em /metrics. Cada módulo declara as suas métricas no import e chama
+# inc/set/observe de qualquer thread. Gauges podem ler o valor na hora da coleta (`collect`),
+# para expor estado que já existe em outro lugar (ex.: ocupação do io_pool).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock: _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames): raise ValueError(f"{self.name}: labels esperadas {self.labelnames}, recebidas {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _label_str(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs: return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def samples(self): raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_format(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock: items = sorted(self._values.items())
+        return [(self.name, self._label_str(k), v) for k, v in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), collect=None):
+        """collect: função opcional chamada na coleta, devolvendo {tupla de labels: valor} (ou um número, sem labels)."""
+        super().__init__(name, help_text, labelnames)
+        self._collect = collect
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = value
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock: self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels): self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._collect is not None:
+            collected = self._collect()
+            items = sorted(collected.items()) if isinstance(collected, dict) else [((), collected)]
+        else:
+            with self._lock: items = sorted(self._values.items())
+        return [(self.name, self._label_str(k), v) for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None: state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets): state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager que observa a duração do bloco."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock: items = sorted((k, (list(c), s, n)) for k, (c, s, n) in self._values.items())
+        out = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                out.append((f"{self.name}_bucket", self._label_str(key, [("le", _format(bound))]), cumulative))
+            out.append((f"{self.name}_bucket", self._label_str(key, [("le", "+Inf")]), count))
+            out.append((f"{self.name}_sum", self._label_str(key), total))
+            out.append((f"{self.name}_count", self._label_str(key), count))
+        return out
+
+class _Timer:
+    def __init__(self, histogram, labels): self._histogram, self._labels = histogram, labels
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+def counter(name, help_text, labelnames=()): return Counter(name, help_text, labelnames)
+def gauge(name, help_text, labelnames=(), collect=None): return Gauge(name, help_text, labelnames, collect)
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS): return Histogram(name, help_text, labelnames, buckets)
+
+def render():
+    """Todas as métricas registradas, no formato de exposição texto 0.0.4."""
+    with _registry_lock: metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+def _escape(value): return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format(value):
+    if isinstance(value, bool): return "1" if value else "0"
+    if isinstance(value, int): return str(value)
+    if value == float("inf"): return "+Inf"
+    return repr(float(value))
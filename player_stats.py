@@ -0,0 +1,89 @@
+# --- JANELA DESLIZANTE DE PARTIDAS DO JOGADOR ---
+# Buffer circular com as últimas WINDOW partidas válidas (KDA, farm, dano, visão, rota e flags de
+# vitória/MVP/maior dano), com somas acumuladas: inserir uma partida nova e despejar a mais antiga
+# é O(1), e as médias saem direto das somas. Fica salvo em connectedAccounts.lol.stats.window.
+WINDOW = 20
+RECENT = 7
+FIELDS = ("k", "d", "a", "cs", "dmg", "vis", "win", "mvp", "top_dmg")
+
+class RollingStats:
+    __slots__ = ("capacity", "head", "size", "ids", "roles", "cols", "sums")
+
+    def __init__(self, capacity=WINDOW):
+        self.capacity = capacity
+        self.head = 0   # próximo slot a escrever (= o mais antigo quando cheio)
+        self.size = 0
+        self.ids = [None] * capacity
+        self.roles = [None] * capacity
+        self.cols = {f: [0] * capacity for f in FIELDS}
+        self.sums = dict.fromkeys(FIELDS, 0)
+
+    def push(self, record):
+        """Adiciona uma partida (dict com id, role e FIELDS) como a mais recente."""
+        i = self.head
+        if self.size == self.capacity:
+            for f in FIELDS: self.sums[f] -= self.cols[f][i]
+        else: self.size += 1
+        self.ids[i], self.roles[i] = record["id"], record.get("role", "UNKNOWN")
+        for f in FIELDS:
+            value = int(record.get(f, 0))
+            self.cols[f][i] = value
+            self.sums[f] += value
+        self.head = (i + 1) % self.capacity
+
+    def __contains__(self, match_id):
+        return any(self.ids[i] == match_id for i in self._newest_slots())
+
+    def _newest_slots(self, n=None):
+        n = self.size if n is None else min(n, self.size)
+        return [(self.head - 1 - j) % self.capacity for j in range(n)]
+
+    def mean(self, field):
+        return self.sums[field] / self.size if self.size else 0.0
+
+    def recent(self, field, n=RECENT):
+        """Valores das n partidas mais recentes, da mais nova para a mais antiga."""
+        return [self.cols[field][i] for i in self._newest_slots(n)]
+
+    def match_ids(self):
+        return [self.ids[i] for i in self._newest_slots()]
+
+    def roles_newest_first(self):
+        return [self.roles[i] for i in self._newest_slots()]
+
+    # --- SERIALIZAÇÃO (Firestore) ---
+    def to_dict(self):
+        return {"capacity": self.capacity, "head": self.head, "size": self.size, "ids": list(self.ids),
+                "roles": list(self.roles), "cols": {f: list(v) for f, v in self.cols.items()}, "sums": dict(self.sums)}
+
+    @classmethod
+    def from_dict(cls, data):
+        rs = cls(data.get("capacity", WINDOW))
+        rs.head, rs.size = data.get("head", 0), data.get("size", 0)
+        rs.ids, rs.roles = list(data["ids"]), list(data["roles"])
+        for f in FIELDS:
+            rs.cols[f] = list(data.get("cols", {}).get(f, [0] * rs.capacity))
+            rs.sums[f] = data.get("sums", {}).get(f, sum(rs.cols[f][i] for i in rs._newest_slots()))
+        return rs
+
+def to_stats(window):
+    """Campos planos que o motor de odds lê (médias de WINDOW partidas, listas das RECENT últimas)."""
+    return {
+        "winRate": window.mean("win"),
+        "avgKills": window.mean("k"),
+        "avgAssists": window.mean("a"),
+        "avgDeaths": window.mean("d"),
+        "recent_wins": [bool(w) for w in window.recent("win")],
+        "recent_kills": window.recent("k"),
+        "recent_assists": window.recent("a"),
+        "recent_deaths": window.recent("d"),
+        "player_roles": window.roles_newest_first(),
+        "mvp_team_frequency": window.mean("mvp"),
+        "top_damage_frequency": window.mean("top_dmg"),
+    }
+
+def view(stats):
+    """Stats para o motor: se houver janela salva, médias e listas recentes vêm dela."""
+    data = stats.get("window")
+    if not data or not data.get("size"): return stats
+    return {**stats, **to_stats(RollingStats.from_dict(data))}
@@ -0,0 +1,195 @@
+import math
+
+import numpy as np
+
+import player_stats
+import prime_engine as engine
+
+# --- MOTOR DE ODDS EM LOTE (VETORIZADO) ---
+# Mesmo resultado de prime_engine.generate_odds, mas para milhares de jogadores de uma vez:
+# os stats viram colunas NumPy e cada etapa (winrate ponderado, média aparada, alvo, cauda de
+# Poisson, arredondamento da odd) roda sobre o vetor inteiro.
+# Para bater bit a bit com o caminho escalar, exp usa a mesma função da libm que o Python
+# (math.exp) em vez do kernel SIMD do NumPy, que pode diferir em 1 ULP.
+RECENT_WINDOW = 7
+_exp = np.frompyfunc(math.exp, 1, 1)
+
+def stats_to_columns(stats_list):
+    """Converte uma lista de dicts `stats` (formato de connectedAccounts.lol.stats) em colunas."""
+    stats_list = [player_stats.view(s) for s in stats_list]
+    n = len(stats_list)
+    cols = {
+        "winRate": np.array([s.get("winRate", 0.5) for s in stats_list], dtype=np.float64),
+        "mvp_team_frequency": np.array([_base_prob(s, "mvp_team") for s in stats_list], dtype=np.float64),
+        "top_damage_frequency": np.array([_base_prob(s, "top_damage") for s in stats_list], dtype=np.float64),
+        "main_role": [engine._get_player_main_role(s.get("player_roles", [])) for s in stats_list],
+    }
+    wins = np.zeros((n, RECENT_WINDOW), dtype=np.float64)
+    wins_len = np.zeros(n, dtype=np.int64)
+    for row, s in enumerate(stats_list):
+        recent = s.get("recent_wins", [])[:RECENT_WINDOW]
+        wins_len[row] = len(recent)
+        wins[row, :len(recent)] = [1.0 if w else 0.0 for w in recent]
+    cols["recent_wins"], cols["recent_wins_len"] = wins, wins_len
+
+    for key, fallback in (("Kills", 5.0), ("Assists", 7.0), ("Deaths", 6.0)):
+        cols[f"avg{key}"] = np.array([s.get(f"avg{key}", fallback) for s in stats_list], dtype=np.float64)
+        values = np.full((n, RECENT_WINDOW), np.nan, dtype=np.float64)
+        lengths = np.zeros(n, dtype=np.int64)
+        for row, s in enumerate(stats_list):
+            recent = s.get(f"recent_{key.lower()}", [])[:RECENT_WINDOW]
+            lengths[row] = len(recent)
+            values[row, :len(recent)] = recent
+        cols[f"recent_{key.lower()}"], cols[f"recent_{key.lower()}_len"] = values, lengths
+    return cols
+
+def _base_prob(stats, mkt_type):
+    base = stats.get(f"{mkt_type}_frequency", engine.DEFAULT_BASE_PROB.get(mkt_type, 0.05))
+    return engine.DEFAULT_BASE_PROB.get(mkt_type, 0.05) if base == 0.0 else base
+
+# --- PEÇAS VETORIZADAS (espelham as funções de prime_engine) ---
+def _calculate_odd(implied_prob, safety_reduction):
+    with np.errstate(divide="ignore"):
+        raw_odd = np.maximum(1 / implied_prob, 1.05)
+    final_odd = np.maximum(raw_odd * (1.0 - safety_reduction), 1.01)
+    multiplier = 1 / engine.ODD_STEP
+    return np.where(implied_prob <= 0, 99.0, np.floor(final_odd * multiplier) / multiplier)
+
+def _calculate_implied_prob(true_prob, margin):
+    return np.minimum(true_prob * (1 + margin), engine.MAX_IMPLIED_PROBABILITY)
+
+def _weighted_winrate(cols):
+    overall, wins, n = cols["winRate"], cols["recent_wins"].copy(), cols["recent_wins_len"]
+    wins[:, 0] = 1.0 # mesma regra do escalar: a partida mais recente conta como vitória
+    with np.errstate(invalid="ignore", divide="ignore"):
+        recent_wr = wins.sum(axis=1) / n
+    weighted = (recent_wr * engine.RECENT_7_WEIGHT) + (overall * engine.OVERALL_20_WEIGHT)
+    clamped = np.maximum(engine.MIN_PROB_FOR_WIN_ODD, np.minimum(weighted, engine.MAX_PROB_FOR_WIN_ODD))
+    return np.where(n > 0, clamped, overall)
+
+def _weighted_avg_stat(cols, key):
+    overall, values, n = cols[f"avg{key}"], cols[f"recent_{key.lower()}"], cols[f"recent_{key.lower()}_len"]
+    ordered = np.sort(values, axis=1) # NaN (posições vazias) vão para o fim
+    # Soma sequencial de ordered[1:-1], na mesma ordem do sum() escalar
+    trimmed_sum = np.zeros(len(overall), dtype=np.float64)
+    for j in range(1, RECENT_WINDOW - 1):
+        trimmed_sum = trimmed_sum + np.where(j <= n - 2, np.nan_to_num(ordered[:, j]), 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        recent_avg = trimmed_sum / (n - 2)
+    weighted = (recent_avg * engine.RECENT_7_WEIGHT) + (overall * engine.OVERALL_20_WEIGHT)
+    return np.where(n >= 3, weighted, overall)
+
+def _poisson_cdf(k, lambda_):
+    """P(X < k) vetorizado, espelhando prime_engine.poisson_cdf (tabela ou recorrência)."""
+    cumulative = np.zeros(len(k), dtype=np.float64)
+    exact = k > 0
+    if engine.POISSON_TABLE_ENABLED:
+        in_grid = exact & (k <= engine.POISSON_TABLE_MAX_K) & (lambda_ >= 0) & (lambda_ < engine.POISSON_TABLE_MAX_LAMBDA)
+        if in_grid.any():
+            table = _poisson_table()
+            pos = lambda_[in_grid] / engine.POISSON_TABLE_STEP
+            j = np.minimum(pos.astype(np.int64), len(table) - 2)
+            frac = pos - j
+            kk = k[in_grid]
+            cumulative[in_grid] = table[j, kk] + frac * (table[j + 1, kk] - table[j, kk])
+        exact = exact & ~in_grid
+    rows = np.nonzero(exact)[0]
+    if len(rows) == 0: return cumulative
+    # Mesma recorrência do escalar. O escalar para cedo quando os termos ficam abaixo de meio ULP
+    # da soma; aqui eles continuam sendo somados, o que não altera o resultado.
+    k, lambda_ = k[rows], lambda_[rows]
+    term = _exp(-lambda_).astype(np.float64)
+    acc = np.zeros(len(rows), dtype=np.float64)
+    for i in range(int(k.max())):
+        acc = np.where(k > i, acc + term, acc)
+        term = term * (lambda_ / (i + 1))
+    cumulative[rows] = acc
+    return cumulative
+
+_table = None
+def _poisson_table():
+    global _table
+    if _table is None: _table = np.array(engine.poisson_table(), dtype=np.float64)
+    return _table
+
+def _poisson_ge(k, lambda_):
+    cumulative = _poisson_cdf(k, lambda_ * engine.POISSON_LAMBDA_ADJUST)
+    return np.where(k <= 0, 1.0, np.maximum(1 - cumulative, 0.001))
+
+def _poisson_lt(k, lambda_):
+    return np.maximum(_poisson_cdf(k, lambda_ * engine.POISSON_LAMBDA_ADJUST), 0.001)
+
+# --- API ---
+def generate_odds_batch(cols, game_type, config_margins, math_config):
+    """
+    Equivalente vetorizado de prime_engine.generate_odds. `cols` vem de stats_to_columns.
+    Retorna uma lista (um item por jogador) de listas de desafios, idênticas às do escalar.
+    """
+    n = len(cols["winRate"])
+    margin_main = config_margins.get('main', 0.15)
+    margin_stats = config_margins.get('stats', 0.30)
+    min_scalar = math_config.get('min_difficulty', 0.25)
+    max_scalar = math_config.get('max_difficulty', 0.65)
+    safety = math_config.get('safety_reduction', 0.10)
+
+    wr = _weighted_winrate(cols)
+    win_odd = _calculate_odd(_calculate_implied_prob(wr, margin_main), safety).tolist()
+    boards = [[{
+        "id": f"win_{game_type}", "title": "Vencer a próxima partida", "odd": win_odd[i],
+        "conflictKey": "match_outcome", "targetStat": "win", "targetValue": True, "gameType": game_type
+    }] for i in range(n)]
+    if game_type != 'lol': return boards
+
+    norm_wr = (np.maximum(engine.MIN_WR_FOR_SCALAR, np.minimum(wr, engine.MAX_WR_FOR_SCALAR)) - engine.MIN_WR_FOR_SCALAR) / (engine.MAX_WR_FOR_SCALAR - engine.MIN_WR_FOR_SCALAR)
+    scalar = min_scalar + (norm_wr * (max_scalar - min_scalar))
+
+    avg_k = _weighted_avg_stat(cols, "Kills")
+    target_k = np.ceil(avg_k * (1 + scalar)).astype(np.int64)
+    odd_k = _calculate_odd(_calculate_implied_prob(_poisson_ge(target_k, avg_k), margin_stats), safety).tolist()
+
+    avg_a = _weighted_avg_stat(cols, "Assists")
+    target_a = np.ceil(avg_a * (1 + scalar)).astype(np.int64)
+    odd_a = _calculate_odd(_calculate_implied_prob(_poisson_ge(target_a, avg_a), margin_stats), safety).tolist()
+
+    avg_d = _weighted_avg_stat(cols, "Deaths")
+    target_d = np.floor(avg_d * (1 - scalar)).astype(np.int64)
+    odd_d = _calculate_odd(_calculate_implied_prob(_poisson_lt(target_d + 1, avg_d), margin_stats), safety).tolist()
+
+    role_odds = {}
+    for mkt_type, role_key in (("mvp_team", "mvp"), ("top_damage", "damage")):
+        weights = np.array([engine.ROLE_WEIGHTS.get(role_key, {}).get(r, 1.0) for r in cols["main_role"]], dtype=np.float64)
+        true_prob = cols[f"{mkt_type}_frequency"] * weights
+        role_odds[mkt_type] = _calculate_odd(_calculate_implied_prob(true_prob, margin_stats), safety).tolist()
+
+    target_k, target_a, target_d = target_k.tolist(), target_a.tolist(), target_d.tolist()
+    for i, challenges in enumerate(boards):
+        challenges.append({
+            "id": f"kills_over_{target_k[i]}", "title": f"Fazer +{target_k[i] - 0.5} Kills", "odd": odd_k[i],
+            "conflictKey": "kills_stat", "targetStat": "kills", "targetValue": target_k[i], "gameType": game_type
+        })
+        challenges.append({
+            "id": f"assists_over_{target_a[i]}", "title": f"Fazer +{target_a[i] - 0.5} Assists", "odd": odd_a[i],
+            "conflictKey": "assists_stat", "targetStat": "assists", "targetValue": target_a[i], "gameType": game_type
+        })
+        challenges.append({
+            "id": f"deaths_under_{target_d[i]}", "title": f"Morrer -{target_d[i] + 0.5} vezes", "odd": odd_d[i],
+            "conflictKey": "deaths_stat", "targetStat": "deaths", "targetValue": target_d[i], "gameType": game_type
+        })
+        challenges.append({
+            "id": "mvp_team", "title": "Ser Destaque do Time", "odd": role_odds["mvp_team"][i],
+            "conflictKey": "mvp_outcome", "targetStat": "mvp_team", "targetValue": True, "gameType": game_type
+        })
+        challenges.append({
+            "id": "top_damage", "title": "Maior Dano do Time", "odd": role_odds["top_damage"][i],
+            "conflictKey": "damage_outcome", "targetStat": "top_damage", "targetValue": True, "gameType": game_type
+        })
+    return boards
+
+def build_challenge_boards(player_list, game_type, config_margins, math_config):
+    """Versão em lote de prime_engine.build_challenge_board: um painel com fingerprint por jogador."""
+    stats_list = [p.get("stats", {}) for p in player_list]
+    odds = generate_odds_batch(stats_to_columns(stats_list), game_type, config_margins, math_config)
+    return [{
+        "fingerprint": engine.odds_fingerprint(stats, game_type, config_margins, math_config),
+        "challenges": challenges
+    } for stats, challenges in zip(stats_list, odds)]
@@ -1,11 +1,28 @@
+import os
 import math
+import json
+import hashlib
 from datetime import datetime
 from collections import Counter
 
+import player_stats
+
 # --- CONFIGURAÇÕES GERAIS DO MOTOR ---
 POISSON_LAMBDA_ADJUST = 0.95  
 MAX_IMPLIED_PROBABILITY = 0.95 
 ODD_STEP = 0.05
+# Alvos personalizados abaixo dessa probabilidade não são oferecidos
+CUSTOM_MIN_PROBABILITY = 0.01
+LADDER_MAX_STEPS = 100
+
+# --- TABELA DE POISSON (opcional) ---
+# Com POISSON_TABLE=1 a CDF vem de uma grade de lambda pré-calculada com interpolação linear
+# (erro máximo POISSON_TABLE_STEP²/8). Fora da grade, cai no cálculo exato por recorrência.
+POISSON_TABLE_ENABLED = os.getenv("POISSON_TABLE", "0") == "1"
+POISSON_TABLE_STEP = float(os.getenv("POISSON_TABLE_STEP", "0.01"))
+POISSON_TABLE_MAX_LAMBDA = 40.0
+POISSON_TABLE_MAX_K = 80
+_poisson_rows = None
 
 # --- PESOS DO MOTOR DE ODDS (LoL) ---
 RECENT_7_WEIGHT = 0.6
@@ -99,7 +116,7 @@ def _get_role_weighted_prob(stats, mkt_type, main_role, margin, safety_red):
     return _calculate_odd(_calculate_implied_prob(true_prob, margin), safety_red)
 
 def generate_odds(player_data, game_type, config_margins, math_config):
-    stats = player_data.get("stats", {})
+    stats = player_stats.view(player_data.get("stats", {}))
     challenges = []
     
     margin_main = config_margins.get('main', 0.15)
@@ -161,34 +178,85 @@ def generate_odds(player_data, game_type, config_margins, math_config):
 
     return challenges
 
-def calculate_custom_odd(account_data, game_type, target_value, margins, math_config):
-    stats = account_data.get("stats", {})
-    safety = math_config.get('safety_reduction', 0.10)
+# --- PAINEL PRÉ-CALCULADO ---
+# Versão da fórmula: incrementar sempre que generate_odds mudar, para invalidar painéis salvos.
+BOARD_VERSION = 1
+
+def odds_fingerprint(stats, game_type, config_margins, math_config):
+    """Hash das entradas de generate_odds. Mesmo fingerprint = mesmas odds."""
+    # A tabela de Poisson muda as odds (interpolação), então entra no hash junto com o passo da grade
+    poisson = [POISSON_TABLE_ENABLED, POISSON_TABLE_STEP if POISSON_TABLE_ENABLED else None]
+    payload = json.dumps([BOARD_VERSION, game_type, stats, config_margins, math_config, poisson], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def build_challenge_board(player_data, game_type, config_margins, math_config):
+    """Painel pronto para servir/armazenar: desafios + fingerprint das entradas usadas."""
+    return {
+        "fingerprint": odds_fingerprint(player_data.get("stats", {}), game_type, config_margins, math_config),
+        "challenges": generate_odds(player_data, game_type, config_margins, math_config)
+    }
+
+def calculate_custom_odd(account_data, game_type, target_value, margins, math_config, ladder=None):
+    """Odd de um alvo de kills personalizado. Lê da escada (build_kills_ladder), montando-a se não vier pronta."""
+    stats = player_stats.view(account_data.get("stats", {}))
     try:
         avg_kills = _get_weighted_avg_stat(stats, "kill", 5.0)
         target = int(target_value)
     except: return {"error": "Inválido"}
     
     if target <= avg_kills: return {"error": f"Meta deve ser > {avg_kills:.1f}"}
-    prob = _calculate_poisson_probability_greater_than_or_equal(target, avg_kills)
-    if prob < 0.01: return {"error": "Improvável (<1%)"}
-    final_odd = _calculate_odd(_calculate_implied_prob(prob, margins.get("stats", 0.30)), safety)
-    
+    if ladder is None: ladder = build_kills_ladder(account_data, game_type, margins, math_config)
+    idx = target - ladder["minTarget"]
+    if idx >= len(ladder["ladder"]): return {"error": "Improvável (<1%)"}
+    return {"challenge": _custom_challenge(game_type, target, ladder["ladder"][idx]["odd"])}
+
+def build_kills_ladder(account_data, game_type, margins, math_config):
+    """
+    Escada completa de alvos de kills: de logo acima da média ponderada até a probabilidade cair
+    abaixo de CUSTOM_MIN_PROBABILITY. A CDF é acumulada numa única passada pelos alvos.
+    """
+    raw_stats = account_data.get("stats", {})
+    stats = player_stats.view(raw_stats)
+    safety = math_config.get('safety_reduction', 0.10)
+    margin = margins.get("stats", 0.30)
+    avg_kills = _get_weighted_avg_stat(stats, "kill", 5.0)
+    lambda_ = avg_kills * POISSON_LAMBDA_ADJUST
+    min_target = math.floor(avg_kills) + 1
+
+    ladder = []
+    term, cumulative, i = math.exp(-lambda_), 0.0, 0
+    for target in range(min_target, min_target + LADDER_MAX_STEPS):
+        while i < target:
+            cumulative += term
+            term *= lambda_ / (i + 1)
+            i += 1
+        cdf = poisson_cdf(target, lambda_) if _in_poisson_table(target, lambda_) else cumulative
+        prob = max(1 - cdf, 0.001)
+        if prob < CUSTOM_MIN_PROBABILITY: break
+        ladder.append({"target": target, "odd": _calculate_odd(_calculate_implied_prob(prob, margin), safety)})
+
+    return {
+        "fingerprint": odds_fingerprint(raw_stats, game_type, margins, math_config),
+        "gameType": game_type,
+        "avgKills": avg_kills,
+        "minTarget": min_target,
+        "ladder": ladder
+    }
+
+def _custom_challenge(game_type, target, odd):
     return {
-        "challenge": {
-            "id": f"custom_{game_type}_{target}",
-            "title": f"Fazer +{target} Kills",
-            "odd": final_odd,
-            "conflictKey": f"custom_target_{target}",
-            "gameType": game_type,
-            "targetStat": "kills",
-            "targetValue": target
-        }
+        "id": f"custom_{game_type}_{target}",
+        "title": f"Fazer +{target} Kills",
+        "odd": odd,
+        "conflictKey": f"custom_target_{target}",
+        "gameType": game_type,
+        "targetStat": "kills",
+        "targetValue": target
     }
 
 # --- DIAGNÓSTICO E ANALYTICS ---
 def get_player_analytics(player_data, math_config):
-    stats = player_data.get("stats", {})
+    stats = player_stats.view(player_data.get("stats", {}))
     
     min_scalar = math_config.get('min_difficulty', 0.25)
     max_scalar = math_config.get('max_difficulty', 0.65)
@@ -220,16 +288,53 @@ def get_player_analytics(player_data, math_config):
 def _calculate_poisson_probability_greater_than_or_equal(k, lambda_):
     lambda_ = lambda_ * POISSON_LAMBDA_ADJUST
     if k <= 0: return 1.0
-    cumulative = 0
-    for i in range(k):
-        try: cumulative += (math.exp(-lambda_) * (lambda_ ** i)) / math.factorial(i)
-        except: pass
-    return max(1 - cumulative, 0.001)
+    return max(1 - poisson_cdf(k, lambda_), 0.001)
 
 def _calculate_poisson_prob_less_than(k, lambda_):
     lambda_ = lambda_ * POISSON_LAMBDA_ADJUST
-    cumulative = 0
+    return max(poisson_cdf(k, lambda_), 0.001)
+
+def poisson_cdf(k, lambda_):
+    """P(X < k) para X ~ Poisson(lambda_). Usa a tabela pré-calculada quando ligada e dentro da grade."""
+    if k <= 0: return 0.0
+    if _in_poisson_table(k, lambda_):
+        rows = poisson_table()
+        pos = lambda_ / POISSON_TABLE_STEP
+        j = min(int(pos), len(rows) - 2)
+        frac = pos - j
+        return rows[j][k] + frac * (rows[j + 1][k] - rows[j][k])
+    return _poisson_cdf_exact(k, lambda_)
+
+def _in_poisson_table(k, lambda_):
+    return POISSON_TABLE_ENABLED and 0 < k <= POISSON_TABLE_MAX_K and 0 <= lambda_ < POISSON_TABLE_MAX_LAMBDA
+
+def _poisson_cdf_exact(k, lambda_):
+    """Soma da PMF por recorrência: p(i+1) = p(i) * lambda / (i+1). Sem pow/factorial, sem overflow."""
+    term = math.exp(-lambda_)
+    cumulative = 0.0
     for i in range(k):
-        try: cumulative += (math.exp(-lambda_) * (lambda_ ** i)) / math.factorial(i)
-        except: pass
-    return max(cumulative, 0.001)
\ No newline at end of file
+        cumulative += term
+        # Passada a moda os termos só diminuem; abaixo de meio ULP já não alteram a soma
+        if i > lambda_ and term < cumulative * 1e-17: break
+        term *= lambda_ / (i + 1)
+    return cumulative
+
+def poisson_table():
+    """
+    Tabela rows[j][k] = P(X < k) com lambda = j * POISSON_TABLE_STEP, k = 0..POISSON_TABLE_MAX_K.
+    Montada uma vez, sob demanda. Como |d²F/dλ²| = |p(k-1) - p(k-2)| <= 1, a interpolação linear
+    entre pontos da grade erra no máximo STEP²/8 (1.25e-5 com o passo padrão de 0.01).
+    """
+    global _poisson_rows
+    if _poisson_rows is None:
+        rows = []
+        for j in range(int(round(POISSON_TABLE_MAX_LAMBDA / POISSON_TABLE_STEP)) + 1):
+            lambda_ = j * POISSON_TABLE_STEP
+            term, cumulative, row = math.exp(-lambda_), 0.0, [0.0]
+            for i in range(POISSON_TABLE_MAX_K):
+                cumulative += term
+                row.append(cumulative)
+                term *= lambda_ / (i + 1)
+            rows.append(row)
+        _poisson_rows = rows
+    return _poisson_rows
\ No newline at end of file
@@ -1,7 +1,13 @@
 import time
-import requests
+import asyncio
 import os
 
+import riot_client
+from riot_ratelimit import LANE_INTERACTIVE, LANE_CONNECT, LANE_BACKGROUND
+import match_cache
+import match_parser
+import player_stats
+
 # --- CONFIGURAÇÃO SEGURA ---
 # A chave é lida das variáveis de ambiente do servidor (Railway/Render/Local)
 RIOT_API_KEY = os.getenv("RIOT_API_KEY")
@@ -15,6 +21,20 @@ ACCOUNT_API_URL = "americas.api.riotgames.com"
 MATCH_API_URL = "americas.api.riotgames.com"
 # Spectator é um serviço REGIONAL (BR1), não continental (Americas)
 SPECTATOR_API_URL = "br1.api.riotgames.com" 
+# Aponta todas as chamadas para outro servidor (ex.: riot_simulator.py em http://127.0.0.1:8010).
+# Vazio = hosts oficiais da Riot por região.
+RIOT_API_BASE_URL = os.getenv("RIOT_API_BASE_URL", "").rstrip("/")
+
+def _url(host, path):
+    return f"{RIOT_API_BASE_URL}{path}" if RIOT_API_BASE_URL else f"https://{host}{path}"
+
+# Máximo de downloads simultâneos de partidas ao conectar uma conta (respeitar o rate limit da chave)
+MATCH_FETCH_CONCURRENCY = int(os.getenv("RIOT_MATCH_FETCH_CONCURRENCY", "5"))
+
+# Cache do status "em partida" (anti-snipping). "Livre" expira rápido porque é o que libera a aposta.
+ACTIVE_GAME_TTL_FREE = float(os.getenv("ACTIVE_GAME_TTL_FREE", "20"))
+ACTIVE_GAME_TTL_IN_GAME = float(os.getenv("ACTIVE_GAME_TTL_IN_GAME", "60"))
+ACTIVE_GAME_CACHE_MAX = 50000
 
 # Dados falsos para fallback quando a API falhar ou a chave expirar
 MOCK_STATS_DATA = {
@@ -35,23 +55,81 @@ MOCK_STATS_DATA = {
     }
 }
 
+# --- API PÚBLICA ---
+# Cada chamada existe em duas formas: `nome(...)` (síncrona, para o scheduler e BackgroundTasks)
+# e `nome_async(...)` (para rotas async). Ambas rodam a mesma corrotina no pool de riot_client.
+# A lane define a prioridade no rate limiter: aposta ao vivo > conexão de conta > resolução.
+def check_active_game(puuid): return riot_client.run_sync(_check_active_game(puuid), LANE_INTERACTIVE)
+async def check_active_game_async(puuid): return await riot_client.run_async(_check_active_game(puuid), LANE_INTERACTIVE)
+
+# Partida ao vivo (gameMode, gameStartTime) ou None, para a agenda do resolvedor
+def get_active_game(puuid): return riot_client.run_sync(_get_active_game(puuid), LANE_BACKGROUND)
+
+def prefetch_active_game(puuid):
+    """Aquece o cache de partida ao vivo em segundo plano (ex: jogador abriu a tela de desafios). Não bloqueia."""
+    if puuid: riot_client.submit(_check_active_game(puuid), LANE_CONNECT)
+
+def get_player_data(riot_id, game_type): return riot_client.run_sync(_get_player_data(riot_id, game_type), LANE_CONNECT)
+
+def get_last_match_id(puuid, game_type): return riot_client.run_sync(_get_last_match_id(puuid, game_type), LANE_INTERACTIVE)
+async def get_last_match_id_async(puuid, game_type): return await riot_client.run_async(_get_last_match_id(puuid, game_type), LANE_INTERACTIVE)
+
+def refresh_player_stats(puuid, stats): return riot_client.run_sync(_refresh_player_stats(puuid, stats), LANE_BACKGROUND)
+
+def get_latest_match(puuid, last_match_ids=()): return riot_client.run_sync(_get_latest_match(puuid, last_match_ids), LANE_BACKGROUND)
+
+def get_match_details_and_resolve(puuid, last_match_id, bet_items):
+    latest = get_latest_match(puuid, [last_match_id])
+    return resolve_bet_items(puuid, last_match_id, bet_items, latest)
+
 # --- NOVO: VERIFICAÇÃO DE PARTIDA AO VIVO (ANTI-SNIPPING) ---
-def check_active_game(puuid):
+# Estado acessado só de dentro do loop de riot_client, sem locks.
+_active_game_cache = {}     # puuid -> (game_data ou None, expira_em)
+_active_game_inflight = {}  # puuid -> Task em andamento (single-flight)
+
+async def _check_active_game(puuid):
+    """Retorna True se o jogador estiver em partida, False se estiver livre."""
+    return await _get_active_game(puuid) is not None
+
+async def _get_active_game(puuid):
     """
-    Retorna True se o jogador estiver em partida, False se estiver livre.
-    Usa Spectator V5 (por PUUID).
+    Dados da partida ao vivo ({"gameMode", "gameStartTime"}) ou None se o jogador estiver livre.
+    Usa Spectator V5 (por PUUID), com cache curto por puuid. Consultas simultâneas
+    para o mesmo puuid compartilham uma única chamada à Riot.
     """
     if "mock" in puuid or not RIOT_API_KEY:
-        return False # Mock nunca está em partida, permite testar aposta
+        return None # Mock nunca está em partida, permite testar aposta
 
-    url = f"https://{SPECTATOR_API_URL}/lol/spectator/v5/active-games/by-summoner/{puuid}"
+    cached = _active_game_cache.get(puuid)
+    if cached and cached[1] > time.monotonic(): return cached[0]
+
+    task = _active_game_inflight.get(puuid)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_active_game(puuid))
+        _active_game_inflight[puuid] = task
+        task.add_done_callback(lambda _: _active_game_inflight.pop(puuid, None))
+    game, cacheable = await asyncio.shield(task)
+    if cacheable: _cache_active_game(puuid, game)
+    return game
+
+def _cache_active_game(puuid, game):
+    now = time.monotonic()
+    if len(_active_game_cache) >= ACTIVE_GAME_CACHE_MAX:
+        for key in [k for k, (_, exp) in _active_game_cache.items() if exp <= now]: del _active_game_cache[key]
+        if len(_active_game_cache) >= ACTIVE_GAME_CACHE_MAX: _active_game_cache.clear()
+    ttl = ACTIVE_GAME_TTL_IN_GAME if game is not None else ACTIVE_GAME_TTL_FREE
+    _active_game_cache[puuid] = (game, now + ttl)
+
+async def _fetch_active_game(puuid):
+    """Consulta o Spectator. Retorna (game_data ou None, pode_cachear). Erros não vão para o cache."""
+    url = _url(SPECTATOR_API_URL, f"/lol/spectator/v5/active-games/by-summoner/{puuid}")
     
     try:
-        res = requests.get(url, headers=HEADERS, timeout=3)
+        res = await riot_client.get(url, headers=HEADERS, timeout=3, method="spectator-v5.active-games")
         
         # 404 significa "Data not found", ou seja, NÃO está em partida. (Sinal Verde)
         if res.status_code == 404:
-            return False
+            return None, True
             
         # 200 significa que retornou dados da partida. ESTÁ JOGANDO. (Sinal Vermelho)
         if res.status_code == 200:
@@ -59,19 +137,19 @@ def check_active_game(puuid):
             # Opcional: Ignorar Custom Games se quiser permitir apostas neles (não recomendado para Ranked)
             # if game_data.get('gameType') == 'CUSTOM_GAME': return False
             print(f"[Anti-Snipping] Bloqueio: Jogador em partida (Mode: {game_data.get('gameMode')})")
-            return True
+            return {"gameMode": game_data.get("gameMode"), "gameStartTime": game_data.get("gameStartTime")}, True
             
         # Outros erros (403 Forbidden, 429 Rate Limit)
         # Por segurança, se a API der erro, bloqueamos a aposta ou logamos o erro?
         # Para MVP, vamos logar e permitir, mas em prod o ideal é 'Fail Safe' (Bloquear).
         print(f"[Spectator API] Erro inesperado: {res.status_code}")
-        return False
+        return None, False
 
     except Exception as e:
         print(f"[Spectator API] Falha de conexão: {e}")
-        return False
+        return None, False
 
-def get_player_data(riot_id, game_type):
+async def _get_player_data(riot_id, game_type):
     if game_type != 'lol': raise Exception(f"Jogo não suportado: {game_type}")
     
     print(f"--- [RiotAPI] Buscando dados para: {riot_id} ---")
@@ -79,18 +157,18 @@ def get_player_data(riot_id, game_type):
     # Se não tiver chave configurada, cai direto pro Mock
     if not RIOT_API_KEY:
         print("   > [ALERTA] Sem API Key configurada. Usando Mock.")
-        return get_player_data_mocked(riot_id, game_type)
+        return await _get_player_data_mocked(riot_id)
     
     try:
-        puuid, region = _get_puuid_and_region(riot_id)
-        url = f"https://{region}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}"
-        res = requests.get(url, headers=HEADERS, timeout=5)
+        puuid, region = await _get_puuid_and_region(riot_id)
+        url = _url(f"{region}.api.riotgames.com", f"/lol/summoner/v4/summoners/by-puuid/{puuid}")
+        res = await riot_client.get(url, headers=HEADERS, timeout=5, method="summoner-v4.by-puuid")
         res.raise_for_status()
         
         level = res.json()['summonerLevel']
         print(f"   > Nível encontrado: {level}")
         
-        stats = _get_real_lol_stats_and_frequencies(puuid, region)
+        stats = await _get_real_lol_stats_and_frequencies(puuid, region)
         stats['summonerLevel'] = level
         
         print(f"   > SUCESSO: Dados reais obtidos via API.")
@@ -99,21 +177,28 @@ def get_player_data(riot_id, game_type):
     except Exception as e:
         print(f"   > ERRO NA API RIOT: {e}")
         print(f"   > [ALERTA] Usando DADOS MOCKADOS (Fictícios). Verifique se a API KEY expirou.")
-        return get_player_data_mocked(riot_id, game_type)
+        return await _get_player_data_mocked(riot_id)
 
 def get_player_data_mocked(riot_id, game_type):
     time.sleep(0.5) # Simula delay da rede
+    return _mock_player(riot_id)
+
+async def _get_player_data_mocked(riot_id):
+    await asyncio.sleep(0.5) # Simula delay da rede sem travar o loop da Riot
+    return _mock_player(riot_id)
+
+def _mock_player(riot_id):
     return {
         "puuid": f"mock_{riot_id}",
         "stats": MOCK_STATS_DATA["lol"]["default"]["stats"]
     }
 
-def get_last_match_id(puuid, game_type):
+async def _get_last_match_id(puuid, game_type):
     if "mock" in puuid or not RIOT_API_KEY: return "MOCK_MATCH_ID_123"
     
     try:
-        url = f"https://{MATCH_API_URL}/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count=1"
-        res = requests.get(url, headers=HEADERS, timeout=5)
+        url = _url(MATCH_API_URL, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count=1")
+        res = await riot_client.get(url, headers=HEADERS, timeout=5, method="match-v5.ids-by-puuid")
         res.raise_for_status()
         ids = res.json()
         return ids[0] if ids else "NONE"
@@ -121,170 +206,195 @@ def get_last_match_id(puuid, game_type):
         print(f"[RiotAPI] Erro ao buscar partida: {e}")
         return "ERROR_FETCHING_MATCH"
 
-def get_match_details_and_resolve(puuid, last_match_id, bet_items):
+async def _get_latest_match(puuid, last_match_ids=()):
+    """
+    Busca UMA vez a última partida ranqueada do jogador e já devolve a análise pronta.
+    Serve para resolver todas as apostas pendentes do mesmo puuid com uma única ida à Riot.
+    Retorna {"matchId": id, "analysis": {...}} ou um status final ({"status", "reason"}) que vale para o grupo todo.
+    """
     if "mock" in puuid or not RIOT_API_KEY:
         return {"status": "pending", "reason": "Usuário Mock - Aguardando..."}
 
     try:
         # 1. Busca histórico recente
-        url = f"https://{MATCH_API_URL}/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count=1"
-        res = requests.get(url, headers=HEADERS, timeout=5)
+        url = _url(MATCH_API_URL, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count=1")
+        res = await riot_client.get(url, headers=HEADERS, timeout=5, method="match-v5.ids-by-puuid")
         
         if res.status_code == 403:
             print("[RiotAPI] ERRO 403: Chave Expirada durante resolução de aposta.")
             return {"status": "pending", "reason": "API Key Expirada"}
+        if res.status_code == 429:
+            return {"status": "pending", "reason": "Rate limit da Riot"}
             
         res.raise_for_status()
         ids = res.json()
         
-        if not ids or ids[0] == last_match_id:
+        if not ids:
             return {"status": "pending", "reason": "Nenhuma nova partida"}
             
         new_id = ids[0]
+        # Todas as apostas do grupo já conhecem essa partida: não precisa baixar os detalhes
+        if all(mid == new_id for mid in last_match_ids):
+            return {"matchId": new_id, "analysis": None}
+
         print(f"[RiotAPI] Nova partida encontrada: {new_id}")
         
-        # 2. Pega detalhes da partida
-        url_det = f"https://{MATCH_API_URL}/lol/match/v5/matches/{new_id}"
-        res_det = requests.get(url_det, headers=HEADERS, timeout=5)
-        res_det.raise_for_status()
-        info = res_det.json().get("info", {})
-        
-        # Regra: Partida deve ter pelo menos 15 min (900s)
-        if info.get("gameDuration", 0) <= 900:
-            return {"status": "void", "reason": "Partida curta (<15min) - Remake?"}
-            
-        # 3. Analisa performance
-        player_stats, team_id = None, None
-        team_scores, match_score_max = {}, 0
-        top_dmg, top_farm = 0, 0
-        uid_top_dmg, uid_top_farm = None, None
-        uid_mvp_team, uid_mvp_match = {}, None
-
-        # Pré-processamento para achar MVPs e Tops
-        for p in info.get("participants", []):
-            pid, tid = p.get("puuid"), p.get("teamId")
-            score = _calculate_performance_score(p, info.get("gameDuration", 1) / 60)
-            
-            if pid == puuid:
-                player_stats, team_id = p, tid
-            
-            # MVP Logic
-            if score > team_scores.get(tid, -1):
-                team_scores[tid] = score
-                uid_mvp_team[tid] = pid
-            if score > match_score_max:
-                match_score_max = score
-                uid_mvp_match = pid
-                
-            # Top Stats Logic
-            dmg = p.get("totalDamageDealtToChampions", 0)
-            if dmg > top_dmg: top_dmg, uid_top_dmg = dmg, pid
-            
-            farm = p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0)
-            if farm > top_farm: top_farm, uid_top_farm = farm, pid
+        # 2. Pega detalhes da partida (cache local primeiro), já projetados e com os vencedores calculados
+        return {"matchId": new_id, "analysis": await _fetch_parsed_match(new_id)}
+
+    except Exception as e:
+        # Falha ao consultar a Riot (429, 5xx, timeout, pool cheio, transporte) não diz nada sobre a partida:
+        # a aposta continua pendente e o jogador volta na agenda com backoff. VOID só para resultado
+        # definitivo (remake, jogador fora da partida), decidido em resolve_bet_items.
+        print(f"[RiotAPI] Erro na resolução (aposta segue pendente): {e!r}")
+        return {"status": "pending", "reason": f"Erro API: {e}"}
 
-        if not player_stats: 
-            return {"status": "void", "reason": "Jogador não estava na partida (Bug?)"}
+def resolve_bet_items(puuid, last_match_id, bet_items, latest):
+    """Confere os itens de UMA aposta contra a partida já analisada por get_latest_match."""
+    if "status" in latest: return latest
+    if latest["matchId"] == last_match_id:
+        return {"status": "pending", "reason": "Nenhuma nova partida"}
 
-        # 4. Verifica condições da aposta
-        won = True
-        for item in bet_items:
-            target, val = item.get("targetStat"), item.get("targetValue")
-            
-            if target == "win":
-                if player_stats.get("win") != val: won = False
-            elif target == "kills":
-                if player_stats.get("kills", 0) < val: won = False
-            elif target == "deaths": # Menos mortes que X
-                if player_stats.get("deaths", 0) >= val: won = False
-            elif target == "mvp_team":
-                if puuid != uid_mvp_team.get(team_id): won = False
-            elif target == "top_damage":
-                if puuid != uid_top_dmg: won = False
-            
-            if not won: break
-            
-        result = "won" if won else "lost"
-        print(f"[RiotAPI] Aposta resolvida: {result}")
-        return {"status": result, "reason": "Resolvido"}
+    match = latest["analysis"]
 
-    except Exception as e:
-        print(f"[RiotAPI] Erro na resolução: {e}")
-        # Se der erro de API na hora de resolver, damos VOID por segurança
-        return {"status": "void", "reason": f"Erro API: {e}"}
+    # Regra: Partida deve ter pelo menos 15 min (900s)
+    if match.duration <= 900:
+        return {"status": "void", "reason": "Partida curta (<15min) - Remake?"}
+
+    player = match.participant(puuid)
+    if not player: 
+        return {"status": "void", "reason": "Jogador não estava na partida (Bug?)"}
 
-def _get_puuid_and_region(riot_id):
+    # 4. Verifica condições da aposta
+    won = True
+    for item in bet_items:
+        target, val = item.get("targetStat"), item.get("targetValue")
+        
+        if target == "win":
+            if player.win != val: won = False
+        elif target == "kills":
+            if player.kills < val: won = False
+        elif target == "deaths": # Menos mortes que X
+            if player.deaths >= val: won = False
+        elif target == "mvp_team":
+            if puuid != match.mvp_team.get(player.team_id): won = False
+        elif target == "top_damage":
+            if puuid != match.top_damage: won = False
+        
+        if not won: break
+        
+    result = "won" if won else "lost"
+    print(f"[RiotAPI] Aposta resolvida: {result}")
+    return {"status": result, "reason": "Resolvido"}
+
+async def _get_puuid_and_region(riot_id):
     if '#' not in riot_id: raise ValueError("Formato inválido. Use Nome#TAG")
     name, tag = riot_id.split('#')
-    url = f"https://{ACCOUNT_API_URL}/riot/account/v1/accounts/by-riot-id/{name}/{tag}"
-    res = requests.get(url, headers=HEADERS, timeout=5)
+    url = _url(ACCOUNT_API_URL, f"/riot/account/v1/accounts/by-riot-id/{name}/{tag}")
+    res = await riot_client.get(url, headers=HEADERS, timeout=5, method="account-v1.by-riot-id")
     res.raise_for_status()
     return res.json().get("puuid"), 'br1'
 
-def _get_real_lol_stats_and_frequencies(puuid, region):
-    url_ids = f"https://{MATCH_API_URL}/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count=20"
-    res_ids = requests.get(url_ids, headers=HEADERS, timeout=5)
+async def _get_real_lol_stats_and_frequencies(puuid, region):
+    url_ids = _url(MATCH_API_URL, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count={player_stats.WINDOW}")
+    res_ids = await riot_client.get(url_ids, headers=HEADERS, timeout=5, method="match-v5.ids-by-puuid")
     res_ids.raise_for_status()
     match_ids = res_ids.json()
     
     if not match_ids: raise Exception("Sem histórico ranqueado recente.")
-    
-    sums = {"k":0, "d":0, "a":0, "w":0, "valid":0}
-    lists = {"w":[], "k":[], "a":[], "d":[]}
-    counts = {"mvp_team":0, "mvp_match":0, "dmg":0, "farm":0}
-    roles = []
-
     print(f"   > Analisando {len(match_ids)} partidas...")
+    records, last_start = await _fetch_match_records(puuid, match_ids)
+    if not records: raise Exception("Nenhuma partida válida encontrada.")
+    window = player_stats.RollingStats()
+    for record in reversed(records): window.push(record) # da mais antiga para a mais nova
+    return _stats_from_window(window, last_start)
 
-    for mid in match_ids:
-        try:
-            url_m = f"https://{MATCH_API_URL}/lol/match/v5/matches/{mid}"
-            res_m = requests.get(url_m, headers=HEADERS, timeout=5)
-            if not res_m.ok: continue
-            
-            info = res_m.json().get("info", {})
-            if info.get("gameDuration", 0) <= 600: continue # Ignora remakes muito curtos
-
-            # ... (Lógica de análise de partida mantida para brevidade, é a mesma de get_match_details) ...
-            # Simplificação para cálculo de médias:
-            for p in info.get("participants", []):
-                if p.get("puuid") == puuid:
-                    sums["k"] += p.get("kills", 0)
-                    sums["d"] += p.get("deaths", 0)
-                    sums["a"] += p.get("assists", 0)
-                    if p.get("win"): sums["w"] += 1
-                    sums["valid"] += 1
-                    roles.append(p.get("teamPosition", "UNKNOWN"))
-                    lists["w"].append(p.get("win"))
-                    # (Cálculo de MVP simplificado aqui ou omitido para focar no fix da API)
-                    break
-
-        except Exception: pass
-        
-    if sums["valid"] == 0: raise Exception("Nenhuma partida válida encontrada.")
-    
-    v = sums["valid"]
+async def _refresh_player_stats(puuid, stats):
+    """
+    Atualização incremental: lista só as partidas iniciadas depois da última já contabilizada
+    (startTime) e empurra as novas na janela (player_stats.RollingStats), despejando as mais antigas.
+    Retorna os stats novos, ou None se não há partida nova.
+    """
+    if "mock" in puuid or not RIOT_API_KEY: return None
+    last_start = stats.get("lastGameStart")
+    if not stats.get("window") or not last_start:
+        # Stats antigos, sem a janela por partida: refaz uma vez do zero
+        fresh = await _get_real_lol_stats_and_frequencies(puuid, 'br1')
+        return {**stats, **fresh}
+
+    url_ids = _url(MATCH_API_URL, f"/lol/match/v5/matches/by-puuid/{puuid}/ids?queue=420&start=0&count={player_stats.WINDOW}&startTime={int(last_start) + 1}")
+    res_ids = await riot_client.get(url_ids, headers=HEADERS, timeout=5, method="match-v5.ids-by-puuid")
+    res_ids.raise_for_status()
+    window = player_stats.RollingStats.from_dict(stats["window"])
+    new_ids = [mid for mid in res_ids.json() if mid not in window]
+    if not new_ids: return None
+
+    records, new_start = await _fetch_match_records(puuid, new_ids)
+    for record in reversed(records): window.push(record)
+    return {**stats, **_stats_from_window(window, max(last_start, new_start or 0))}
+
+async def _fetch_match_records(puuid, match_ids):
+    """Baixa as partidas em paralelo (limitado por MATCH_FETCH_CONCURRENCY); falhas individuais são ignoradas.
+    Retorna (registros válidos na ordem de match_ids, início em segundos até onde tudo foi baixado).
+    match_ids vem da Riot da mais nova para a mais antiga: o início só avança até a partida anterior
+    à falha mais antiga, para que ela volte na próxima listagem (as já na janela são descartadas por id)."""
+    sem = asyncio.Semaphore(MATCH_FETCH_CONCURRENCY)
+    matches = await asyncio.gather(*(_fetch_parsed_match_limited(mid, sem) for mid in match_ids), return_exceptions=True)
+    failed = [i for i, m in enumerate(matches) if isinstance(m, BaseException)]
+    if failed: print(f"   > {len(failed)}/{len(match_ids)} partidas falharam, seguindo com as restantes.")
+
+    records, last_start = [], None
+    for i, match in enumerate(matches):
+        if isinstance(match, BaseException): continue
+        if match.started and (not failed or i > failed[-1]): last_start = max(last_start or 0, match.started // 1000)
+        record = _match_record(match, puuid)
+        if record: records.append(record)
+    return records, last_start
+
+def _match_record(match, puuid):
+    """Linha da janela para uma partida, ou None se for remake/sem o jogador."""
+    if match.duration <= 600: return None # Ignora remakes muito curtos
+    p = match.participant(puuid)
+    if not p: return None
     return {
-        "winRate": sums["w"]/v, 
-        "avgKills": sums["k"]/v, 
-        "avgAssists": sums["a"]/v, 
-        "avgDeaths": sums["d"]/v,
-        "recent_wins": lists["w"],
-        "player_roles": roles,
-        # Valores padrão se não calculados detalhadamente
-        "mvp_team_frequency": 0.15, 
-        "top_damage_frequency": 0.2
+        "id": match.match_id, "role": p.position,
+        "k": p.kills, "d": p.deaths, "a": p.assists, "cs": p.cs, "dmg": p.damage, "vis": p.vision,
+        "win": bool(p.win),
+        "mvp": match.mvp_team.get(p.team_id) == puuid,
+        "top_dmg": match.top_damage == puuid
     }
 
-def _calculate_performance_score(p, duration):
-    if duration <= 0: duration = 25
-    k = p.get("kills", 0)
-    d = p.get("deaths", 0)
-    a = p.get("assists", 0)
-    cs = p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0)
-    vis = p.get("visionScore", 0)
-    dmg = p.get("totalDamageDealtToChampions", 0)
-    
-    kda = (k + a) / (d if d > 0 else 1)
-    # Fórmula de MVP simples
-    return (kda * 10) + (cs/duration * 2) + (vis * 0.5) + (dmg/1000)
\ No newline at end of file
+def _stats_from_window(window, last_start):
+    """Stats planos (lidos pelo motor de odds) + a janela serializada."""
+    stats = player_stats.to_stats(window)
+    stats.update(window=window.to_dict(), lastGameStart=last_start)
+    return stats
+
+async def _fetch_parsed_match_limited(match_id, sem):
+    async with sem:
+        return await _fetch_parsed_match(match_id)
+
+async def _fetch_parsed_match(match_id):
+    """
+    Partida já projetada (match_parser.ParsedMatch). Consulta o match_cache antes da Riot:
+    partidas encerradas são imutáveis, então qualquer 200 pode ser guardado para sempre.
+    O documento completo da Riot é descartado logo após o parse; o cache guarda só a projeção.
+    O SQLite é bloqueante: leitura e gravação rodam em threads, fora do loop compartilhado do riot_client.
+    """
+    cached = await asyncio.to_thread(match_cache.get, match_id) if match_cache.enabled() else None
+    if match_parser.is_compact(cached): return match_parser.ParsedMatch.from_compact(cached)
+    if cached is not None:
+        # Entrada antiga (JSON completo): converte e regrava compacta
+        match = match_parser.ParsedMatch.from_doc(match_id, cached)
+        _cache_match(match)
+        return match
+    url = _url(MATCH_API_URL, f"/lol/match/v5/matches/{match_id}")
+    res = await riot_client.get(url, headers=HEADERS, timeout=5, method="match-v5.match")
+    res.raise_for_status()
+    match = match_parser.ParsedMatch.from_doc(match_id, res.json())
+    _cache_match(match)
+    return match
+
+def _cache_match(match):
+    """Grava no match_cache em segundo plano (put nunca levanta exceção); quem pediu a partida não espera o disco."""
+    if match_cache.enabled(): asyncio.get_running_loop().run_in_executor(None, match_cache.put, match.match_id, match.to_compact())
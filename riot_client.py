@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+import riot_ratelimit
+from riot_ratelimit import LANE_INTERACTIVE, LANE_BACKGROUND
+
+# --- CLIENTE HTTP DA RIOT (POOL ÚNICO + KEEP-ALIVE) ---
+# Todas as chamadas à Riot passam por um único httpx.AsyncClient que vive num event loop
+# próprio (thread "riot-http"). Assim:
+#   - rotas async do FastAPI fazem `await run_async(...)` sem travar o loop do uvicorn;
+#   - código síncrono (scheduler, BackgroundTasks) usa `run_sync(...)` e reaproveita o mesmo pool.
+RIOT_HTTP_MAX_CONNECTIONS = int(os.getenv("RIOT_HTTP_MAX_CONNECTIONS", "20"))
+RIOT_HTTP_MAX_KEEPALIVE = int(os.getenv("RIOT_HTTP_MAX_KEEPALIVE", "10"))
+RIOT_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("RIOT_HTTP_KEEPALIVE_EXPIRY", "30"))
+# Novas tentativas após 429 (cada uma respeita o Retry-After via riot_ratelimit)
+RIOT_MAX_RETRIES = int(os.getenv("RIOT_MAX_RETRIES", "2"))
+
+# Scheduler compartilhado por todas as chamadas; a lane vem do contexto de quem chamou run_sync/run_async
+limiter = riot_ratelimit.RateLimiter()
+_lane = contextvars.ContextVar("riot_lane", default=LANE_BACKGROUND)
+
+REQUEST_SECONDS = metrics.histogram("riot_request_duration_seconds", "Duração das chamadas HTTP à Riot (sem a espera do rate limiter)", ["method", "status"])
+LIMITER_WAIT_SECONDS = metrics.histogram("riot_rate_limiter_wait_seconds", "Tempo na fila do rate limiter antes de cada chamada", ["lane"])
+metrics.gauge("riot_rate_limiter_queue_depth", "Pedidos aguardando o rate limiter, por lane", ["lane"],
+              collect=lambda: {(lane,): depth for lane, depth in limiter.stats()["queue_depth"].items()})
+
+_lock = threading.Lock()
+_loop = None
+_client = None
+
+def _ensure_loop():
+    global _loop, _client
+    if _loop is not None: return _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="riot-http", daemon=True).start()
+            _client = asyncio.run_coroutine_threadsafe(_create_client(), loop).result()
+            _loop = loop
+    return _loop
+
+async def _create_client():
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=RIOT_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=RIOT_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=RIOT_HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=5
+    )
+
+async def get(url, headers=None, timeout=5, method="default"):
+    """
+    GET pelo pool compartilhado, passando antes pelo rate limiter. `method` identifica o endpoint
+    da Riot para o method limit. Só pode ser aguardado de dentro do loop da Riot (ver run_sync/run_async).
+    """
+    host, lane = urlsplit(url).netloc, _lane.get()
+    for attempt in range(RIOT_MAX_RETRIES + 1):
+        # Pedido interativo não fica preso na fila além do próprio timeout
+        queued = time.perf_counter()
+        if lane == LANE_INTERACTIVE: await asyncio.wait_for(limiter.acquire(host, method, lane), timeout)
+        else: await limiter.acquire(host, method, lane)
+        started = time.perf_counter()
+        LIMITER_WAIT_SECONDS.observe(started - queued, lane=riot_ratelimit.LANE_NAMES.get(lane, str(lane)))
+        try: res = await _client.get(url, headers=headers, timeout=timeout)
+        except Exception as e:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, status=type(e).__name__)
+            raise
+        REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, status=res.status_code)
+        limiter.update(host, method, res.status_code, res.headers)
+        if res.status_code != 429 or attempt == RIOT_MAX_RETRIES: return res
+    return res
+
+async def _in_lane(coro, lane):
+    token = _lane.set(lane)
+    try: return await coro
+    finally: _lane.reset(token)
+
+def submit(coro, lane=LANE_BACKGROUND):
+    """Agenda a corrotina no loop da Riot e devolve um concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(_in_lane(coro, lane), _ensure_loop())
+
+def run_sync(coro, lane=LANE_BACKGROUND):
+    """Executa a corrotina no loop da Riot bloqueando a thread atual (uso fora do event loop)."""
+    return submit(coro, lane).result()
+
+async def run_async(coro, lane=LANE_INTERACTIVE):
+    """Executa a corrotina no loop da Riot sem bloquear o loop de quem chamou."""
+    if asyncio.get_running_loop() is _ensure_loop(): return await _in_lane(coro, lane)
+    return await asyncio.wrap_future(submit(coro, lane))
+
+def stats():
+    """Profundidade das filas por lane, esperas acumuladas, 429 recebidos e limites em vigor."""
+    return limiter.stats()
+
+def close():
+    """Fecha o pool e encerra o loop da Riot (chamado no shutdown do app)."""
+    global _loop, _client
+    with _lock:
+        if _loop is None: return
+        loop, client = _loop, _client
+        _loop, _client = None, None
+    try: asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+    except Exception: pass
+    loop.call_soon_threadsafe(loop.stop)
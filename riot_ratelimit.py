@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+# --- RATE LIMIT DA RIOT (LADO DO CLIENTE) ---
+# Token buckets por região (app limit) e por região+método (method limit), configurados a partir
+# dos headers X-App-Rate-Limit / X-Method-Rate-Limit que a Riot devolve em toda resposta.
+# Os pedidos esperam numa fila com prioridade: aposta ao vivo > conexão de conta > resolução.
+# Fila e buckets só são usados de dentro do loop de riot_client; o _state_lock existe porque stats()
+# é lido de outras threads (gauge do /metrics, /api/admin/riot-status).
+LANE_INTERACTIVE = 0   # anti-snipping / lastMatchId em place_bet_endpoint
+LANE_CONNECT = 1       # estatísticas ao conectar conta
+LANE_BACKGROUND = 2    # resolução de apostas e jobs em segundo plano
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_CONNECT: "connect", LANE_BACKGROUND: "background"}
+
+# Limite inicial até a primeira resposta da Riot (padrão de chave de desenvolvimento)
+DEFAULT_APP_RATE_LIMIT = os.getenv("RIOT_APP_RATE_LIMIT", "20:1,100:120")
+# Espera usada quando um 429 chega sem Retry-After (ex: limite de serviço)
+DEFAULT_RETRY_AFTER = 1.0
+
+logger = logging.getLogger("GlitchArena")
+
+def parse_limits(header):
+    """'20:1,100:120' -> [(20, 1.0), (100, 120.0)]"""
+    limits = []
+    for part in (header or "").split(","):
+        try:
+            count, window = part.strip().split(":")
+            if int(count) > 0 and float(window) > 0: limits.append((int(count), float(window)))
+        except ValueError: continue
+    return limits
+
+class _Bucket:
+    """Token bucket: até `limit` requisições a cada `window` segundos, recarga contínua."""
+    __slots__ = ("limit", "window", "tokens", "updated")
+
+    def __init__(self, limit, window, used=0):
+        self.limit, self.window = limit, window
+        self.tokens = float(max(limit - used, 0))
+        self.updated = time.monotonic()
+
+    def wait_time(self, now):
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.window)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.window / self.limit
+
+    def take(self):
+        self.tokens -= 1
+
+class RateLimiter:
+    def __init__(self, default_app_limits=DEFAULT_APP_RATE_LIMIT):
+        self._default_app = parse_limits(default_app_limits)
+        self._app = {}            # host -> [_Bucket]
+        self._methods = {}        # (host, method) -> [_Bucket]
+        self._blocked_until = {}  # host ou (host, method) -> time.monotonic() liberado
+        self._queue = []          # heap de (lane, seq, host, method, future)
+        self._seq = itertools.count()
+        self._state_lock = threading.Lock()
+        self._wakeup = None
+        self._pump_task = None
+        self._stats = {
+            "granted": {name: 0 for name in LANE_NAMES.values()},
+            "wait_seconds": {name: 0.0 for name in LANE_NAMES.values()},
+            "throttled_429": 0, "max_queue_depth": 0
+        }
+
+    # --- FILA ---
+    async def acquire(self, host, method, lane=LANE_BACKGROUND):
+        """Espera até haver token no app limit e no method limit, respeitando a prioridade da lane."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._state_lock:
+            heapq.heappush(self._queue, (lane, next(self._seq), host, method, fut))
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        if self._pump_task is None or self._pump_task.done():
+            self._wakeup = asyncio.Event()
+            self._pump_task = loop.create_task(self._pump())
+        else: self._wakeup.set()
+
+        start = time.monotonic()
+        await fut
+        name = LANE_NAMES.get(lane, str(lane))
+        with self._state_lock:
+            self._stats["granted"][name] = self._stats["granted"].get(name, 0) + 1
+            self._stats["wait_seconds"][name] = self._stats["wait_seconds"].get(name, 0.0) + time.monotonic() - start
+
+    async def _pump(self):
+        while self._queue:
+            wait = self._dispatch(time.monotonic())
+            if not self._queue: break
+            self._wakeup.clear()
+            try: await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError: pass
+
+    def _dispatch(self, now):
+        """Libera, em ordem de prioridade, todo pedido que já tem token. Retorna quanto esperar pelo próximo."""
+        with self._state_lock: return self._dispatch_locked(now)
+
+    def _dispatch_locked(self, now):
+        held, next_wait = [], 60.0
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            lane, _, host, method, fut = item
+            if fut.done(): continue # cancelado (timeout/cliente desistiu)
+            app_buckets, method_buckets = self._buckets(host, method)
+            wait = max(
+                [b.wait_time(now) for b in app_buckets + method_buckets] +
+                [self._blocked_until.get(host, 0) - now, self._blocked_until.get((host, method), 0) - now]
+            )
+            if wait > 0:
+                held.append(item)
+                next_wait = min(next_wait, wait)
+                continue
+            for b in app_buckets + method_buckets: b.take()
+            fut.set_result(None)
+        for item in held: heapq.heappush(self._queue, item)
+        return next_wait
+
+    def _buckets(self, host, method):
+        if host not in self._app: self._app[host] = [_Bucket(c, w) for c, w in self._default_app]
+        return self._app[host], self._methods.get((host, method), [])
+
+    # --- FEEDBACK DAS RESPOSTAS ---
+    def update(self, host, method, status_code, headers):
+        """Ajusta buckets pelos headers da Riot e aplica Retry-After em respostas 429."""
+        with self._state_lock: self._update_locked(host, method, status_code, headers)
+        if self._wakeup is not None: self._wakeup.set()
+
+    def _update_locked(self, host, method, status_code, headers):
+        now = time.monotonic()
+        app = parse_limits(headers.get("X-App-Rate-Limit"))
+        if app: self._app[host] = self._sync(self._app.get(host), app, headers.get("X-App-Rate-Limit-Count"))
+        meth = parse_limits(headers.get("X-Method-Rate-Limit"))
+        if meth: self._methods[(host, method)] = self._sync(self._methods.get((host, method)), meth, headers.get("X-Method-Rate-Limit-Count"))
+
+        if status_code == 429:
+            self._stats["throttled_429"] += 1
+            try: retry_after = float(headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+            except ValueError: retry_after = DEFAULT_RETRY_AFTER
+            scope = host if headers.get("X-Rate-Limit-Type") == "application" else (host, method)
+            self._blocked_until[scope] = max(self._blocked_until.get(scope, 0), now + retry_after)
+            logger.warning("[RateLimit] 429 em %s (%s). Pausando %.1fs.", method, headers.get("X-Rate-Limit-Type", "service"), retry_after)
+
+    @staticmethod
+    def _sync(current, limits, count_header):
+        """Recria os buckets se o limite mudou; usa a contagem da Riot para não gastar além do permitido."""
+        counts = {w: c for c, w in parse_limits(count_header)}
+        if current is None or [(b.limit, b.window) for b in current] != limits:
+            return [_Bucket(c, w, counts.get(w, 0)) for c, w in limits]
+        for b in current:
+            if b.window in counts: b.tokens = min(b.tokens, b.limit - counts[b.window])
+        return current
+
+    # --- MÉTRICAS ---
+    def stats(self):
+        """Retrato consistente do estado; pode ser chamado de qualquer thread."""
+        with self._state_lock:
+            depth = {name: 0 for name in LANE_NAMES.values()}
+            for lane, _, _, _, fut in self._queue:
+                if not fut.done(): depth[LANE_NAMES.get(lane, str(lane))] = depth.get(LANE_NAMES.get(lane, str(lane)), 0) + 1
+            now = time.monotonic()
+            return {
+                "granted": dict(self._stats["granted"]), "wait_seconds": dict(self._stats["wait_seconds"]),
+                "throttled_429": self._stats["throttled_429"], "max_queue_depth": self._stats["max_queue_depth"],
+                "queue_depth": depth,
+                "app_limits": {h: [(b.limit, b.window) for b in bs] for h, bs in self._app.items()},
+                "blocked": {str(k): round(v - now, 2) for k, v in self._blocked_until.items() if v > now}
+            }
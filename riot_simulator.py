@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# --- SIMULADOR LOCAL DA API DA RIOT ---
+# Servidor HTTP que imita as rotas que o riot_api usa (account-v1, summoner-v4, match-v5 e
+# spectator-v5) com jogadores e partidas sintéticos, para testar carga nos fluxos de conectar
+# conta e resolver apostas sem gastar a chave de produção.
+#
+#   python riot_simulator.py --port 8010 --profile flaky
+#   RIOT_API_BASE_URL=http://127.0.0.1:8010 RIOT_API_KEY=sim uvicorn server:app
+#
+# Qualquer Riot ID existe e vira um puuid determinístico. Cada jogador começa uma partida a cada
+# SIM_GAME_PERIOD_SECONDS (com fase própria) e fica em jogo pela duração dela; o Spectator responde
+# 200 durante a partida e a match-v5 só lista partidas já encerradas. O relógio pode ser adiantado
+# (POST /__sim/advance) para "terminar" as partidas de todos de uma vez.
+#
+# Perfis (SIM_PROFILE ou --profile) controlam latência, limites com headers de rate limit,
+# rajadas de 429, quedas e erros aleatórios; POST /__sim/profile troca ou ajusta em tempo real.
+SIM_EPOCH = 1_700_000_000
+SIM_GAME_PERIOD_SECONDS = int(os.getenv("SIM_GAME_PERIOD_SECONDS", "3600"))
+ROLES = ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")
+
+PROFILES = {
+    # Sem atraso nem limite efetivo: mede só o nosso lado
+    "fast": {"latency": {"dist": "fixed", "ms": 0}, "app_limits": "100000:10", "method_limits": {},
+             "error_rate": 0.0, "burst_429": None, "outage": None},
+    # Chave de produção: latência realista, limites altos
+    "prod": {"latency": {"dist": "lognormal", "median_ms": 60, "sigma": 0.5}, "app_limits": "500:10,30000:600",
+             "method_limits": {"match-v5.match": "2000:10"}, "error_rate": 0.0, "burst_429": None, "outage": None},
+    # Chave de desenvolvimento: 20/s e 100 a cada 2 min, como a Riot aplica
+    "dev-key": {"latency": {"dist": "lognormal", "median_ms": 80, "sigma": 0.6}, "app_limits": "20:1,100:120",
+                "method_limits": {}, "error_rate": 0.0, "burst_429": None, "outage": None},
+    # Cauda longa, 2% de 500 e 5s de 429 de serviço (sem Retry-After) a cada minuto
+    "flaky": {"latency": {"dist": "lognormal", "median_ms": 120, "sigma": 1.0}, "app_limits": "500:10,30000:600",
+              "method_limits": {}, "error_rate": 0.02, "burst_429": {"every": 60, "length": 5}, "outage": None},
+    # 30s de 503 a cada 2 minutos
+    "outage": {"latency": {"dist": "uniform", "min_ms": 40, "max_ms": 200}, "app_limits": "500:10,30000:600",
+               "method_limits": {}, "error_rate": 0.0, "burst_429": None, "outage": {"every": 120, "length": 30, "status": 503}},
+}
+
+# --- JOGADORES E PARTIDAS SINTÉTICOS ---
+def _hash(*parts):
+    return int.from_bytes(hashlib.sha1(":".join(map(str, parts)).encode()).digest()[:8], "big")
+
+def puuid_for(name, tag): return f"sim-{_hash(name.lower(), tag.lower()):016x}"
+
+def _phase(puuid): return _hash(puuid, "phase") % SIM_GAME_PERIOD_SECONDS
+
+def game_window(puuid, k):
+    """(início, duração) em segundos da k-ésima partida do jogador."""
+    start = SIM_EPOCH + _phase(puuid) + k * SIM_GAME_PERIOD_SECONDS
+    return start, 1300 + _hash(puuid, k, "duration") % 1100
+
+def _current_k(puuid, now): return math.floor((now - SIM_EPOCH - _phase(puuid)) / SIM_GAME_PERIOD_SECONDS)
+
+def match_id(puuid, k): return f"BR1_{puuid}_{k}"
+
+def finished_matches(puuid, now, start_time=None, end_time=None, start=0, count=20):
+    """Ids das partidas encerradas, da mais nova para a mais antiga (como a match-v5)."""
+    ids, k = [], _current_k(puuid, now)
+    while len(ids) < start + count and k >= 0:
+        begin, duration = game_window(puuid, k)
+        if start_time is not None and begin < start_time: break
+        if begin + duration <= now and (end_time is None or begin <= end_time): ids.append(match_id(puuid, k))
+        k -= 1
+    return ids[start:start + count]
+
+def _participant(puuid, k, index, win, duration):
+    rng = random.Random(_hash(puuid, k, "stats"))
+    skill = 0.6 + (_hash(puuid, "skill") % 1000) / 1000  # o mesmo jogador mantém o nível entre partidas
+    minutes = duration / 60
+    return {
+        "puuid": puuid, "teamId": 100 if index < 5 else 200, "teamPosition": ROLES[index % 5],
+        "kills": int(rng.gammavariate(2, 2.5 * skill)), "deaths": int(rng.gammavariate(2.5, 2.2 / skill)),
+        "assists": int(rng.gammavariate(2.5, 3 * skill)),
+        "totalMinionsKilled": int(rng.uniform(3, 8) * minutes * skill), "neutralMinionsKilled": rng.randint(0, 40),
+        "visionScore": int(rng.uniform(0.5, 2.2) * minutes), "totalDamageDealtToChampions": int(rng.uniform(500, 1100) * minutes * skill),
+        "win": win
+    }
+
+def match_document(mid):
+    puuid, k = mid[len("BR1_"):].rsplit("_", 1)
+    k = int(k)
+    begin, duration = game_window(puuid, k)
+    seat = _hash(puuid, k, "seat") % 10
+    blue_wins = _hash(puuid, k, "win") % 2 == 0
+    participants = []
+    for i in range(10):
+        player = puuid if i == seat else f"sim-{_hash(mid, i):016x}"
+        participants.append(_participant(player, k, i, (i < 5) == blue_wins, duration))
+    return {
+        "metadata": {"matchId": mid, "participants": [p["puuid"] for p in participants]},
+        "info": {"gameCreation": begin * 1000 - 60_000, "gameStartTimestamp": begin * 1000, "gameDuration": duration,
+                 "gameMode": "CLASSIC", "queueId": 420, "participants": participants}
+    }
+
+def active_game(puuid, now):
+    k = _current_k(puuid, now)
+    begin, duration = game_window(puuid, k)
+    if not begin <= now < begin + duration: return None
+    return {"gameId": _hash(puuid, k) % 10**10, "gameMode": "CLASSIC", "gameType": "MATCHED_GAME", "gameQueueConfigId": 420,
+            "gameStartTime": begin * 1000, "gameLength": int(now - begin), "participants": [{"puuid": puuid}]}
+
+# --- PERFIL DE FALHAS E LIMITES ---
+def parse_limits(spec):
+    return [tuple(int(x) for x in part.split(":")) for part in (spec or "").split(",") if part]
+
+class _Window:
+    """Janela fixa como a da Riot: começa no primeiro pedido e zera quando expira."""
+    __slots__ = ("limit", "seconds", "started", "count")
+    def __init__(self, limit, seconds): self.limit, self.seconds, self.started, self.count = limit, seconds, 0.0, 0
+    def roll(self, now):
+        if now - self.started >= self.seconds: self.started, self.count = now, 0
+    def retry_after(self, now): return max(1, math.ceil(self.started + self.seconds - now))
+
+class Simulator:
+    def __init__(self, profile="prod"):
+        self._lock = threading.Lock()
+        self.offset = 0.0
+        self.started = time.time()
+        self.requests = Counter()  # (método, status) -> total
+        self.set_profile(profile)
+
+    def now(self): return time.time() + self.offset
+
+    def set_profile(self, name=None, **overrides):
+        with self._lock:
+            base = dict(PROFILES[name]) if name else dict(self.profile)
+            base.update({k: v for k, v in overrides.items() if k in PROFILES["prod"]})
+            self.profile, self.profile_name = base, name or self.profile_name
+            self.app_windows = [_Window(*l) for l in parse_limits(base["app_limits"])]
+            self.method_windows = {m: [_Window(*l) for l in parse_limits(spec)] for m, spec in base.get("method_limits", {}).items()}
+
+    def latency(self):
+        cfg = self.profile["latency"]
+        if cfg["dist"] == "lognormal": return random.lognormvariate(math.log(max(cfg["median_ms"], 0.001)), cfg["sigma"]) / 1000
+        if cfg["dist"] == "uniform": return random.uniform(cfg["min_ms"], cfg["max_ms"]) / 1000
+        return cfg.get("ms", 0) / 1000
+
+    def _in_cycle(self, cfg, now):
+        return bool(cfg) and (now - self.started) % cfg["every"] < cfg["length"]
+
+    def admit(self, method):
+        """Retorna (status de falha ou None, headers). Aplica queda, rajada de 429, limites e erro aleatório."""
+        now = time.time()
+        with self._lock:
+            outage, burst = self.profile.get("outage"), self.profile.get("burst_429")
+            if self._in_cycle(outage, now): return outage.get("status", 503), {}
+            if self._in_cycle(burst, now): return 429, {"X-Rate-Limit-Type": "service"}
+            windows = self.method_windows.get(method, [])
+            for w in self.app_windows + windows: w.roll(now)
+            headers = {
+                "X-App-Rate-Limit": self.profile["app_limits"],
+                "X-App-Rate-Limit-Count": ",".join(f"{w.count + 1}:{w.seconds}" for w in self.app_windows),
+            }
+            if windows:
+                headers["X-Method-Rate-Limit"] = self.profile["method_limits"][method]
+                headers["X-Method-Rate-Limit-Count"] = ",".join(f"{w.count + 1}:{w.seconds}" for w in windows)
+            for kind, group in (("application", self.app_windows), ("method", windows)):
+                full = [w for w in group if w.count >= w.limit]
+                if full: return 429, {**headers, "X-Rate-Limit-Type": kind, "Retry-After": str(max(w.retry_after(now) for w in full))}
+            for w in self.app_windows + windows: w.count += 1
+            if self.profile.get("error_rate") and random.random() < self.profile["error_rate"]: return 500, headers
+            return None, headers
+
+    def record(self, method, status):
+        with self._lock: self.requests[(method, status)] += 1
+
+    def stats(self):
+        with self._lock:
+            return {"profile": self.profile_name, "clock_offset": self.offset, "total": sum(self.requests.values()),
+                    "requests": [{"method": m, "status": s, "count": c} for (m, s), c in sorted(self.requests.items())]}
+
+sim = Simulator(os.getenv("SIM_PROFILE", "prod"))
+app = FastAPI(title="Riot API Simulator")
+
+async def _respond(method, build):
+    """Latência do perfil, depois falha injetada ou a resposta de `build()` (dict/list, ou None = 404)."""
+    delay = sim.latency()
+    if delay: await asyncio.sleep(delay)
+    status, headers = sim.admit(method)
+    if status is None:
+        body = build()
+        status = 200 if body is not None else 404
+        if body is None: body = {"status": {"message": "Data not found", "status_code": 404}}
+    else: body = {"status": {"message": "Simulated failure", "status_code": status}}
+    sim.record(method, status)
+    return JSONResponse(body, status_code=status, headers=headers)
+
+# --- ROTAS DA RIOT ---
+@app.get("/riot/account/v1/accounts/by-riot-id/{name}/{tag}")
+async def account_by_riot_id(name: str, tag: str):
+    return await _respond("account-v1.by-riot-id", lambda: {"puuid": puuid_for(name, tag), "gameName": name, "tagLine": tag})
+
+@app.get("/lol/summoner/v4/summoners/by-puuid/{puuid}")
+async def summoner_by_puuid(puuid: str):
+    return await _respond("summoner-v4.by-puuid", lambda: {"puuid": puuid, "summonerLevel": 30 + _hash(puuid, "level") % 470, "profileIconId": 1})
+
+@app.get("/lol/match/v5/matches/by-puuid/{puuid}/ids")
+async def match_ids(puuid: str, start: int = 0, count: int = 20, startTime: int = None, endTime: int = None, queue: int = None):
+    if queue not in (None, 420): return await _respond("match-v5.ids-by-puuid", lambda: [])
+    return await _respond("match-v5.ids-by-puuid", lambda: finished_matches(puuid, sim.now(), startTime, endTime, start, min(count, 100)))
+
+@app.get("/lol/match/v5/matches/{match_id}")
+async def match(match_id: str):
+    def build():
+        try: puuid, k = match_id[len("BR1_"):].rsplit("_", 1)
+        except ValueError: return None
+        begin, duration = game_window(puuid, int(k))
+        return match_document(match_id) if begin + duration <= sim.now() else None
+    return await _respond("match-v5.match", build)
+
+@app.get("/lol/spectator/v5/active-games/by-summoner/{puuid}")
+async def spectator(puuid: str):
+    return await _respond("spectator-v5.active-games", lambda: active_game(puuid, sim.now()))
+
+# --- CONTROLE DO SIMULADOR ---
+@app.get("/__sim/stats")
+async def sim_stats(): return sim.stats()
+
+@app.post("/__sim/profile")
+async def sim_profile(request: Request):
+    """{"name": "flaky"} troca o perfil; os demais campos (latency, app_limits, outage...) ajustam o atual."""
+    data = await request.json()
+    name = data.pop("name", None)
+    if name is not None and name not in PROFILES: return JSONResponse({"error": f"Perfil desconhecido: {name}"}, status_code=400)
+    sim.set_profile(name, **data)
+    return {"profile": sim.profile_name, **sim.profile}
+
+@app.post("/__sim/advance")
+async def sim_advance(request: Request):
+    """Adianta o relógio simulado (padrão: um período de jogo, o que encerra a partida de todo mundo)."""
+    data = await request.json() if await request.body() else {}
+    sim.offset += float(data.get("seconds", SIM_GAME_PERIOD_SECONDS))
+    return {"clock_offset": sim.offset}
+
+@app.post("/__sim/reset")
+async def sim_reset():
+    with sim._lock: sim.requests.clear()
+    sim.set_profile(sim.profile_name)
+    return sim.stats()
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Simulador local da API da Riot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--profile", default=os.getenv("SIM_PROFILE", "prod"), choices=sorted(PROFILES))
+    args = parser.parse_args()
+    sim.set_profile(args.profile)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -1,4 +1,5 @@
 import os
+import copy
 import math
 import threading
 import uuid
@@ -7,15 +8,19 @@ import string
 import json
 import time
 import logging
+import asyncio
+import contextvars
 from typing import List, Optional, Dict, Any
+from collections import OrderedDict
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 
 # FastAPI Imports
 from fastapi import FastAPI, HTTPException, Request, Depends, Header, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel, ConfigDict
 
 # Scheduler
@@ -29,7 +34,17 @@ from google.cloud.firestore_v1.transaction import Transaction
 
 # Logic Imports
 import prime_engine as odds_engine
+import prime_batch
 import riot_api
+import riot_client
+import io_pool
+import token_cache
+import match_cache
+import aggregates
+import bet_schedule
+import settlement
+import metrics
+import firestore_trace
 
 # --- CONFIGURAÇÃO DE LOGS ---
 logging.basicConfig(
@@ -56,17 +71,33 @@ if not firebase_admin._apps:
         logger.info("Firebase inicializado com sucesso.")
     except ValueError: pass
 
-db = firestore.client()
+# Todas as chamadas ao Firestore passam pelo firestore_trace (duração por operação em /metrics)
+db = firestore_trace.TracedClient(firestore.client())
+
+# Consultas simultâneas à Riot durante a resolução (um worker por jogador)
+RESOLVER_MAX_WORKERS = int(os.getenv("RESOLVER_MAX_WORKERS", "8"))
+# O resolvedor acorda a cada RESOLVER_TICK_SECONDS, mas só consulta os jogadores vencidos na agenda (bet_schedule)
+RESOLVER_TICK_SECONDS = int(os.getenv("RESOLVER_TICK_SECONDS", "30"))
+# Reconciliação periódica dos agregados do dashboard (aggregates.rebuild)
+AGGREGATES_REBUILD_HOURS = float(os.getenv("AGGREGATES_REBUILD_HOURS", "24"))
 
 # --- LIFESPAN ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     scheduler = BackgroundScheduler()
-    scheduler.add_job(_resolve_bets_logic, 'interval', minutes=10)
+    scheduler.add_job(_resolve_bets_logic, 'interval', seconds=RESOLVER_TICK_SECONDS)
+    scheduler.add_job(_rebuild_aggregates, 'interval', hours=AGGREGATES_REBUILD_HOURS)
     scheduler.start()
     logger.info(">>> SISTEMA: Agendador de desafios (Worker) INICIADO.")
+    config_watch = None
+    if CONFIG_SNAPSHOT_LISTENER:
+        try: config_watch = db.collection('platform').document('config').on_snapshot(_on_config_snapshot)
+        except Exception as e: logger.error(f"Listener de config indisponível, usando só TTL: {e}")
     yield
+    if config_watch: config_watch.unsubscribe()
     scheduler.shutdown()
+    riot_client.close()
+    io_pool.shutdown()
     logger.info(">>> SISTEMA: Agendador de desafios DESLIGADO.")
 
 app = FastAPI(lifespan=lifespan, title="Glitch Arena API")
@@ -79,15 +110,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- MÉTRICAS ---
+# Expostas em /metrics (formato Prometheus). METRICS_TOKEN, se definido, exige `Authorization: Bearer <token>`.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+SLOW_ROUTE_SECONDS = float(os.getenv("SLOW_ROUTE_SECONDS", "1.0"))
+ACCESS_LOG = os.getenv("ACCESS_LOG", "0") == "1"  # loga toda requisição com tempo e totais de Firestore, não só as lentas
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requisições HTTP por rota e status", ["method", "route", "status"])
+HTTP_SECONDS = metrics.histogram("http_request_duration_seconds", "Latência das requisições HTTP por rota", ["method", "route"])
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "Requisições HTTP em andamento", ["method"])
+AUTH_VERIFY_SECONDS = metrics.histogram("firebase_auth_verify_duration_seconds", "Verificação de ID token no Firebase Auth (cache miss)", ["result"])
+RESOLVER_CYCLE_SECONDS = metrics.histogram("resolver_cycle_duration_seconds", "Duração dos ciclos do resolvedor de apostas",
+                                           ["kind"], buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+RESOLVER_PENDING_BETS = metrics.gauge("resolver_pending_bets", "Apostas pendentes na última varredura completa")
+RESOLVER_PLAYERS_POLLED = metrics.counter("resolver_players_polled_total", "Jogadores consultados na Riot pelo resolvedor")
+
 # --- MIDDLEWARE ---
 @app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    if process_time > 1.0:
-        logger.warning(f"Rota Lenta: {request.url.path} levou {process_time:.4f}s")
-    return response
+async def record_request_metrics(request: Request, call_next):
+    method, start = request.method, time.perf_counter()
+    HTTP_IN_FLIGHT.inc(method=method)
+    status = 500
+    # Leituras/gravações no Firestore feitas por esta requisição (inclusive nas threads do io_pool)
+    with firestore_trace.track() as usage:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec(method=method)
+            # Template da rota (/api/get-user-data), não o path cru: mantém a cardinalidade baixa
+            route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+            usage.source = route
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            HTTP_SECONDS.observe(elapsed, method=method, route=route)
+            if elapsed > SLOW_ROUTE_SECONDS: logger.warning(f"Rota Lenta: {route} levou {elapsed:.4f}s ({usage})")
+            elif ACCESS_LOG: logger.info(f"{method} {route} {status} {elapsed:.4f}s ({usage})")
 
 # --- MODELS ---
 class InitUserRequest(BaseModel):
@@ -135,11 +194,36 @@ class ValidationKycRequest(BaseModel):
     birthdate: str
 
 # --- DEPS ---
+# Tokens verificados ficam em cache até o exp. AUTH_CHECK_REVOKED=1 faz a verificação consultar
+# revogação no Firebase e revalidar cada token a cada AUTH_REVOCATION_RECHECK_SECONDS.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "0") == "1"
+AUTH_REVOCATION_RECHECK_SECONDS = float(os.getenv("AUTH_REVOCATION_RECHECK_SECONDS", "300"))
+
+def _verify_id_token(token: str) -> dict:
+    start, result = time.perf_counter(), "ok"
+    try: return auth.verify_id_token(token, check_revoked=AUTH_CHECK_REVOKED)
+    except Exception:
+        result = "error"
+        raise
+    finally: AUTH_VERIFY_SECONDS.observe(time.perf_counter() - start, result=result)
+
+id_tokens = token_cache.TokenCache(
+    _verify_id_token,
+    max_size=AUTH_TOKEN_CACHE_SIZE,
+    revocation_recheck_seconds=AUTH_REVOCATION_RECHECK_SECONDS if AUTH_CHECK_REVOKED else None
+)
+
+async def _verify_token(token: str) -> dict:
+    """Cache hit resolve no próprio loop; só a verificação real (cripto/rede) vai para o pool."""
+    claims = id_tokens.lookup(token)
+    return claims if claims is not None else await io_pool.run(id_tokens.refresh, token)
+
 async def get_current_user_uid(authorization: str = Header(None)):
     if not authorization: raise HTTPException(401, "Token ausente")
     try:
         token = authorization.split(" ")[1]
-        return auth.verify_id_token(token)['uid']
+        return (await _verify_token(token))['uid']
     except Exception as e: 
         logger.warning(f"Falha de Auth UID: {e}")
         raise HTTPException(401, "Token inválido")
@@ -148,7 +232,7 @@ async def get_current_user_token(authorization: str = Header(None)):
     if not authorization: raise HTTPException(401, "Token ausente")
     try:
         token = authorization.split(" ")[1]
-        return auth.verify_id_token(token)
+        return await _verify_token(token)
     except Exception as e: 
         logger.warning(f"Falha de Auth Token: {e}")
         raise HTTPException(401, "Token inválido")
@@ -156,7 +240,7 @@ async def get_current_user_token(authorization: str = Header(None)):
 async def verify_admin(authorization: str = Header(None)):
     if not authorization: raise HTTPException(401, "Token ausente")
     try:
-        decoded = auth.verify_id_token(authorization.split(" ")[1])
+        decoded = await _verify_token(authorization.split(" ")[1])
         if not decoded.get('admin'): 
             logger.warning(f"Tentativa de acesso Admin negada: {decoded.get('email')}")
             raise HTTPException(403, "Requer admin")
@@ -169,28 +253,57 @@ def _sanitize_cpf(cpf: str) -> str:
     if not cpf: return ""
     return "".join(filter(str.isdigit, cpf))
 
+# --- CONFIG DA PLATAFORMA (CACHE) ---
+# A config é lida em quase toda rota; mantemos uma cópia em memória com TTL curto.
+# set-config grava direto no cache e, com o listener ligado, qualquer worker recebe a mudança na hora.
+CONFIG_CACHE_TTL_SECONDS = float(os.getenv("CONFIG_CACHE_TTL_SECONDS", "30"))
+CONFIG_SNAPSHOT_LISTENER = os.getenv("CONFIG_SNAPSHOT_LISTENER", "1") == "1"
+
+_config_lock = threading.Lock()
+_config_cache = {"data": None, "expires": 0.0}
+
 def get_platform_config():
+    with _config_lock:
+        cached, fresh = _config_cache["data"], time.monotonic() < _config_cache["expires"]
+    if cached is not None and fresh: return copy.deepcopy(cached)
     try:
-        c = db.collection('platform').document('config').get().to_dict() or {}
-        defaults = {
-            "risk": {'min_summoner_level': 100}, 
-            "payment": {'min_deposit': 20.0, 'min_withdrawal': 50.0, 'withdraw_fee': 5.00, 'free_withdraw_threshold': 100.00, 'fee_payer': 'user'},
-            "margins": {'main': 0.15, 'stats': 0.30}, 
-            "math": {'min_difficulty': 0.25, 'max_difficulty': 0.65, 'safety_reduction': 0.10},
-            "system": {'stats_ttl_minutes': 45, 'resolution_interval_minutes': 10},
-            "limits": {'max_global_bet_limit': 200.0}, 
-            "referral": {'referrer_amount': 5.00, 'rollover_multiplier': 20.0},
-            "payment_gateway": {'client_id': '', 'client_secret': ''}
-        }
-        for k, v in defaults.items(): 
-            if k not in c: c[k] = v
-            elif isinstance(v, dict):
-                for sub_k, sub_v in v.items():
-                    if sub_k not in c[k]: c[k][sub_k] = sub_v
-        return c
+        _store_platform_config(db.collection('platform').document('config').get().to_dict() or {})
+        return copy.deepcopy(_config_cache["data"])
     except Exception as e:
         logger.error(f"Erro ao ler config: {e}")
-        return {}
+        # Firestore fora do ar: melhor servir a última config conhecida do que nenhuma
+        return copy.deepcopy(cached) if cached is not None else {}
+
+async def get_platform_config_async():
+    """Versão para rotas async: cache fresco responde direto, leitura do Firestore vai para o io_pool."""
+    with _config_lock:
+        if _config_cache["data"] is not None and time.monotonic() < _config_cache["expires"]:
+            return copy.deepcopy(_config_cache["data"])
+    return await io_pool.run(get_platform_config)
+
+def _store_platform_config(c):
+    defaults = {
+        "risk": {'min_summoner_level': 100}, 
+        "payment": {'min_deposit': 20.0, 'min_withdrawal': 50.0, 'withdraw_fee': 5.00, 'free_withdraw_threshold': 100.00, 'fee_payer': 'user'},
+        "margins": {'main': 0.15, 'stats': 0.30}, 
+        "math": {'min_difficulty': 0.25, 'max_difficulty': 0.65, 'safety_reduction': 0.10},
+        "system": {'stats_ttl_minutes': 45, 'resolution_interval_minutes': 10},
+        "limits": {'max_global_bet_limit': 200.0}, 
+        "referral": {'referrer_amount': 5.00, 'rollover_multiplier': 20.0},
+        "payment_gateway": {'client_id': '', 'client_secret': ''}
+    }
+    for k, v in defaults.items(): 
+        if k not in c: c[k] = v
+        elif isinstance(v, dict):
+            for sub_k, sub_v in v.items():
+                if sub_k not in c[k]: c[k][sub_k] = sub_v
+    with _config_lock: _config_cache["data"], _config_cache["expires"] = c, time.monotonic() + CONFIG_CACHE_TTL_SECONDS
+
+def _on_config_snapshot(docs, changes, read_time):
+    if docs: _store_platform_config(docs[0].to_dict() or {})
+
+def _get_connected_account(user_id: str, game_type: str):
+    return db.collection('users').document(user_id).get().to_dict().get("connectedAccounts", {}).get(game_type)
 
 def _calculate_user_bet_limit(user_data, platform_config):
     total_bets = user_data.get('total_bets_made', 0)
@@ -209,6 +322,7 @@ def _calculate_user_bet_limit(user_data, platform_config):
 def _generate_referral_code(p=''): return (p+''.join(random.choices(string.ascii_uppercase+string.digits,k=6))).upper()
 
 # --- BACKGROUND TASKS ---
+@firestore_trace.job("connect_riot")
 def process_riot_connection(user_id: str, player_id: str):
     logger.info(f"Background: Conectando {player_id} (User: {user_id})")
     try:
@@ -220,8 +334,9 @@ def process_riot_connection(user_id: str, player_id: str):
             db.collection('users').document(user_id).set({"connection_status": "error", "connection_message": val['reason']}, merge=True)
             return
 
+        board = odds_engine.build_challenge_board(p_data, 'lol', cfg.get("margins"), cfg.get("math", {}))
         db.collection('users').document(user_id).set({
-            "connectedAccounts": {"lol": {"playerId": player_id, "puuid": p_data['puuid'], "stats": p_data['stats'], "connectedAt": firestore.SERVER_TIMESTAMP}},
+            "connectedAccounts": {"lol": {"playerId": player_id, "puuid": p_data['puuid'], "stats": p_data['stats'], "statsUpdatedAt": time.time(), "board": board, "connectedAt": firestore.SERVER_TIMESTAMP}},
             "connection_status": "connected", "connection_message": "Conectado com sucesso!"
         }, merge=True)
         
@@ -232,7 +347,128 @@ def process_riot_connection(user_id: str, player_id: str):
         logger.error(f"Erro conectar {player_id}: {e}")
         db.collection('users').document(user_id).set({"connection_status": "error", "connection_message": "Erro na Riot API."}, merge=True)
 
+# --- ATUALIZAÇÃO DE STATS (STALE-WHILE-REVALIDATE) ---
+# Passado system.stats_ttl_minutes desde a última atualização, quem lê o painel recebe os stats
+# atuais na hora e dispara uma atualização incremental em segundo plano (uma por usuário).
+STATS_REFRESH_RETRY_SECONDS = 300
+_stats_refresh_lock = threading.Lock()
+_stats_refresh_started: Dict[str, float] = {}  # user_id -> início da última tentativa (em andamento ou falha), em ordem de início
+
+def _schedule_stats_refresh(user_id: str, acct: dict, cfg: dict, background_tasks: BackgroundTasks):
+    ttl = float(cfg.get("system", {}).get("stats_ttl_minutes", 45)) * 60
+    now = time.time()
+    if now - acct.get("statsUpdatedAt", 0) < ttl: return
+    with _stats_refresh_lock:
+        if now - _stats_refresh_started.get(user_id, 0) < STATS_REFRESH_RETRY_SECONDS: return
+        # Entradas vencidas não bloqueiam mais nada: poda pela frente (mais antigas primeiro)
+        while _stats_refresh_started:
+            oldest = next(iter(_stats_refresh_started))
+            if now - _stats_refresh_started[oldest] < STATS_REFRESH_RETRY_SECONDS: break
+            del _stats_refresh_started[oldest]
+        _stats_refresh_started.pop(user_id, None)  # reinsere no fim para manter a ordem de início
+        _stats_refresh_started[user_id] = now
+    background_tasks.add_task(_refresh_account_stats, user_id, acct)
+
+@firestore_trace.job("refresh_stats")
+def _refresh_account_stats(user_id: str, acct: dict):
+    try:
+        stats = riot_api.refresh_player_stats(acct.get("puuid", ""), acct.get("stats", {}))
+        updates = {"connectedAccounts.lol.statsUpdatedAt": time.time()}
+        if stats is not None: updates["connectedAccounts.lol.stats"] = stats
+        if not _update_connected_accounts([(db.collection('users').document(user_id), acct.get("puuid"), updates)]):
+            logger.info(f"Stats de {user_id} descartados: conta desconectada durante a atualização")
+            return
+        with _stats_refresh_lock: _stats_refresh_started.pop(user_id, None)
+        logger.info(f"Stats de {user_id} {'atualizados' if stats is not None else 'sem partidas novas'}")
+    except Exception as e: logger.error(f"Erro ao atualizar stats de {user_id}: {e}")
+
+# --- PAINEL DE DESAFIOS ---
+# O painel (generate_odds) fica salvo junto da conta com o fingerprint de stats+config usado.
+# Se o fingerprint ainda bate, /api/get-challenges só devolve o que está salvo. Senão, usa a LRU
+# em memória (painéis iguais para stats iguais) e regrava o painel na conta em segundo plano.
+BOARD_CACHE_SIZE = int(os.getenv("BOARD_CACHE_SIZE", "5000"))
+REPRICE_BATCH_SIZE = 400
+_board_lock = threading.Lock()
+_board_cache: "OrderedDict[str, dict]" = OrderedDict()
+_ladder_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+def _get_challenge_board(acct: dict, game_type: str, cfg: dict):
+    """Retorna (painel, precisa_persistir)."""
+    margins, math_cfg = cfg.get("margins"), cfg.get("math", {})
+    fingerprint = odds_engine.odds_fingerprint(acct.get("stats", {}), game_type, margins, math_cfg)
+    stored = acct.get("board")
+    if stored and stored.get("fingerprint") == fingerprint: return stored, False
+
+    with _board_lock:
+        board = _board_cache.get(fingerprint)
+        if board is not None: _board_cache.move_to_end(fingerprint)
+    if board is None:
+        board = odds_engine.build_challenge_board(acct, game_type, margins, math_cfg)
+        with _board_lock:
+            _board_cache[fingerprint] = board
+            while len(_board_cache) > BOARD_CACHE_SIZE: _board_cache.popitem(last=False)
+    return board, True
+
+def _get_kills_ladder(acct: dict, game_type: str, cfg: dict):
+    """Escada de preços de alvos de kills, em LRU pelo mesmo fingerprint de stats+config do painel."""
+    margins, math_cfg = cfg.get("margins"), cfg.get("math", {})
+    fingerprint = odds_engine.odds_fingerprint(acct.get("stats", {}), game_type, margins, math_cfg)
+    with _board_lock:
+        ladder = _ladder_cache.get(fingerprint)
+        if ladder is not None: _ladder_cache.move_to_end(fingerprint); return ladder
+    ladder = odds_engine.build_kills_ladder(acct, game_type, margins, math_cfg)
+    with _board_lock:
+        _ladder_cache[fingerprint] = ladder
+        while len(_ladder_cache) > BOARD_CACHE_SIZE: _ladder_cache.popitem(last=False)
+    return ladder
+
+@firestore_trace.job("store_board")
+def _store_challenge_board(user_id: str, game_type: str, puuid: str, board: dict):
+    try: _update_connected_accounts([(db.collection('users').document(user_id), puuid, {f"connectedAccounts.{game_type}.board": board})], game_type)
+    except Exception as e: logger.error(f"Erro ao salvar painel de {user_id}: {e}")
+
+def _update_connected_accounts(writes: list, game_type: str = 'lol') -> int:
+    """Grava campos de connectedAccounts.<game_type> [(user_ref, puuid, campos)] só se a conta ainda for a
+    mesma. Um update por caminho pontilhado recriaria o mapa (sem puuid) numa conta desconectada no meio do caminho."""
+    return tx_update_connected_accounts(db.transaction(), writes, game_type)
+
+@firestore_trace.job("reprice_boards")
+def _reprice_all_boards(cfg: dict):
+    """Recalcula e grava o painel de todas as contas conectadas (após mudança de margens/math).
+    As contas desatualizadas são precificadas em lotes pelo motor vetorizado (prime_batch)."""
+    start, count = time.time(), 0
+    margins, math_cfg = cfg.get("margins"), cfg.get("math", {})
+
+    def flush(pending):
+        boards = prime_batch.build_challenge_boards([acct for _, acct in pending], 'lol', margins, math_cfg)
+        _update_connected_accounts([(ref, acct.get("puuid"), {"connectedAccounts.lol.board": board}) for (ref, acct), board in zip(pending, boards)])
+
+    try:
+        pending = []
+        for doc in db.collection('users').where(filter=FieldFilter('connection_status', '==', 'connected')).stream():
+            acct = (doc.to_dict().get("connectedAccounts") or {}).get("lol")
+            if not acct or not acct.get("puuid"): continue
+            fingerprint = odds_engine.odds_fingerprint(acct.get("stats", {}), 'lol', margins, math_cfg)
+            if (acct.get("board") or {}).get("fingerprint") == fingerprint: continue
+            pending.append((doc.reference, acct))
+            count += 1
+            if len(pending) == REPRICE_BATCH_SIZE: flush(pending); pending = []
+        if pending: flush(pending)
+        logger.info(f"Painéis recalculados: {count} contas em {time.time() - start:.2f}s")
+    except Exception as e: logger.error(f"Erro ao recalcular painéis: {e}")
+
 # --- TRANSACTIONS ---
+@firestore.transactional
+def tx_update_connected_accounts(transaction, writes, game_type):
+    snaps = db.get_all([ref for ref, _, _ in writes], transaction=transaction)
+    current = {s.id: ((s.to_dict() or {}).get("connectedAccounts") or {}).get(game_type, {}).get("puuid") for s in snaps if s.exists}
+    written = 0
+    for ref, puuid, fields in writes:
+        if not puuid or current.get(ref.id) != puuid: continue
+        transaction.update(ref, fields)
+        written += 1
+    return written
+
 @firestore.transactional
 def tx_withdraw_with_fees(transaction, user_ref, amount, config):
     snap = user_ref.get(transaction=transaction)
@@ -254,6 +490,7 @@ def tx_withdraw_with_fees(transaction, user_ref, amount, config):
     if wagered < deposited:
         raise ValueError("Rollover pendente. Aposte o valor depositado pelo menos 1x.")
     transaction.update(user_ref, {"wallet": current - final_deduction})
+    aggregates.increment(db, {"holding_real": -final_deduction}, transaction)
     return {"new_wallet": current - final_deduction, "requested": amount, "fee_deducted": applied_fee, "total_deducted_from_user": final_deduction}
 
 @firestore.transactional
@@ -266,12 +503,15 @@ def tx_place_bet(transaction, user_ref, amount, bet_data):
     bonus_deduct = amount - real_deduct
     updates = {
         "wallet": wallet - real_deduct, "bonus_wallet": bonus - bonus_deduct,
-        "total_wagered": firestore.Increment(amount), "lastBetPlacedAt": firestore.SERVER_TIMESTAMP
+        "total_wagered": firestore.Increment(amount), "lastBetPlacedAt": firestore.SERVER_TIMESTAMP,
+        "pending_liability": firestore.Increment(bet_data.get("potentialWinnings", 0))
     }
     if bonus_deduct > 0: updates["rollover_target"] = max(0, data.get('rollover_target', 0.0) - bonus_deduct)
     transaction.update(user_ref, updates)
     bet_data["split_stake"] = {"real": real_deduct, "bonus": bonus_deduct}
     transaction.set(db.collection('bets').document(), bet_data)
+    aggregates.increment(db, aggregates.bet_placed(bet_data), transaction)
+    aggregates.add_puuid_exposure(db, transaction, bet_data.get("puuid"), bet_data.get("potentialWinnings", 0))
     return {"real": wallet - real_deduct, "bonus": bonus - bonus_deduct}
 
 @firestore.transactional
@@ -284,6 +524,7 @@ def tx_redeem_coupon(transaction, user_ref, coupon_ref, usage_ref, amount, rollo
     transaction.update(user_ref, {"bonus_wallet": firestore.Increment(amount), "rollover_target": firestore.Increment(amount * rollover_mult)})
     transaction.update(coupon_ref, {"current_uses": firestore.Increment(1)})
     transaction.set(usage_ref, {"userId": user_id, "code": code, "amount": amount, "usedAt": firestore.SERVER_TIMESTAMP})
+    aggregates.increment(db, {"holding_bonus": amount}, transaction)
 
 @firestore.transactional
 def tx_convert_bonus(transaction, user_ref):
@@ -292,6 +533,7 @@ def tx_convert_bonus(transaction, user_ref):
     if bonus <= 0: raise ValueError("Sem bônus")
     if data.get('rollover_target', 0.0) > 0.50: raise ValueError("Rollover pendente")
     transaction.update(user_ref, {"wallet": firestore.Increment(bonus), "bonus_wallet": 0.0, "rollover_target": 0.0})
+    aggregates.increment(db, {"holding_real": bonus, "holding_bonus": -bonus}, transaction)
     return bonus
 
 @firestore.transactional
@@ -300,35 +542,16 @@ def tx_withdraw(transaction, user_ref, amount):
     current = snap.to_dict().get('wallet', 0.0)
     if current < amount: raise ValueError("Glitchcoins insuficientes")
     transaction.update(user_ref, {"wallet": current - amount})
+    aggregates.increment(db, {"holding_real": -amount}, transaction)
     return current - amount
 
-@firestore.transactional
-def tx_resolve_bet(transaction, bet_ref, user_ref, bet_data, result):
-    if bet_ref.get(transaction=transaction).to_dict().get('status') != 'pending': return
-    up_user = {}
-    up_bet = {"resolvedAt": firestore.SERVER_TIMESTAMP, "status": result}
-    split = bet_data.get("split_stake", {"real": bet_data['betAmount'], "bonus": 0})
-    if result == "void":
-        up_user["wallet"] = firestore.Increment(split["real"])
-        up_user["bonus_wallet"] = firestore.Increment(split["bonus"])
-    elif result == "won":
-        total = bet_data['betAmount']
-        win = bet_data['potentialWinnings']
-        ratio = split['real'] / total if total > 0 else 1
-        up_user["wallet"] = firestore.Increment(win * ratio)
-        up_user["bonus_wallet"] = firestore.Increment(win * (1 - ratio))
-        up_user["profit_loss"] = firestore.Increment(win - total)
-        up_user["total_bets_made"] = firestore.Increment(1)
-    elif result == "lost":
-        up_user["profit_loss"] = firestore.Increment(-bet_data['betAmount'])
-        up_user["total_bets_made"] = firestore.Increment(1)
-    transaction.update(user_ref, up_user)
-    transaction.update(bet_ref, up_bet)
-
 # --- ROTAS ---
 
 @app.post("/api/init-user")
 async def init_user(payload: InitUserRequest, user_id: str = Depends(get_current_user_uid)):
+    return await io_pool.run(_init_user, payload, user_id)
+
+def _init_user(payload: InitUserRequest, user_id: str):
     try:
         logger.info(f"Registro: {payload.email}")
         if db.collection('users').document(user_id).get().exists: return {"status": "exists"}
@@ -356,6 +579,7 @@ async def init_user(payload: InitUserRequest, user_id: str = Depends(get_current
             "my_referral_code": _generate_referral_code("GLITCH"), "referred_by": None,
             "connection_status": "idle"
         })
+        aggregates.increment(db, {"total_users": 1})
         return {"status": "success", "kyc_status": status}
     except HTTPException as he: raise he
     except Exception as e:
@@ -364,6 +588,9 @@ async def init_user(payload: InitUserRequest, user_id: str = Depends(get_current
 
 @app.get("/api/get-user-data")
 async def get_user_data_endpoint(decoded_token: dict = Depends(get_current_user_token)):
+    return await io_pool.run(_get_user_data, decoded_token)
+
+def _get_user_data(decoded_token: dict):
     user_id = decoded_token['uid']
     ref = db.collection('users').document(user_id)
     doc = ref.get()
@@ -376,6 +603,7 @@ async def get_user_data_endpoint(decoded_token: dict = Depends(get_current_user_
             "currentBetLimit": 3.00, "my_referral_code": _generate_referral_code("GLITCH"), "referred_by": None, "connection_status": "idle"
         }
         ref.set(new_user_data)
+        aggregates.increment(db, {"total_users": 1})
         data = new_user_data
     else: data = doc.to_dict()
 
@@ -397,19 +625,19 @@ async def place_bet_endpoint(payload: PlaceBetRequest, user_id: str = Depends(ge
     if payload.betAmount <= 0 or not payload.betItems: raise HTTPException(400, "Inválido")
     
     user_ref = db.collection('users').document(user_id)
-    user_data = user_ref.get().to_dict()
+    user_data = (await io_pool.run(user_ref.get)).to_dict()
     
     if payload.betAmount > user_data.get('currentBetLimit', 3.00): raise HTTPException(400, "Limite excedido")
     
     game_type = payload.betItems[0].get('gameType')
     acct = user_data.get("connectedAccounts", {}).get(game_type)
     
-    if not acct: raise HTTPException(400, "Conta não conectada")
+    if not acct or not acct.get("puuid"): raise HTTPException(400, "Conta não conectada")
     
     # --- NOVO: CHECK DE ANTI-SNIPPING (LIVE GAME) ---
     # Verifica se o jogador já está em partida. Se estiver, bloqueia a aposta.
     if game_type == 'lol':
-        is_in_game = riot_api.check_active_game(acct.get("puuid"))
+        is_in_game = await riot_api.check_active_game_async(acct.get("puuid"))
         if is_in_game:
             logger.warning(f"Anti-Snipping: Bloqueada aposta de {user_id} (Em partida)")
             raise HTTPException(400, "Você já está em partida. Apostas fechadas.")
@@ -419,52 +647,70 @@ async def place_bet_endpoint(payload: PlaceBetRequest, user_id: str = Depends(ge
         "userId": user_id, "puuid": acct.get("puuid"), "gameType": game_type,
         "betAmount": payload.betAmount, "totalOdd": total_odd, "potentialWinnings": payload.betAmount * total_odd,
         "betItems": payload.betItems, "status": "pending", "createdAt": firestore.SERVER_TIMESTAMP,
-        "lastMatchId": riot_api.get_last_match_id(acct.get("puuid"), "lol")
+        "lastMatchId": await riot_api.get_last_match_id_async(acct.get("puuid"), "lol")
     }
     
     try:
-        transaction = db.transaction()
-        res = tx_place_bet(transaction, user_ref, payload.betAmount, bet_data)
+        res = await io_pool.run(lambda: tx_place_bet(db.transaction(), user_ref, payload.betAmount, bet_data))
         logger.info(f"Aposta: {user_id} | {payload.betAmount} em {total_odd}x")
+        _resolution_schedule.track(acct.get("puuid"), time.time())
         return {"status": "success", "newWallet": res['real'], "newBonusWallet": res['bonus']}
     except ValueError as e: raise HTTPException(400, str(e))
     except Exception as e: logger.error(f"Erro aposta: {e}"); raise HTTPException(500, "Erro interno")
 
 @app.post("/api/get-challenges")
-async def get_challenges_endpoint(payload: GetChallengesRequest, user_id: str = Depends(get_current_user_uid)):
+async def get_challenges_endpoint(payload: GetChallengesRequest, background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user_uid)):
     try:
-        acct = db.collection('users').document(user_id).get().to_dict().get("connectedAccounts", {}).get(payload.gameType)
-        if not acct: raise HTTPException(400, "Não conectado")
-        cfg = get_platform_config()
-        return odds_engine.generate_odds(acct, payload.gameType, cfg.get("margins"), cfg.get("math", {}))
+        acct = await io_pool.run(_get_connected_account, user_id, payload.gameType)
+        if not acct or not acct.get("puuid"): raise HTTPException(400, "Não conectado")
+        # Quem está olhando desafios tende a apostar: adianta o check de anti-snipping
+        if payload.gameType == 'lol': riot_api.prefetch_active_game(acct.get("puuid"))
+        cfg = await get_platform_config_async()
+        board, stale = _get_challenge_board(acct, payload.gameType, cfg)
+        if stale: background_tasks.add_task(_store_challenge_board, user_id, payload.gameType, acct.get("puuid"), board)
+        if payload.gameType == 'lol': _schedule_stats_refresh(user_id, acct, cfg, background_tasks)
+        return board["challenges"]
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.post("/api/request-bet")
 async def request_bet_endpoint(payload: RequestBetRequest, user_id: str = Depends(get_current_user_uid)):
     try:
-        acct = db.collection('users').document(user_id).get().to_dict().get("connectedAccounts", {}).get(payload.gameType)
-        if not acct: raise HTTPException(400, "Não conectado")
-        cfg = get_platform_config()
-        res = odds_engine.calculate_custom_odd(acct, 'lol', payload.target, cfg.get("margins"), cfg.get("math", {}))
+        acct = await io_pool.run(_get_connected_account, user_id, payload.gameType)
+        if not acct or not acct.get("puuid"): raise HTTPException(400, "Não conectado")
+        cfg = await get_platform_config_async()
+        ladder = _get_kills_ladder(acct, 'lol', cfg)
+        res = odds_engine.calculate_custom_odd(acct, 'lol', payload.target, cfg.get("margins"), cfg.get("math", {}), ladder)
         if "error" in res: raise HTTPException(400, res["error"])
         return res
     except Exception as e: raise HTTPException(500, str(e))
 
+@app.post("/api/get-odds-ladder")
+async def get_odds_ladder_endpoint(payload: GetChallengesRequest, user_id: str = Depends(get_current_user_uid)):
+    """Todos os alvos de kills personalizados com a odd de cada um, para o app precificar localmente."""
+    try:
+        acct = await io_pool.run(_get_connected_account, user_id, payload.gameType)
+        if not acct or not acct.get("puuid"): raise HTTPException(400, "Não conectado")
+        cfg = await get_platform_config_async()
+        return _get_kills_ladder(acct, 'lol', cfg)
+    except Exception as e: raise HTTPException(500, str(e))
+
 @app.post("/api/withdraw/request")
 async def withdraw_request_endpoint(payload: WithdrawRequest, user_id: str = Depends(get_current_user_uid)):
-    cfg = get_platform_config()
+    cfg = await get_platform_config_async()
     min_w = float(cfg.get('payment', {}).get('min_withdrawal', 50.0))
     if payload.amount < min_w: raise HTTPException(400, f"Mínimo {min_w} GC")
     try:
-        transaction = db.transaction()
-        res = tx_withdraw_with_fees(transaction, db.collection('users').document(user_id), payload.amount, cfg)
-        db.collection('withdrawals').add({"userId": user_id, "amount_requested": res['requested'], "fee": res['fee_deducted'], "total_deducted": res['total_deducted_from_user'], "status": "processing", "createdAt": firestore.SERVER_TIMESTAMP})
+        res = await io_pool.run(lambda: tx_withdraw_with_fees(db.transaction(), db.collection('users').document(user_id), payload.amount, cfg))
+        await io_pool.run(db.collection('withdrawals').add, {"userId": user_id, "amount_requested": res['requested'], "fee": res['fee_deducted'], "total_deducted": res['total_deducted_from_user'], "status": "processing", "createdAt": firestore.SERVER_TIMESTAMP})
         logger.info(f"Saque Solicitado: {user_id} | R$ {payload.amount}")
         return {"status": "success", "newWallet": res['new_wallet']}
     except ValueError as e: raise HTTPException(400, str(e))
 
 @app.post("/api/redeem-coupon")
 async def redeem_coupon_endpoint(payload: CouponRequest, user_id: str = Depends(get_current_user_uid)):
+    return await io_pool.run(_redeem_coupon, payload, user_id)
+
+def _redeem_coupon(payload: CouponRequest, user_id: str):
     code = payload.code.upper()
     coupons = list(db.collection('coupons').where(filter=FieldFilter('code', '==', code)).limit(1).stream())
     if not coupons: raise HTTPException(404, "Inválido")
@@ -480,8 +726,7 @@ async def redeem_coupon_endpoint(payload: CouponRequest, user_id: str = Depends(
 @app.post("/api/convert-bonus")
 async def convert_bonus_endpoint(user_id: str = Depends(get_current_user_uid)):
     try:
-        transaction = db.transaction()
-        val = tx_convert_bonus(transaction, db.collection('users').document(user_id))
+        val = await io_pool.run(lambda: tx_convert_bonus(db.transaction(), db.collection('users').document(user_id)))
         logger.info(f"Conversão Bônus: {user_id} | {val}")
         return {"status": "success", "convertedAmount": val}
     except ValueError as e: raise HTTPException(400, str(e))
@@ -489,7 +734,7 @@ async def convert_bonus_endpoint(user_id: str = Depends(get_current_user_uid)):
 @app.post("/api/connect")
 async def connect_account_endpoint(payload: ConnectRequest, background_tasks: BackgroundTasks, user_id: str = Depends(get_current_user_uid)):
     try:
-        db.collection('users').document(user_id).set({"connection_status": "processing", "connection_message": "Analisando perfil..."}, merge=True)
+        await io_pool.run(db.collection('users').document(user_id).set, {"connection_status": "processing", "connection_message": "Analisando perfil..."}, merge=True)
         background_tasks.add_task(process_riot_connection, user_id, payload.playerId)
         return {"status": "processing", "message": "Iniciado"}
     except Exception as e: raise HTTPException(500, "Erro interno")
@@ -497,12 +742,15 @@ async def connect_account_endpoint(payload: ConnectRequest, background_tasks: Ba
 @app.post("/api/disconnect")
 async def disconnect_endpoint(user_id: str = Depends(get_current_user_uid)):
     try:
-        db.collection('users').document(user_id).update({"connectedAccounts.lol": firestore.DELETE_FIELD, "connection_status": "idle", "connection_message": ""})
+        await io_pool.run(db.collection('users').document(user_id).update, {"connectedAccounts.lol": firestore.DELETE_FIELD, "connection_status": "idle", "connection_message": ""})
         return {"status": "disconnected"}
     except Exception as e: raise HTTPException(500, str(e))
 
 @app.post("/api/validate-kyc")
 async def validate_kyc_endpoint(payload: ValidationKycRequest, user_id: str = Depends(get_current_user_uid)):
+    return await io_pool.run(_validate_kyc, payload, user_id)
+
+def _validate_kyc(payload: ValidationKycRequest, user_id: str):
     if not payload.cpf: raise HTTPException(400, "Dados inválidos")
     
     clean_cpf = _sanitize_cpf(payload.cpf)
@@ -527,107 +775,102 @@ async def validate_kyc_endpoint(payload: ValidationKycRequest, user_id: str = De
 async def deposit_pix_endpoint(payload: DepositRequest, user_id: str = Depends(get_current_user_uid)):
     if payload.amount < 20: raise HTTPException(400, "Mínimo R$ 20")
     fake_pix = f"00020126580014BR.GOV.BCB.PIX0136{uuid.uuid4()}520400005303986540{payload.amount:.2f}5802BR5913SUITPAY"
-    db.collection('pending_deposits').add({"userId": user_id, "amount": payload.amount, "status": "pending", "qrCode": fake_pix, "createdAt": firestore.SERVER_TIMESTAMP})
+    await io_pool.run(db.collection('pending_deposits').add, {"userId": user_id, "amount": payload.amount, "status": "pending", "qrCode": fake_pix, "createdAt": firestore.SERVER_TIMESTAMP})
     return {"qrCodeBase64": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data={fake_pix}", "copyPaste": fake_pix, "bonusApplied": False}
 
+# --- APOSTAS DO USUÁRIO (PAGINADAS) ---
+# Páginas ordenadas por createdAt (mais recentes primeiro). O cursor é o id da última aposta da
+# página anterior; só os campos que o app renderiza são lidos (select) e enviados.
+BETS_PAGE_SIZE = int(os.getenv("BETS_PAGE_SIZE", "20"))
+BETS_MAX_PAGE_SIZE = 100
+ACTIVE_BET_FIELDS = ['createdAt', 'betItems', 'betAmount', 'potentialWinnings', 'totalOdd']
+HISTORY_BET_FIELDS = ['status', 'createdAt', 'resolvedAt', 'betItems', 'betAmount', 'potentialWinnings', 'totalOdd']
+
+def _page_bets(user_id: str, status_filter: FieldFilter, fields: list, limit: Optional[int], cursor: Optional[str]):
+    limit = max(1, min(limit or BETS_PAGE_SIZE, BETS_MAX_PAGE_SIZE))
+    q = db.collection('bets').where(filter=FieldFilter('userId', '==', user_id)).where(filter=status_filter) \
+        .order_by('createdAt', direction=firestore.Query.DESCENDING)
+    if cursor:
+        snap = db.collection('bets').document(cursor).get()
+        if not snap.exists or snap.get('userId') != user_id: raise HTTPException(400, "Cursor inválido")
+        q = q.start_after(snap)
+    docs = list(q.select(fields).limit(limit + 1).stream())
+    rows = []
+    for d in docs[:limit]:
+        b = d.to_dict()
+        b['id'] = d.id
+        b['betItems'] = [{"title": i.get('title'), "odd": i.get('odd')} for i in b.get('betItems', [])]
+        rows.append(b)
+    return rows, (docs[limit - 1].id if len(docs) > limit else None)
+
 @app.get("/api/get-active-bets")
-async def get_active_bets(user_id: str = Depends(get_current_user_uid)):
-    docs = db.collection('bets').where(filter=FieldFilter('userId', '==', user_id)).where(filter=FieldFilter('status', '==', 'pending')).stream()
-    return [{**d.to_dict(), 'id': d.id} for d in docs]
+async def get_active_bets(limit: Optional[int] = None, cursor: Optional[str] = None, user_id: str = Depends(get_current_user_uid)):
+    return await io_pool.run(_get_active_bets, user_id, limit, cursor)
+
+def _get_active_bets(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+    bets, next_cursor = _page_bets(user_id, FieldFilter('status', '==', 'pending'), ACTIVE_BET_FIELDS, limit, cursor)
+    return {"bets": bets, "nextCursor": next_cursor}
 
 @app.get("/api/get-history-bets")
-async def get_history_bets(user_id: str = Depends(get_current_user_uid)):
-    docs = db.collection('bets').where(filter=FieldFilter('userId', '==', user_id)).where(filter=FieldFilter('status', 'in', ["won", "lost", "void"])).stream()
-    return [{**d.to_dict(), 'id': d.id, 'createdAt': str(d.to_dict().get('createdAt', '')), 'resolvedAt': str(d.to_dict().get('resolvedAt', ''))} for d in docs]
+async def get_history_bets(limit: Optional[int] = None, cursor: Optional[str] = None, user_id: str = Depends(get_current_user_uid)):
+    return await io_pool.run(_get_history_bets, user_id, limit, cursor)
+
+def _get_history_bets(user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+    bets, next_cursor = _page_bets(user_id, FieldFilter('status', 'in', ["won", "lost", "void"]), HISTORY_BET_FIELDS, limit, cursor)
+    for b in bets: b['createdAt'], b['resolvedAt'] = str(b.get('createdAt', '')), str(b.get('resolvedAt', ''))
+    return {"bets": bets, "nextCursor": next_cursor}
 
 # --- ADMIN ROUTES ---
 @app.post("/api/admin/set-admin")
 async def set_admin_claim(req: Request, uid: str = Depends(verify_admin)):
     data = await req.json()
-    user = auth.get_user_by_email(data.get('email'))
-    auth.set_custom_user_claims(user.uid, {'admin': True})
+    user = await io_pool.run(auth.get_user_by_email, data.get('email'))
+    await io_pool.run(auth.set_custom_user_claims, user.uid, {'admin': True})
     return {"status": "Sucesso"}
 
 @app.get("/api/admin/dashboard-stats")
 async def get_dashboard_stats(uid: str = Depends(verify_admin)):
-    pl = db.collection('platform').document('stats').get().to_dict().get("total_profit_loss", 0.0) or 0.0
+    pl = (await io_pool.run(db.collection('platform').document('stats').get)).to_dict().get("total_profit_loss", 0.0) or 0.0
     return {"platform_pl": pl, "total_users": 0, "top_winners": [], "revenue_data": [], "kyc_pending_queue": []}
 
 @app.get("/api/admin/advanced-stats")
 async def get_advanced_stats(uid: str = Depends(verify_admin)):
+    return await io_pool.run(_compute_advanced_stats)
+
+def _compute_advanced_stats():
     """
     Gera estatísticas avançadas incluindo HOLDING (Saldos dos Usuários).
+    Os totais vêm dos agregados mantidos pelas transações (aggregates.py), sem varrer o histórico.
     """
     try:
         start = time.time()
+        agg = aggregates.read(db)
         
-        # 1. Busca APOSTAS
-        all_bets = list(db.collection('bets').stream())
-        pending_bets = [b.to_dict() for b in all_bets if b.to_dict().get('status') == 'pending']
-        won_bets = [b.to_dict() for b in all_bets if b.to_dict().get('status') == 'won']
-        lost_bets = [b.to_dict() for b in all_bets if b.to_dict().get('status') == 'lost']
-        
-        # 2. Busca USUÁRIOS (Novo: Para calcular Holding)
-        all_users = list(db.collection('users').stream())
-        
-        # 3. Cálculos de APOSTAS
-        pending_vol = sum(b.get('betAmount', 0) for b in pending_bets)
-        liability = sum(b.get('potentialWinnings', 0) for b in pending_bets)
-        
-        # Separação Dinheiro vs Bônus nas Apostas (Se existir no doc)
-        pending_real = sum(b.get('split_stake', {}).get('real', b.get('betAmount', 0)) for b in pending_bets)
-        pending_bonus = sum(b.get('split_stake', {}).get('bonus', 0) for b in pending_bets)
-
-        won_val = sum(b.get('potentialWinnings', 0) for b in won_bets)
-        lost_val = sum(b.get('betAmount', 0) for b in lost_bets)
-        
-        avg_ticket = (pending_vol + lost_val + sum(b.get('betAmount', 0) for b in won_bets)) / len(all_bets) if all_bets else 0.0
-        
-        # 4. Cálculos de HOLDING (Saldos Parados)
-        total_user_wallet = 0.0
-        total_user_bonus = 0.0
-        users_with_balance = 0
-        
-        for u_doc in all_users:
-            u = u_doc.to_dict()
-            w = u.get('wallet', 0.0)
-            b = u.get('bonus_wallet', 0.0)
-            total_user_wallet += w
-            total_user_bonus += b
-            if w > 0 or b > 0: users_with_balance += 1
-            
-        # 5. Riscos
-        high_risk = sorted(pending_bets, key=lambda x: x.get('potentialWinnings', 0), reverse=True)[:5]
-        top_risk = [{
-            "user": b.get('userId'), 
-            "amount": b.get('betAmount'), 
-            "payout": b.get('potentialWinnings'),
-            "odd": b.get('totalOdd')
-        } for b in high_risk]
-
+        top_risk = _top_pending_bets(5)
+        avg_ticket = (agg["pending_volume"] + agg["lost_val"] + agg["won_stake"]) / agg["total_bets"] if agg["total_bets"] else 0.0
         logger.info(f"Advanced Stats gerado em {time.time() - start:.2f}s")
 
         return {
             "pending": {
-                "count": len(pending_bets),
-                "volume_total": pending_vol,
-                "volume_real": pending_real,
-                "volume_bonus": pending_bonus,
-                "liability": liability
+                "count": agg["pending_count"],
+                "volume_total": agg["pending_volume"],
+                "volume_real": agg["pending_real"],
+                "volume_bonus": agg["pending_bonus"],
+                "liability": agg["liability"]
             },
             "holding": {
-                "total_real": total_user_wallet,  # Dinheiro na mão dos users
-                "total_bonus": total_user_bonus,  # Crédito fictício
-                "users_with_balance": users_with_balance
+                "total_real": agg["holding_real"],  # Dinheiro na mão dos users
+                "total_bonus": agg["holding_bonus"],  # Crédito fictício
+                "users_with_balance": agg["users_with_balance"]  # Atualizado na reconstrução
             },
             "history": {
-                "won_count": len(won_bets), "won_val": won_val,
-                "lost_count": len(lost_bets), "lost_val": lost_val,
-                "house_profit": lost_val - won_val
+                "won_count": agg["won_count"], "won_val": agg["won_val"],
+                "lost_count": agg["lost_count"], "lost_val": agg["lost_val"],
+                "house_profit": agg["lost_val"] - agg["won_val"]
             },
             "metrics": {
                 "avg_ticket": avg_ticket,
-                "total_users": len(all_users)
+                "total_users": agg["total_users"]
             },
             "top_risk": top_risk
         }
@@ -636,17 +879,76 @@ async def get_advanced_stats(uid: str = Depends(verify_admin)):
         logger.error(f"Erro stats: {e}")
         raise HTTPException(500, "Erro ao gerar estatísticas")
 
+# --- ÍNDICE DE RISCO ---
+# Maiores exposições sem varrer apostas: consultas indexadas por potentialWinnings (ver
+# firestore.indexes.json) e rankings pelo campo pending_liability de users e riotAccountLinks.
+RISK_MAX_LIMIT = 50
+
+def _top_pending_bets(limit: int, field: Optional[str] = None, value: Optional[str] = None):
+    q = db.collection('bets').where(filter=FieldFilter('status', '==', 'pending'))
+    if field: q = q.where(filter=FieldFilter(field, '==', value))
+    q = q.order_by('potentialWinnings', direction=firestore.Query.DESCENDING).limit(limit)
+    rows = []
+    for d in q.stream():
+        b = d.to_dict()
+        rows.append({"id": d.id, "user": b.get('userId'), "puuid": b.get('puuid'), "amount": b.get('betAmount'),
+                     "payout": b.get('potentialWinnings'), "odd": b.get('totalOdd')})
+    return rows
+
+def _top_exposures(collection: str, limit: int):
+    q = db.collection(collection).where(filter=FieldFilter('pending_liability', '>', 0)) \
+        .order_by('pending_liability', direction=firestore.Query.DESCENDING).limit(limit)
+    return [{"id": d.id, "liability": d.to_dict().get('pending_liability', 0)} for d in q.stream()]
+
+@app.get("/api/admin/risk")
+async def get_risk_route(limit: int = 5, user_id: Optional[str] = None, puuid: Optional[str] = None, uid: str = Depends(verify_admin)):
+    """Top exposições: apostas pendentes (global), usuários e contas Riot. user_id/puuid filtram as apostas."""
+    limit = max(1, min(limit, RISK_MAX_LIMIT))
+    try:
+        jobs = {
+            "top_bets": io_pool.run(_top_pending_bets, limit),
+            "top_users": io_pool.run(_top_exposures, 'users', limit),
+            "top_puuids": io_pool.run(_top_exposures, 'riotAccountLinks', limit)
+        }
+        if user_id: jobs["user_bets"] = io_pool.run(_top_pending_bets, limit, 'userId', user_id)
+        if puuid: jobs["puuid_bets"] = io_pool.run(_top_pending_bets, limit, 'puuid', puuid)
+        results = await asyncio.gather(*jobs.values())
+        return dict(zip(jobs.keys(), results))
+    except Exception as e:
+        logger.error(f"Erro risco: {e}")
+        raise HTTPException(500, "Erro ao consultar risco")
+
+@firestore_trace.job("rebuild_aggregates")
+def _rebuild_aggregates():
+    try: return aggregates.rebuild(db)
+    except Exception as e: logger.error(f"Erro ao reconstruir agregados: {e}")
+
+@app.post("/api/admin/rebuild-aggregates")
+async def rebuild_aggregates_route(uid: str = Depends(verify_admin)):
+    totals = await io_pool.run(_rebuild_aggregates)
+    if totals is None: raise HTTPException(500, "Erro ao reconstruir agregados")
+    return {"status": "success", "aggregates": totals}
+
 @app.get("/api/admin/get-config")
-async def get_config_route(uid: str = Depends(verify_admin)): return get_platform_config()
+async def get_config_route(uid: str = Depends(verify_admin)): return await get_platform_config_async()
 
 @app.post("/api/admin/set-config")
-async def set_config_route(req: Request, uid: str = Depends(verify_admin)):
-    db.collection('platform').document('config').set(await req.json())
+async def set_config_route(req: Request, background_tasks: BackgroundTasks, uid: str = Depends(verify_admin)):
+    new_config = await req.json()
+    old_config = await get_platform_config_async()
+    await io_pool.run(db.collection('platform').document('config').set, new_config)
+    _store_platform_config(new_config)
+    # Margens/math mudaram: regrava os painéis de todas as contas fora do caminho das requisições
+    if any(old_config.get(k) != new_config.get(k) for k in ("margins", "math")):
+        background_tasks.add_task(_reprice_all_boards, copy.deepcopy(new_config))
     logger.info("Admin atualizou configurações")
     return {"status": "sucesso"}
 
 @app.get("/api/admin/find-user")
 async def find_user(email: str, uid: str = Depends(verify_admin)):
+    return await io_pool.run(_find_user, email)
+
+def _find_user(email: str):
     users = list(db.collection('users').where(filter=FieldFilter('email', '==', email)).limit(1).stream())
     if not users: raise HTTPException(404, "Não encontrado")
     user_data = users[0].to_dict()
@@ -663,30 +965,151 @@ async def find_user(email: str, uid: str = Depends(verify_admin)):
 
 @app.get("/api/admin/resolve-bets")
 async def admin_resolve_bets(uid: str = Depends(verify_admin)):
-    _resolve_bets_logic()
+    await io_pool.run(_resolve_bets_logic, True)
     return {"status": "Triggered"}
 
+@app.get("/api/admin/auth-cache-stats")
+async def auth_cache_stats(uid: str = Depends(verify_admin)): return id_tokens.stats()
+
+@app.get("/api/admin/io-pool-stats")
+async def io_pool_stats(uid: str = Depends(verify_admin)): return io_pool.stats()
+
+@app.get("/api/admin/riot-status")
+async def riot_status(uid: str = Depends(verify_admin)):
+    return {"rate_limit": riot_client.stats(), "match_cache": await io_pool.run(match_cache.stats), "resolver": _resolution_schedule.stats()}
+
+@app.get("/metrics")
+async def metrics_endpoint(authorization: str = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}": raise HTTPException(401, "Token de métricas inválido")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/admin/create-coupon")
 async def create_coupon_admin(payload: CouponRequest, uid: str = Depends(verify_admin)):
+    return await io_pool.run(_create_coupon, payload)
+
+def _create_coupon(payload: CouponRequest):
     code = payload.code.upper() or _generate_referral_code("BONUS")
     if list(db.collection('coupons').where(filter=FieldFilter('code', '==', code)).stream()): raise HTTPException(400, "Já existe")
     db.collection('coupons').add({"code": code, "amount": payload.amount, "type": 'deposit' if payload.min_deposit_required > 0 else 'manual', "min_deposit_required": payload.min_deposit_required, "max_uses": payload.max_uses, "current_uses": 0, "created_at": firestore.SERVER_TIMESTAMP, "active": True})
     logger.info(f"Admin criou cupom: {code}")
     return {"status": "success", "code": code}
 
-def _resolve_bets_logic():
-    logger.info("--- [Scheduler] Ciclo ---")
-    try:
-        for doc in db.collection('bets').where(filter=FieldFilter('status', '==', 'pending')).stream():
-            try:
-                bet = doc.to_dict()
-                res = riot_api.get_match_details_and_resolve(bet['puuid'], bet['lastMatchId'], bet['betItems'])
-                if res["status"] != "pending":
-                    transaction = db.transaction()
-                    tx_resolve_bet(transaction, db.collection('bets').document(doc.id), db.collection('users').document(bet['userId']), bet, res["status"])
-                    logger.info(f"RESOLVIDO: {doc.id} -> {res['status']}")
-            except Exception as e: logger.error(f"Erro desafio {doc.id}: {e}")
-    except Exception as e: logger.critical(f"FALHA SCHEDULER: {e}")
+_resolution_schedule = bet_schedule.ResolutionSchedule()
+metrics.gauge("resolver_players_tracked", "Jogadores com aposta pendente na agenda do resolvedor", collect=lambda: _resolution_schedule.stats()["tracked"])
+metrics.gauge("resolver_players_due", "Jogadores com consulta vencida (backlog do resolvedor)", collect=lambda: _resolution_schedule.stats()["due"])
+_resolver_lock = threading.Lock()  # tick do scheduler e gatilho do admin não rodam juntos
+_last_full_sweep = 0.0
+
+@firestore_trace.job("resolver")
+def _resolve_bets_logic(force: bool = False):
+    """
+    Um tick do resolvedor. Consulta a Riot só para os puuids vencidos na agenda; a cada
+    `system.resolution_interval_minutes` relê todas as apostas pendentes para reconstruir a agenda.
+    `force` (admin) consulta agora todos os jogadores com aposta pendente.
+    """
+    global _last_full_sweep
+    with _resolver_lock:
+        try:
+            start = time.time()
+            max_interval = get_platform_config().get('system', {}).get('resolution_interval_minutes', 10) * 60
+            groups: Dict[str, list] = {}
+            kind = "forced" if force else "tick"
+            if force or start - _last_full_sweep >= max_interval:
+                groups = _pending_bets_by_puuid()
+                _resolution_schedule.sync({puuid: min(_bet_time(b, start) for _, b in bets) for puuid, bets in groups.items()})
+                RESOLVER_PENDING_BETS.set(sum(len(b) for b in groups.values()))
+                _last_full_sweep = start
+                if not force: kind = "sweep"
+            due = list(groups) if force else _resolution_schedule.due(start)
+            if not due: return
+            logger.info(f"--- [Scheduler] Ciclo: {len(due)} jogadores na vez ---")
+
+            # Agrupa por jogador: cada puuid consulta a Riot uma única vez por ciclo
+            decided = []
+            with ThreadPoolExecutor(max_workers=min(RESOLVER_MAX_WORKERS, len(due))) as pool:
+                # copy_context: as consultas dos workers contam no escopo do job
+                futures = {pool.submit(contextvars.copy_context().run, _poll_player, puuid, groups.get(puuid), max_interval): puuid for puuid in due}
+                for fut in as_completed(futures):
+                    try: decided.extend(fut.result())
+                    except Exception as e: logger.error(f"Erro jogador {futures[fut]}: {e}")
+            # Tudo o que o ciclo decidiu é liquidado de uma vez, em lotes (settlement)
+            if decided: _settle_bets(decided, max_interval)
+
+            RESOLVER_PLAYERS_POLLED.inc(len(due))
+            RESOLVER_CYCLE_SECONDS.observe(time.time() - start, kind=kind)
+            logger.info(f"--- [Scheduler] {len(due)} jogadores em {time.time() - start:.2f}s ({firestore_trace.current()}) ---")
+        except Exception as e: logger.critical(f"FALHA SCHEDULER: {e}")
+
+def _pending_bets_by_puuid() -> Dict[str, list]:
+    """Varredura completa. Aposta sem puuid não tem jogador para consultar: fica fora da agenda (e do log, para o admin anular)."""
+    groups: Dict[str, list] = {}
+    orphans = []
+    for doc in db.collection('bets').where(filter=FieldFilter('status', '==', 'pending')).stream():
+        bet = doc.to_dict()
+        if bet.get('puuid'): groups.setdefault(bet['puuid'], []).append((doc.id, bet))
+        else: orphans.append(doc.id)
+    if orphans: logger.warning(f"Apostas pendentes sem puuid ignoradas pelo resolvedor: {', '.join(orphans[:20])}{' ...' if len(orphans) > 20 else ''}")
+    return groups
+
+def _pending_bets_for(puuid: str) -> list:
+    query = db.collection('bets').where(filter=FieldFilter('status', '==', 'pending')).where(filter=FieldFilter('puuid', '==', puuid))
+    return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+def _bet_time(bet: dict, default: float) -> float:
+    created = bet.get('createdAt')
+    return created.timestamp() if hasattr(created, 'timestamp') else default
+
+def _poll_player(puuid: str, bets: Optional[list], max_interval: float) -> list:
+    """Decide o que der para o jogador e reagenda a próxima consulta conforme o que foi encontrado.
+    Retorna as apostas decididas [(bet_id, bet, resultado)], liquidadas depois pelo ciclo."""
+    if not puuid: return []
+    if bets is None:
+        try: bets = _pending_bets_for(puuid)
+        except Exception as e:
+            logger.error(f"Erro ao ler apostas de {puuid}: {e}")
+            _resolution_schedule.no_match(puuid, max_interval)  # backoff em vez de derrubar o ciclo
+            return []
+    if not bets:
+        _resolution_schedule.resolved(puuid)
+        return []
+    try: decided = _resolve_player_bets(puuid, bets)
+    except Exception as e:
+        logger.error(f"Erro jogador {puuid}: {e}")
+        decided = []  # falhou antes de decidir: reagenda com backoff em vez de repetir a cada tick
+    if len(decided) == len(bets):
+        _resolution_schedule.resolved(puuid)
+        return decided
+    # Ainda há aposta pendente: se o jogador está em partida, a próxima consulta é perto do fim dela
+    try: game = riot_api.get_active_game(puuid)
+    except Exception as e:
+        logger.error(f"Erro ao consultar partida ativa de {puuid}: {e}")
+        game = None
+    game_start = (game or {}).get("gameStartTime")
+    _resolution_schedule.no_match(puuid, max_interval, game_start / 1000 if game_start else None)
+    return decided
+
+def _resolve_player_bets(puuid: str, bets: list) -> list:
+    """Busca a última partida do jogador uma vez e decide todas as apostas pendentes dele contra ela.
+    Retorna só as que saíram de 'pending'."""
+    latest = riot_api.get_latest_match(puuid, [bet.get('lastMatchId') for _, bet in bets])
+    decided = []
+    for bet_id, bet in bets:
+        try:
+            res = riot_api.resolve_bet_items(puuid, bet.get('lastMatchId'), bet['betItems'], latest)
+            if res["status"] != "pending": decided.append((bet_id, bet, res["status"]))
+        except Exception as e: logger.error(f"Erro desafio {bet_id}: {e}")
+    return decided
+
+def _settle_bets(decided: list, max_interval: float):
+    outcome = settlement.settle(db, decided)
+    for bet_id, result in outcome["settled"]: logger.info(f"RESOLVIDO: {bet_id} -> {result}")
+    if outcome["failed"]:
+        # Lote abandonado: as apostas seguem pendentes; o jogador volta para a agenda com backoff
+        failed = set(outcome["failed"])
+        for puuid in {bet.get('puuid') for bet_id, bet, _ in decided if bet_id in failed}:
+            _resolution_schedule.no_match(puuid, max_interval)
+        logger.error(f"Liquidação: {len(failed)} apostas não gravadas, ficam para o próximo ciclo")
+    logger.info(f"Liquidação: {len(outcome['settled'])} apostas, {len(outcome['skipped'])} já resolvidas")
 
 # --- ROTA DE VERIFICAÇÃO RIOT ---
 @app.get("/riot.txt")
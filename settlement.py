@@ -0,0 +1,149 @@
+import contextvars
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase_admin import firestore
+from google.api_core import exceptions
+
+import aggregates
+import metrics
+
+# --- LIQUIDAÇÃO EM LOTE DAS APOSTAS ---
+# O resolvedor abria uma transação por aposta (lê a aposta, grava a aposta, grava o usuário), uma
+# depois da outra. Depois de um patch, milhares de apostas fecham no mesmo ciclo e isso levava minutos.
+# Agora o ciclo junta tudo o que decidiu e liquida em lotes de SETTLEMENT_CHUNK_SIZE apostas por commit:
+#   - a transação relê as apostas do lote (get_all) e só liquida as que ainda estão 'pending';
+#   - várias apostas do mesmo usuário viram um único update de carteira, e as da mesma conta Riot
+#     um único ajuste de exposição; os agregados recebem um só delta por lote;
+#   - as apostas de um usuário ficam no mesmo lote sempre que cabem; os lotes rodam em
+#     SETTLEMENT_WORKERS threads;
+#   - conflito/indisponibilidade: o SDK já repete a transação; se ainda assim falhar, o lote volta
+#     com backoff exponencial (com jitter) até SETTLEMENT_MAX_ATTEMPTS vezes;
+#   - qualquer outro erro (ex.: usuário excluído, update dá NotFound) divide o lote, por usuário e
+#     depois ao meio, até isolar as apostas problemáticas; só elas ficam como falha.
+# Com ~3 documentos por aposta no pior caso, 150 apostas ficam abaixo do limite de 500 escritas por commit.
+SETTLEMENT_CHUNK_SIZE = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "150"))
+SETTLEMENT_WORKERS = int(os.getenv("SETTLEMENT_WORKERS", "4"))
+SETTLEMENT_MAX_ATTEMPTS = int(os.getenv("SETTLEMENT_MAX_ATTEMPTS", "4"))
+SETTLEMENT_BACKOFF_SECONDS = float(os.getenv("SETTLEMENT_BACKOFF_SECONDS", "0.2"))
+
+TRANSIENT = (exceptions.Aborted, exceptions.DeadlineExceeded, exceptions.ServiceUnavailable)
+
+def _retryable(error):
+    # @firestore.transactional esgota as tentativas com ValueError(...) from Aborted; outro ValueError é bug
+    if isinstance(error, ValueError): return isinstance(error.__cause__, exceptions.Aborted)
+    return isinstance(error, TRANSIENT)
+
+SETTLED = metrics.counter("settlement_bets_total", "Apostas liquidadas pelo resolvedor, por resultado", ["result"])
+CHUNK_SECONDS = metrics.histogram("settlement_chunk_duration_seconds", "Duração de um lote de liquidação (com novas tentativas)")
+CHUNK_RETRIES = metrics.counter("settlement_chunk_retries_total", "Lotes de liquidação repetidos após conflito ou erro transitório")
+CHUNK_FAILURES = metrics.counter("settlement_chunk_failures_total", "Lotes de liquidação abandonados (apostas continuam pendentes)")
+CHUNK_SPLITS = metrics.counter("settlement_chunk_splits_total", "Lotes divididos para isolar apostas com erro não transitório")
+
+def bet_effects(bet_data, result):
+    """Deltas do usuário e valor creditado (real, bônus) ao liquidar uma aposta com `result` (won/lost/void)."""
+    user = {"pending_liability": -bet_data.get("potentialWinnings", 0)}
+    split = bet_data.get("split_stake", {"real": bet_data['betAmount'], "bonus": 0})
+    credited = (0.0, 0.0)
+    if result == "void":
+        user["wallet"], user["bonus_wallet"] = split["real"], split["bonus"]
+        credited = (split["real"], split["bonus"])
+    elif result == "won":
+        total, win = bet_data['betAmount'], bet_data['potentialWinnings']
+        ratio = split['real'] / total if total > 0 else 1
+        user["wallet"], user["bonus_wallet"] = win * ratio, win * (1 - ratio)
+        credited = (win * ratio, win * (1 - ratio))
+        user["profit_loss"] = win - total
+        user["total_bets_made"] = 1
+    elif result == "lost":
+        user["profit_loss"] = -bet_data['betAmount']
+        user["total_bets_made"] = 1
+    return user, credited
+
+def settle(db, items):
+    """Liquida [(bet_id, bet_data, result)]. Retorna {"settled": [(bet_id, result)], "skipped": [bet_id], "failed": [bet_id]};
+    skipped = já não estava pendente, failed = lote abandonado (a aposta segue pendente para o próximo ciclo)."""
+    out = {"settled": [], "skipped": [], "failed": []}
+    if not items: return out
+    chunks = _chunks(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(SETTLEMENT_WORKERS, len(chunks)))) as pool:
+        # Contextos copiados aqui (não na thread do pool): leituras/gravações contam no escopo de quem chamou (firestore_trace)
+        contexts = [contextvars.copy_context() for _ in chunks]
+        for part in pool.map(lambda ctx, chunk: ctx.run(_settle_chunk, db, chunk), contexts, chunks):
+            for key in out: out[key].extend(part[key])
+    for _, result in out["settled"]: SETTLED.inc(result=result)
+    return out
+
+def _chunks(items):
+    by_user = defaultdict(list)
+    for item in items: by_user[item[1].get('userId')].append(item)
+    chunks, current = [], []
+    for group in by_user.values():
+        if current and len(current) + len(group) > SETTLEMENT_CHUNK_SIZE: chunks.append(current); current = []
+        for i in range(0, len(group), SETTLEMENT_CHUNK_SIZE):
+            part = group[i:i + SETTLEMENT_CHUNK_SIZE]
+            if len(part) == SETTLEMENT_CHUNK_SIZE: chunks.append(part)
+            else: current.extend(part)
+    if current: chunks.append(current)
+    return chunks
+
+def _settle_chunk(db, chunk):
+    with CHUNK_SECONDS.time(): return _settle_part(db, chunk)
+
+def _settle_part(db, chunk):
+    results = {bet_id: result for bet_id, _, result in chunk}
+    for attempt in range(SETTLEMENT_MAX_ATTEMPTS):
+        try:
+            settled, skipped = _tx_settle(db.transaction(), db, results)
+            return {"settled": settled, "skipped": skipped, "failed": []}
+        except Exception as e:
+            if not _retryable(e):
+                if len(chunk) > 1: return _split(db, chunk, e)
+                print(f"[Settlement] Erro ao liquidar {chunk[0][0]}: {e}")
+                break
+            if attempt + 1 == SETTLEMENT_MAX_ATTEMPTS:
+                print(f"[Settlement] Lote de {len(chunk)} apostas abandonado após {attempt + 1} tentativas: {e}")
+                break
+            CHUNK_RETRIES.inc()
+            time.sleep(SETTLEMENT_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+    CHUNK_FAILURES.inc()
+    return {"settled": [], "skipped": [], "failed": list(results)}
+
+def _split(db, chunk, error):
+    """Erro não transitório: separa por usuário (ou ao meio, se for um usuário só) e tenta cada parte."""
+    by_user = defaultdict(list)
+    for item in chunk: by_user[item[1].get('userId')].append(item)
+    half = len(chunk) // 2
+    parts = list(by_user.values()) if len(by_user) > 1 else [chunk[:half], chunk[half:]]
+    CHUNK_SPLITS.inc()
+    print(f"[Settlement] Erro no lote de {len(chunk)} apostas ({error}), dividindo em {len(parts)}")
+    out = {"settled": [], "skipped": [], "failed": []}
+    for part in parts:
+        result = _settle_part(db, part)
+        for key in out: out[key].extend(result[key])
+    return out
+
+@firestore.transactional
+def _tx_settle(transaction, db, results):
+    bets = db.collection('bets')
+    snaps = db.get_all([bets.document(bet_id) for bet_id in results], transaction=transaction)
+    settled, skipped = [], []
+    users, exposure, totals = defaultdict(lambda: defaultdict(int)), defaultdict(float), defaultdict(int)  # int: contadores continuam inteiros
+    for snap in snaps:
+        bet = snap.to_dict() if snap.exists else None
+        if not bet or bet.get('status') != 'pending': skipped.append(snap.id); continue
+        result = results[snap.id]
+        user, credited = bet_effects(bet, result)
+        for k, v in user.items(): users[bet['userId']][k] += v
+        if bet.get("puuid"): exposure[bet["puuid"]] -= bet.get("potentialWinnings", 0)
+        for k, v in aggregates.bet_resolved(bet, result, *credited).items(): totals[k] += v
+        transaction.update(bets.document(snap.id), {"resolvedAt": firestore.SERVER_TIMESTAMP, "status": result})
+        settled.append((snap.id, result))
+    for user_id, deltas in users.items():
+        transaction.update(db.collection('users').document(user_id), {k: firestore.Increment(v) for k, v in deltas.items()})
+    for puuid, amount in exposure.items(): aggregates.add_puuid_exposure(db, transaction, puuid, amount)
+    aggregates.increment(db, totals, transaction)
+    return settled, skipped
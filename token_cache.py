@@ -0,0 +1,69 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# --- CACHE DE ID TOKENS VERIFICADOS ---
+# O frontend reenvia o mesmo ID token (~1h de validade) em toda chamada. Guardamos o token
+# decodificado numa LRU limitada, indexada pelo SHA-256 do token (o token em si nunca fica em
+# memória) e válida até o `exp` do próprio token.
+
+class TokenCache:
+    def __init__(self, verify_fn, max_size=10000, revocation_recheck_seconds=None):
+        """
+        verify_fn: função que valida o token e devolve as claims (ex: auth.verify_id_token).
+        revocation_recheck_seconds: se definido, entradas mais velhas que isso são revalidadas
+        com verify_fn (que deve checar revogação), mesmo antes do exp.
+        """
+        self._verify = verify_fn
+        self._max_size = max_size
+        self._recheck = revocation_recheck_seconds
+        self._entries = OrderedDict()  # sha256 -> (claims, expires_at, verified_at)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "failures": 0}
+
+    def lookup(self, token):
+        """Claims do cache, ou None se o token não estiver lá (ou expirou). Não faz I/O."""
+        key, now = self._key(token), time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at, verified_at = entry
+                stale = self._recheck is not None and now - verified_at > self._recheck
+                if now < expires_at and not stale:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return dict(claims)
+                del self._entries[key]
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+        return None
+
+    def refresh(self, token):
+        """Valida o token com verify_fn (ignorando o cache) e guarda o resultado até o exp."""
+        now = time.time()
+        try: claims = self._verify(token)
+        except Exception:
+            with self._lock: self._stats["failures"] += 1
+            raise
+
+        expires_at = float(claims.get("exp", 0))
+        if expires_at > now:
+            with self._lock:
+                key = self._key(token)
+                self._entries[key] = (claims, expires_at, now)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return dict(claims)
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def stats(self):
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {**self._stats, "size": len(self._entries), "max_size": self._max_size,
+                    "hit_rate": self._stats["hits"] / total if total else 0.0}